@@ -0,0 +1,64 @@
+"""
+Download payloads for the sidebar "Download Annotations" button.
+
+Serializing every record on every rerun (each slider tick included) is
+wasted work when nobody downloads. Payloads are instead built when the
+download is requested and memoized on the store's version counter, so
+repeated downloads of an unchanged session reuse the same bytes and any
+new decision invalidates them.
+
+Besides the original indented JSON, a compact (no whitespace) variant and
+a gzip-compressed one are offered; the gzip file is typically 5-10x
+smaller than the indented JSON, which matters on slow hospital networks.
+"""
+
+import gzip
+import json
+import threading
+
+# name -> (label, file suffix, MIME type)
+EXPORT_FORMATS = {
+    'json': ("JSON", '.json', 'application/json'),
+    'compact': ("Compact JSON", '.json', 'application/json'),
+    'gzip': ("Compact JSON, gzip", '.json.gz', 'application/gzip'),
+}
+GZIP_LEVEL = 6
+
+
+def encode_records(records, fmt):
+    """Serialize annotation records in export format `fmt` and return bytes."""
+    if fmt == 'json':
+        return json.dumps(records, indent=2).encode('utf-8')
+    compact = json.dumps(records, separators=(',', ':')).encode('utf-8')
+    if fmt == 'compact':
+        return compact
+    if fmt == 'gzip':
+        return gzip.compress(compact, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+class AnnotationExport:
+    """Export payloads of one AnnotationStore, memoized on `store.version`."""
+
+    def __init__(self, store):
+        self.store = store
+        self._version = None
+        self._payloads = {}  # fmt -> bytes for self._version
+        self._lock = threading.Lock()  # Payloads are built on Streamlit's download thread
+
+    def payload(self, fmt):
+        """Return the export bytes for `fmt`, rebuilding only if the store changed."""
+        with self._lock:
+            if self.store.version != self._version:
+                self._payloads = {}
+            if fmt not in self._payloads:
+                version, records = self.store.snapshot()
+                if version != self._version:
+                    self._version = version
+                    self._payloads = {}
+                self._payloads[fmt] = encode_records(records, fmt)
+            return self._payloads[fmt]
+
+    def data(self, fmt):
+        """Return a zero-argument callable producing the payload (for st.download_button)."""
+        return lambda: self.payload(fmt)
@@ -0,0 +1,140 @@
+"""
+Streaming readers for annotation files.
+
+Annotation files are JSON lists of records (annotations/<annotator>.json,
+the app's local annotations_*.json snapshots) or JSONL (the app's journal,
+exports). Offline analyses read them record by record through
+`iter_records`, so memory does not grow with the size of a file: JSON lists
+are decoded incrementally from fixed-size chunks instead of with json.load.
+
+Usage from analysis scripts:
+    for path in annotation_files(['annotations/']):
+        for record in iter_records(path):
+            ...
+"""
+
+import json
+from pathlib import Path
+
+from annotation_store import annotation_key
+
+ANNOTATION_SUFFIXES = ('.json', '.jsonl')
+READ_CHUNK_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+def annotation_files(paths):
+    """
+    Expand files and directories into annotation file paths.
+
+    Directories contribute their *.json / *.jsonl files (sorted, not
+    recursive); files are passed through as given.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.iterdir()
+                                if p.suffix in ANNOTATION_SUFFIXES and p.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+def _number_may_continue(item, buf, end):
+    """
+    Return True if a number decoded from `buf` ending at `end` may be the
+    prefix of a longer one: numbers are not self-delimiting, so "0." (cut
+    from "0.5") decodes as 0 and only a following separator proves it ended.
+    """
+    if not isinstance(item, (int, float)) or isinstance(item, bool):
+        return False
+    while end < len(buf) and buf[end] in ' \t\r\n':
+        end += 1
+    return end == len(buf) or buf[end] not in ',]'
+
+
+def iter_json_array(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON list without loading the whole file."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buf = f.read(chunk_size).lstrip()
+        while not buf:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            buf = chunk.lstrip()
+        if not buf.startswith('['):
+            raise ValueError(f"{path}: expected a JSON list")
+        buf, pos, eof = buf[1:], 0, False
+        while True:
+            # Skip separators between elements
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+            if pos >= len(buf):
+                raise ValueError(f"{path}: unterminated JSON list")
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Element continues past the buffer; read more and retry
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            if not eof and (end == len(buf) or _number_may_continue(item, buf, end)):
+                # A number may be cut at the chunk boundary; make sure it ended
+                more = f.read(chunk_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield item
+            pos = end
+
+
+def iter_records(path):
+    """Yield annotation records from a JSON list or JSONL file."""
+    if Path(path).suffix == '.jsonl':
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(path)
+
+
+def latest_records(records):
+    """
+    Return {(example_id, evid_index): record}, keeping the most recent
+    `annotation_time` when an EVID was annotated more than once.
+    """
+    latest = {}
+    for record in records:
+        key = annotation_key(record)
+        current = latest.get(key)
+        if current is None or record.get('annotation_time', '') >= current.get('annotation_time', ''):
+            latest[key] = record
+    return latest
+
+
+def load_annotators(paths):
+    """
+    Load annotation files into {annotator_id: {key: record}}.
+
+    The annotator is taken from each record's `annotator_id`, falling back
+    to the file name, so one file may hold several annotators and one
+    annotator may be spread over several files.
+    """
+    by_annotator = {}
+    for path in annotation_files(paths):
+        for record in iter_records(path):
+            annotator = record.get('annotator_id') or Path(path).stem
+            by_annotator.setdefault(annotator, []).append(record)
+    return {annotator: latest_records(records) for annotator, records in by_annotator.items()}
@@ -0,0 +1,96 @@
+"""
+Append-only write-ahead journal for local annotation saves.
+
+Each decision is appended to a JSONL journal as a single fsynced line, so a
+save costs O(1) regardless of session length and a crash can lose at most
+the line being written. The canonical `annotations_{id}.json` snapshot (same
+format as before) is rewritten atomically only on compaction, after which
+the journal is truncated. Loading replays the journal on top of the snapshot.
+"""
+
+import json
+import os
+from pathlib import Path
+
+COMPACT_EVERY = 50  # Journal records between snapshot rewrites
+
+
+def _record_id(record):
+    """Identity of a journal record, used to skip entries already compacted."""
+    return record.get('example_id'), record.get('evid_index'), record.get('annotation_time')
+
+
+def _fsync_dir(path):
+    """Persist a rename by syncing its directory (no-op where unsupported)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class AnnotationJournal:
+    """JSONL journal in front of a JSON snapshot of annotations."""
+
+    def __init__(self, snapshot_path, compact_every=COMPACT_EVERY):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = self.snapshot_path.with_suffix('.journal.jsonl')
+        self.compact_every = compact_every
+        self.pending = 0  # Records appended since the last compaction
+
+    def load(self):
+        """Return snapshot annotations followed by any journaled ones."""
+        annotations = []
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, 'r') as f:
+                annotations = json.load(f)
+
+        seen = {_record_id(a) for a in annotations}
+        replayed = 0
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r') as f:
+                lines = f.readlines()
+            for i, line in enumerate(lines):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if i == len(lines) - 1:
+                        break  # Torn final write from a crash
+                    raise
+                # Skip records compacted into the snapshot before the
+                # journal could be truncated
+                if _record_id(record) not in seen:
+                    annotations.append(record)
+                    replayed += 1
+        self.pending = replayed
+        return annotations
+
+    def append(self, record):
+        """Durably append one annotation record."""
+        with open(self.journal_path, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending += 1
+
+    def should_compact(self):
+        return self.pending >= self.compact_every
+
+    def compact(self, annotations):
+        """Atomically rewrite the snapshot from `annotations` and reset the journal."""
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(list(annotations), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.snapshot_path.parent)
+        # Truncate only after the snapshot is durable
+        with open(self.journal_path, 'w') as f:
+            os.fsync(f.fileno())
+        self.pending = 0
@@ -0,0 +1,113 @@
+"""
+Keyed in-memory annotation store.
+
+Annotations are keyed by (example_id, evid_index), so re-annotating an EVID
+replaces its record in place instead of appending a duplicate. The store
+tracks which records changed since the last successful remote sync (dirty
+keys) and the remote version (GitHub blob SHA) it was last synced against,
+so a save can write without re-downloading the remote file and a merge
+touches only records that actually differ.
+"""
+
+import threading
+
+
+def annotation_key(record):
+    """Return the (example_id, evid_index) key of an annotation record."""
+    return record['example_id'], record['evid_index']
+
+
+class AnnotationStore:
+    """Annotations keyed by (example_id, evid_index) with dirty tracking."""
+
+    def __init__(self, records=()):
+        self._records = {}  # key -> record, in first-annotated order
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self.version = 0  # Incremented on every local or merged change
+        self.remote_version = None  # Remote blob SHA last synced against
+        self.synced = False  # True once the remote state is known
+        self._listeners = []
+        for record in records:
+            self._records[annotation_key(record)] = record
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self.records())
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def get(self, key, default=None):
+        return self._records.get(key, default)
+
+    def records(self):
+        """Return a snapshot list of all records."""
+        with self._lock:
+            return list(self._records.values())
+
+    def snapshot(self):
+        """Return (version, records) taken atomically."""
+        with self._lock:
+            return self.version, list(self._records.values())
+
+    def subscribe(self, listener):
+        """Call `listener(record)` whenever a record is added or replaced."""
+        self._listeners.append(listener)
+
+    def put(self, record):
+        """Insert or replace the record for its key and mark it dirty."""
+        key = annotation_key(record)
+        with self._lock:
+            self._records[key] = record
+            self._dirty.add(key)
+            self.version += 1
+            for listener in self._listeners:
+                listener(record)
+
+    def dirty_count(self):
+        with self._lock:
+            return len(self._dirty)
+
+    def dirty_records(self):
+        """Return {key: record} for records changed since the last sync."""
+        with self._lock:
+            return {key: self._records[key] for key in self._dirty}
+
+    def mark_synced(self, flushed, remote_version):
+        """
+        Record a successful write of `flushed` ({key: record}) at `remote_version`.
+
+        Keys re-annotated after the snapshot was taken stay dirty.
+        """
+        with self._lock:
+            for key, record in flushed.items():
+                if self._records.get(key) is record:
+                    self._dirty.discard(key)
+            self.remote_version = remote_version
+            self.synced = True
+
+    def merge_remote(self, records, remote_version):
+        """
+        Merge the remote copy into the store; local dirty records win.
+
+        Returns:
+            int: Number of records added or updated from the remote copy
+        """
+        changed = 0
+        with self._lock:
+            for record in records:
+                key = annotation_key(record)
+                if key in self._dirty or self._records.get(key) == record:
+                    continue
+                self._records[key] = record
+                changed += 1
+                for listener in self._listeners:
+                    listener(record)
+            if changed:
+                self.version += 1
+            self.remote_version = remote_version
+            self.synced = True
+        return changed
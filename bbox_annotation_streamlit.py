@@ -8,23 +8,34 @@ Polished UI with interactive bbox editing, progress tracking, and auto-save.
 
 Usage:
     streamlit run bbox_annotation_streamlit.py -- --proposals bbox_proposals_qwen_v1.json --images pilot_dataset/ --annotator [YOUR_ID]
+    python bbox_annotation_streamlit.py --startup-report   # Import-time breakdown of a cold start
+
+Heavy modules (Pillow/NumPy, OpenCV, requests) are imported where they are
+first needed, so a new server process paints the setup screen without them.
 """
 
 import streamlit as st
-import json
-import requests
-try:
-    from github_saver import save_to_github, load_from_github, test_github_connection
-    GITHUB_SAVE_ENABLED = True
-except:
-    GITHUB_SAVE_ENABLED = False
-import cv2
-import numpy as np
+from streamlit.errors import StreamlitAPIException
+import sys
+from functools import cache
 from pathlib import Path
 import time
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
 import os
+from image_cache import image_cache
+from image_pyramid import display_level, load_display_image
+from bbox_canvas import bbox_canvas
+from prefetch import DEFAULT_AHEAD, Prefetcher, upcoming_image_paths
+import image_index
+from proposals_store import open_proposals
+from annotation_journal import AnnotationJournal
+from annotation_store import AnnotationStore
+from annotation_export import EXPORT_FORMATS, AnnotationExport
+from metrics import MetricsRegistry, bind_session, maybe_dump_metrics, process_metrics, timed
+from completion_index import CompletionIndex
+from grounding import grounding_tier
+from save_queue import DEFAULT_BATCH_SIZE, DEFAULT_MAX_DELAY, get_save_queue
+from scheduler import DEFAULT_LEASE_SECONDS, DEFAULT_OVERLAP, DEFAULT_OVERLAP_ANNOTATORS, Scheduler
 
 # Page config
 st.set_page_config(
@@ -74,38 +85,103 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+BBOX_SLIDER_KEYS = ('move_x', 'move_y', 'resize_x1', 'resize_y1', 'resize_x2', 'resize_y2')
+
+
 def initialize_session_state():
     """Initialize Streamlit session state variables."""
     if 'initialized' not in st.session_state:
         st.session_state.initialized = False
         st.session_state.authenticated = False  # Simple password protection
         st.session_state.data = None
-        st.session_state.annotations = []
+        st.session_state.annotations = AnnotationStore()
         st.session_state.current_idx = 0
         st.session_state.current_evid_idx = 0
+        st.session_state.completion = None
         st.session_state.bbox = None
+        st.session_state.bbox_revision = 0
+        st.session_state.canvas_seq = None
         st.session_state.original_bbox = None
         st.session_state.annotation_start_time = None
         st.session_state.flagged = False
         st.session_state.adjusting = False
         st.session_state.annotator_id = None
+        st.session_state.prefetcher = None
+        st.session_state.image_index = {}
+
+
+def get_setting(name, default=None):
+    """Read an optional setting from Streamlit secrets."""
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default  # No secrets.toml configured
 
 
+@timed('load_data')
 def load_data(proposals_path, images_dir, annotator_id):
-    """Load proposals and existing annotations."""
-    with open(proposals_path, 'r') as f:
-        data = json.load(f)
+    """Load shared proposals and this annotator's existing annotations."""
+    data = get_shared_proposals(proposals_path)
     
     images_dir = Path(images_dir)
     
-    # Check for existing annotations
-    output_path = f"annotations_{annotator_id}.json"
-    annotations = []
-    if os.path.exists(output_path):
-        with open(output_path, 'r') as f:
-            annotations = json.load(f)
+    # Check for existing annotations (snapshot + journaled decisions);
+    # later records for the same EVID replace earlier ones
+    journal = AnnotationJournal(f"annotations_{annotator_id}.json")
+    annotations = AnnotationStore(journal.load())
+    if journal.pending:
+        try:
+            journal.compact(annotations.records())
+        except OSError:
+            pass  # Read-only filesystem; the journal is replayed again next time
+    
+    # Resume from what is already saved on GitHub
+    if github_save_active():
+        load_github_saver().sync_store_from_github(annotations, annotator_id)
     
-    return data, annotations, images_dir, output_path
+    return data, annotations, images_dir, journal
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_shared_proposals(proposals_path, mtime_ns, size):
+    """
+    Parse proposals once per server process.
+
+    Every session holds a reference to the same object, so it must be treated
+    as read-only. The cache key includes the file's mtime and size, so an
+    updated proposals file is picked up by the next session that starts.
+    """
+    return open_proposals(proposals_path)
+
+
+def get_shared_proposals(proposals_path):
+    """Return the process-wide proposals object for `proposals_path`."""
+    stat = os.stat(proposals_path)
+    return load_shared_proposals(os.path.abspath(proposals_path), stat.st_mtime_ns, stat.st_size)
+
+
+@st.cache_resource(show_spinner=False)
+def load_image_index(images_dir, index_mtime_ns):
+    """Load the image metadata sidecar once per process (re-read when it changes)."""
+    return image_index.load_index(images_dir)
+
+
+def get_image_index(images_dir):
+    """Return the shared image metadata index for `images_dir` ({} if not built)."""
+    try:
+        index_mtime_ns = os.stat(image_index.index_path_for(images_dir)).st_mtime_ns
+    except OSError:
+        return {}
+    return load_image_index(str(images_dir), index_mtime_ns)
+
+
+def get_image_size(img_path):
+    """Return (width, height), preferring the precomputed image index."""
+    rel_path = Path(img_path).relative_to(st.session_state.images_dir).as_posix()
+    entry = st.session_state.image_index.get(rel_path)
+    if entry is not None and image_index.is_current(entry, img_path):
+        return entry['width'], entry['height']
+    return image_cache.size(img_path)
 
 
 def denormalize_bbox(bbox, img_shape):
@@ -143,14 +219,18 @@ def normalize_bbox(bbox, img_shape):
     return [x_c, y_c, box_w, box_h]
 
 
+@timed('draw_bbox_on_image')
 def draw_bbox_on_image(image_path, bbox, adjusted=False):
-    """Draw bbox on image and return PIL Image."""
-    # Load image
-    img = Image.open(image_path).convert('RGB')
+    """Draw source-pixel bbox on the display-resolution image and return PIL Image."""
+    from PIL import ImageDraw
+
+    # Load display level (decoded once per process, copied before drawing)
+    level = display_level(image_path)
+    img = load_display_image(level).copy()
     draw = ImageDraw.Draw(img)
     
     if bbox and bbox != "NO_VISIBLE_GROUNDING":
-        x1, y1, x2, y2 = bbox
+        x1, y1, x2, y2 = level.to_display(bbox)
         
         # Choose color
         color = (255, 165, 0) if adjusted else (0, 255, 0)  # Orange if adjusted, Green if original
@@ -167,6 +247,36 @@ def draw_bbox_on_image(image_path, bbox, adjusted=False):
     return img
 
 
+def render_bbox_overlay(image_path, bbox, adjusted=False, prefetch_levels=()):
+    """
+    Return HTML that layers an SVG bbox overlay on the cached display image.
+
+    The base image is referenced by its static URL, so the browser fetches it
+    once and only the few hundred bytes of SVG change on each adjustment.
+    Hidden <img> tags for `prefetch_levels` let the browser download the next
+    examples' images in the background.
+    """
+    level = display_level(image_path)
+    w, h = level.width, level.height
+    shapes = ''
+    
+    if bbox and bbox != "NO_VISIBLE_GROUNDING":
+        x1, y1, x2, y2 = (round(v, 1) for v in level.to_display(bbox))
+        color = 'rgb(255,165,0)' if adjusted else 'rgb(0,255,0)'  # Orange if adjusted, Green if original
+        shapes = (
+            f'<rect x="{x1}" y="{y1}" width="{x2 - x1}" height="{y2 - y1}" fill="none" '
+            f'stroke="{color}" stroke-width="3" vector-effect="non-scaling-stroke"/>'
+        )
+        for px, py in [(x1, y1), (x2, y1), (x1, y2), (x2, y2)]:
+            shapes += f'<circle cx="{px}" cy="{py}" r="8" fill="{color}" stroke="white"/>'
+    
+    return (
+        f'<svg viewBox="0 0 {w} {h}" width="100%" style="display:block" xmlns="http://www.w3.org/2000/svg">'
+        f'<image href="{level.url}" x="0" y="0" width="{w}" height="{h}"/>{shapes}</svg>'
+        + ''.join(f'<img src="{l.url}" style="display:none" alt="">' for l in prefetch_levels)
+    )
+
+
 def save_annotation(example, evid, decision, final_bbox, rejection_reason=None):
     """Save annotation to session state."""
     # Determine adjustment type
@@ -175,13 +285,7 @@ def save_annotation(example, evid, decision, final_bbox, rejection_reason=None):
         adjustment_type = 'both'  # Simplified
     
     # Determine grounding tier
-    if final_bbox == 'NO_VISIBLE_GROUNDING':
-        tier = 'tier3_no_grounding'
-    elif final_bbox is None:
-        tier = 'rejected'
-    else:
-        area = final_bbox[2] * final_bbox[3]
-        tier = 'tier1_tight' if area < 0.3 else 'tier2_anatomical'
+    tier = grounding_tier(final_bbox)
     
     # Create annotation entry
     annotation = {
@@ -204,62 +308,127 @@ def save_annotation(example, evid, decision, final_bbox, rejection_reason=None):
         'answer': example.get('answer', 'N/A')
     }
     
-    st.session_state.annotations.append(annotation)
+    st.session_state.annotations.put(annotation)  # Replaces an earlier decision on this EVID
     
     # Auto-save
-    save_progress()
+    save_progress(annotation)
+    
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        scheduler.complete(st.session_state.annotator_id, example['id'], st.session_state.current_evid_idx)
 
 
-def save_progress():
-    """Save progress to GitHub or local file."""
-    if GITHUB_SAVE_ENABLED and hasattr(st, 'secrets') and st.secrets.get('github_token'):
-        # First, load existing annotations from GitHub
-        try:
-            existing = load_from_github(st.session_state.annotator_id)
-            if existing:
-                # Merge: keep existing + add new ones not in existing
-                existing_ids = {(a['example_id'], a['evid_index']) for a in existing}
-                new_annotations = [a for a in st.session_state.annotations 
-                                 if (a['example_id'], a['evid_index']) not in existing_ids]
-                all_annotations = existing + new_annotations
-            else:
-                all_annotations = st.session_state.annotations
-        except:
-            all_annotations = st.session_state.annotations
-        
-        # Auto-save to GitHub with merged list
-        success, message = save_to_github(all_annotations, st.session_state.annotator_id)
-        if success and 'last_save_message' in dir(st.session_state):
-            st.session_state.last_save_message = message
+def save_progress(annotation):
+    """Save progress to GitHub or local file after `annotation` was recorded."""
+    if github_save_active():
+        # Hand off to the background worker; it merges with GitHub and commits
+        with timed('save_progress.github'):
+            get_github_save_queue().submit(st.session_state.annotations)
     else:
         # Fallback: local save (won't work on Streamlit Cloud - that's OK)
         try:
-            output_path = st.session_state.output_path
-            with open(output_path, 'w') as f:
-                json.dump(st.session_state.annotations, f, indent=2)
+            with timed('save_progress.local'):
+                journal = st.session_state.journal
+                journal.append(annotation)
+                if journal.should_compact():
+                    journal.compact(st.session_state.annotations.records())
         except:
             pass  # Silent fail on Streamlit Cloud
 
 
 
+@cache
+def load_github_saver():
+    """Import github_saver (and requests) on first use; None if unavailable."""
+    try:
+        import github_saver
+    except ImportError:
+        return None
+    return github_saver
+
+
+def github_save_active():
+    """Return True if annotations are saved to GitHub rather than locally."""
+    return bool(get_setting('github_token')) and load_github_saver() is not None
+
+
+def get_github_save_queue():
+    """Return the background GitHub save queue for the current annotator."""
+    annotator_id = st.session_state.annotator_id
+    return get_save_queue(
+        annotator_id,
+        lambda store: load_github_saver().save_store_to_github(store, annotator_id),
+        max_delay=float(get_setting('save_max_delay', DEFAULT_MAX_DELAY)),
+        batch_size=int(get_setting('save_batch_size', DEFAULT_BATCH_SIZE))
+    )
+
+
+def get_annotation_export():
+    """Return the memoized export of the current session's annotation store."""
+    export = st.session_state.get('annotation_export')
+    if export is None or export.store is not st.session_state.annotations:
+        export = st.session_state.annotation_export = AnnotationExport(st.session_state.annotations)
+    return export
+
+
+@st.cache_resource(show_spinner=False)
+def open_scheduler(db_path, lease_seconds):
+    """Open the shared work scheduler once per server process."""
+    return Scheduler(db_path, lease_seconds)
+
+
+def get_scheduler():
+    """Return the work scheduler, or None unless the `scheduler_db` setting is set."""
+    db_path = get_setting('scheduler_db')
+    if not db_path:
+        return None
+    lease_minutes = float(get_setting('scheduler_lease_minutes', DEFAULT_LEASE_SECONDS / 60))
+    return open_scheduler(db_path, lease_minutes * 60)
+
+
+def next_scheduled_evid():
+    """Return (example position, EVID index) of this annotator's next scheduled EVID, or None."""
+    scheduler = get_scheduler()
+    annotator_id = st.session_state.annotator_id
+    while True:
+        unit = scheduler.next_unit(annotator_id)
+        if unit is None:
+            return None
+        example_id, evid_idx = unit
+        example_idx = st.session_state.data.position(example_id)
+        if example_idx is None:
+            scheduler.release(annotator_id, example_id, evid_idx)  # Not in these proposals
+        elif st.session_state.completion.is_done(example_idx, evid_idx):
+            scheduler.complete(annotator_id, example_id, evid_idx)  # Annotated before scheduling
+        else:
+            return example_idx, evid_idx
+
+
 def next_evid():
-    """Move to next EVID or example."""
-    example = st.session_state.data[st.session_state.current_idx]
+    """Move to the next unannotated EVID in this or a later example (or the next scheduled one)."""
+    completion = st.session_state.completion
+    if get_scheduler() is not None:
+        next_position = next_scheduled_evid()
+    else:
+        pos = completion.position(st.session_state.current_idx, st.session_state.current_evid_idx)
+        next_position = completion.first_unannotated(pos + 1)
     
-    # Check if more EVIDs in current example
-    if st.session_state.current_evid_idx + 1 < len(example['evid_proposals']):
-        st.session_state.current_evid_idx += 1
+    if next_position is not None:
+        next_idx, next_evid_idx = next_position
+        if next_idx != st.session_state.current_idx:
+            st.session_state.flagged = False
+        st.session_state.current_idx = next_idx
+        st.session_state.current_evid_idx = next_evid_idx
         load_current_evid()
     else:
-        # Move to next example
-        if st.session_state.current_idx + 1 < len(st.session_state.data):
-            st.session_state.current_idx += 1
-            st.session_state.current_evid_idx = 0
-            st.session_state.flagged = False
-            load_current_evid()
-        else:
-            st.success("🎉 All examples completed!")
-            st.balloons()
+        st.session_state.current_idx = len(st.session_state.data)
+        # Leave a complete snapshot behind for whoever collects the files
+        try:
+            st.session_state.journal.compact(st.session_state.annotations.records())
+        except:
+            pass  # Silent fail on Streamlit Cloud
+        st.success("🎉 All examples completed!")
+        st.balloons()
 
 
 def load_current_evid():
@@ -271,15 +440,314 @@ def load_current_evid():
     proposed_bbox = evid.get('bbox', 'NO_VISIBLE_GROUNDING')
     if proposed_bbox != "NO_VISIBLE_GROUNDING":
         img_path = st.session_state.images_dir / example['image_path']
-        img = Image.open(img_path)
-        st.session_state.bbox = denormalize_bbox(proposed_bbox, (img.height, img.width, 3))
+        img_w, img_h = get_image_size(img_path)
+        set_bbox(denormalize_bbox(proposed_bbox, (img_h, img_w, 3)))
         st.session_state.original_bbox = st.session_state.bbox.copy() if st.session_state.bbox else None
     else:
-        st.session_state.bbox = "NO_VISIBLE_GROUNDING"
+        set_bbox("NO_VISIBLE_GROUNDING")
         st.session_state.original_bbox = "NO_VISIBLE_GROUNDING"
     
     st.session_state.annotation_start_time = time.time()
     st.session_state.adjusting = False
+    
+    schedule_prefetch()
+
+
+def set_bbox(bbox, from_canvas=False):
+    """
+    Replace the working bbox and keep the canvas and sliders in step.
+
+    Changes made on the server bump `bbox_revision` so the canvas picks them
+    up; a change coming from the canvas is already shown there. Slider state
+    is dropped so the sliders re-initialize from the new bbox.
+    """
+    st.session_state.bbox = bbox
+    if not from_canvas:
+        st.session_state.bbox_revision = st.session_state.get('bbox_revision', 0) + 1
+    for key in BBOX_SLIDER_KEYS:
+        st.session_state.pop(key, None)
+
+
+def schedule_prefetch():
+    """Warm image caches for the next unannotated examples in the background."""
+    prefetcher = st.session_state.get('prefetcher')
+    if prefetcher is None:
+        return
+    prefetcher.schedule(upcoming_image_paths(
+        st.session_state.data, st.session_state.images_dir,
+        st.session_state.current_idx, prefetcher.ahead,
+        skip=st.session_state.completion.example_done
+    ))
+
+
+def session_metrics():
+    """Return this session's MetricsRegistry and record this thread's timings into it."""
+    registry = st.session_state.get('metrics')
+    if registry is None:
+        registry = st.session_state.metrics = MetricsRegistry()
+    bind_session(registry)
+    return registry
+
+
+def is_admin():
+    """Return True if the current annotator is listed in the `admin_ids` setting."""
+    admin_ids = get_setting('admin_ids', [])
+    if isinstance(admin_ids, str):
+        admin_ids = [admin_id.strip() for admin_id in admin_ids.split(',')]
+    return st.session_state.annotator_id in admin_ids
+
+
+def metrics_panel():
+    """Sidebar latency percentiles for this session and the server process."""
+    with st.expander("📊 Performance (admin)"):
+        scope = st.radio("Scope", ["Session", "Process"], key="metrics_scope", horizontal=True)
+        registry = st.session_state.metrics if scope == "Session" else process_metrics
+        summaries = registry.summaries()
+        if not summaries:
+            st.caption("No timings recorded yet")
+            return
+        st.dataframe(
+            [{'phase': phase, **summary} for phase, summary in summaries.items()],
+            hide_index=True
+        )
+        st.caption(f"Percentiles over the last {registry.window} samples per phase")
+        st.download_button("⬇️ Prometheus", data=lambda: registry.prometheus(),
+                           file_name="metrics.prom", mime="text/plain", on_click='ignore')
+        st.download_button("⬇️ JSONL", data=lambda: registry.jsonl(scope=scope.lower()),
+                           file_name="metrics.jsonl", mime="application/jsonl", on_click='ignore')
+
+
+def rerun_fragment():
+    """Rerun the calling fragment, or the whole script if not in a fragment rerun."""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # A fragment also runs as part of full script runs, where a
+        # fragment-scoped rerun is not allowed
+        st.rerun()
+
+
+@st.fragment
+@timed('bbox_editor')
+def bbox_editor(img_path):
+    """Image panel and bbox sliders; an adjustment reruns only this fragment."""
+    session_metrics()
+    
+    # Display image with bbox
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.markdown("### 🖼️ Image with Bbox")
+        
+        # Overlay-only rendering needs static serving; otherwise draw server-side
+        overlay_enabled = st.get_option('server.enableStaticServing')
+        prefetcher = st.session_state.get('prefetcher')
+        prefetch_levels = prefetcher.ready_levels() if prefetcher else ()
+        
+        if st.session_state.bbox == "NO_VISIBLE_GROUNDING":
+            # Just show image without bbox
+            if overlay_enabled:
+                st.markdown(render_bbox_overlay(img_path, None, prefetch_levels=prefetch_levels),
+                            unsafe_allow_html=True)
+            else:
+                with timed('st_image'):
+                    st.image(str(display_level(img_path).path), use_container_width=True)
+            st.info("**NO_VISIBLE_GROUNDING** - No bbox proposed")
+        else:
+            # Draw bbox on image
+            if overlay_enabled:
+                # Geometry is handled in the browser; only the release comes back
+                canvas_key = f"bbox_canvas_{st.session_state.current_idx}_{st.session_state.current_evid_idx}"
+                value = bbox_canvas(
+                    display_level(img_path), st.session_state.bbox, st.session_state.original_bbox,
+                    revision=st.session_state.bbox_revision,
+                    prefetch_urls=[level.url for level in prefetch_levels],
+                    key=canvas_key
+                )
+                if value and (canvas_key, value['seq']) != st.session_state.get('canvas_seq'):
+                    st.session_state.canvas_seq = (canvas_key, value['seq'])
+                    set_bbox([int(v) for v in value['bbox']], from_canvas=True)
+            adjusted = (st.session_state.bbox != st.session_state.original_bbox)
+            if not overlay_enabled:
+                img_with_bbox = draw_bbox_on_image(img_path, st.session_state.bbox, adjusted)
+                with timed('st_image'):
+                    st.image(img_with_bbox, use_container_width=True)
+            
+            # Color legend
+            if adjusted:
+                st.markdown("🟠 **Orange**: Adjusted bbox | 🟢 **Green**: Original bbox")
+            else:
+                st.markdown("🟢 **Green**: Proposed bbox")
+    
+    with col2:
+        st.markdown("### ⚙️ Bbox Adjustment")
+        
+        if st.session_state.bbox != "NO_VISIBLE_GROUNDING" and st.session_state.bbox is not None:
+            # Load image dimensions
+            img_w, img_h = get_image_size(img_path)
+            
+            if overlay_enabled:
+                st.caption("Drag the box to move it, drag a handle to resize, or drag on the image to draw a new box.")
+            
+            # Sliders for pixel-exact adjustments (or when the canvas is unavailable)
+            sliders = st.expander("🎚️ Fine-tune with sliders") if overlay_enabled else st.container()
+            with sliders:
+                # Adjustment mode
+                adjust_mode = st.radio("Adjustment Mode", ["Move", "Resize"], key="adjust_mode")
+            
+                x1, y1, x2, y2 = st.session_state.bbox
+            
+                if adjust_mode == "Move":
+                    st.markdown("**Move Bbox**")
+                    # Calculate valid ranges (ensure min < max)
+                    bbox_w = x2 - x1
+                    bbox_h = y2 - y1
+                    max_x = img_w - bbox_w
+                    max_y = img_h - bbox_h
+                
+                    # Check if bbox can be moved
+                    if max_x > 0 and max_y > 0:
+                        new_x1 = st.slider("X Position", 0, max_x, min(x1, max_x), key="move_x")
+                        new_y1 = st.slider("Y Position", 0, max_y, min(y1, max_y), key="move_y")
+                    
+                        if new_x1 != x1 or new_y1 != y1:
+                            dx = new_x1 - x1
+                            dy = new_y1 - y1
+                            set_bbox([x1 + dx, y1 + dy, x2 + dx, y2 + dy])
+                            rerun_fragment()
+                    else:
+                        st.info(" Bbox is full width/height - cannot move. Use Resize instead.")
+            
+                else:  # Resize
+                    st.markdown("**Resize Bbox**")
+                    # Calculate valid ranges (min 10px bbox size)
+                    max_left_x = max(0, x2 - 10)
+                    max_top_y = max(0, y2 - 10)
+                    min_right_x = min(img_w, x1 + 10)
+                    min_bottom_y = min(img_h, y1 + 10)
+                
+                    # Only show sliders if valid ranges exist
+                    if max_left_x >= 0:
+                        new_x1 = st.slider("Left X", 0, max_left_x, min(x1, max_left_x), key="resize_x1")
+                    else:
+                        new_x1 = x1
+                    
+                    if max_top_y >= 0:
+                        new_y1 = st.slider("Top Y", 0, max_top_y, min(y1, max_top_y), key="resize_y1")
+                    else:
+                        new_y1 = y1
+                    
+                    if min_right_x <= img_w:
+                        new_x2 = st.slider("Right X", min_right_x, img_w, max(x2, min_right_x), key="resize_x2")
+                    else:
+                        new_x2 = x2
+                    
+                    if min_bottom_y <= img_h:
+                        new_y2 = st.slider("Bottom Y", min_bottom_y, img_h, max(y2, min_bottom_y), key="resize_y2")
+                    else:
+                        new_y2 = y2
+                
+                    if [new_x1, new_y1, new_x2, new_y2] != [x1, y1, x2, y2]:
+                        set_bbox([new_x1, new_y1, new_x2, new_y2])
+                        rerun_fragment()
+            
+            # Snap and reset buttons
+            snap_col, reset_col = st.columns(2)
+            with snap_col:
+                if st.button("🧲 Snap to Edges", help="Move each side to the nearest strong image boundary"):
+                    from snap import snap_bbox  # OpenCV/NumPy load on the first snap, not at startup
+                    snapped = snap_bbox(display_level(img_path), st.session_state.bbox)
+                    if snapped != st.session_state.bbox:
+                        set_bbox(snapped)
+                        rerun_fragment()
+                    st.info("No strong edge near the box")
+            with reset_col:
+                if st.button("🔄 Reset to Original"):
+                    set_bbox(st.session_state.original_bbox.copy())
+                    rerun_fragment()
+        
+        else:
+            st.info("No bbox to adjust (NO_VISIBLE_GROUNDING)")
+
+
+@st.fragment
+def decision_panel(example, evid, img_path):
+    """Decision buttons and reject dialog; a decision reruns the whole app."""
+    session_metrics()
+    # Decision buttons
+    st.markdown("---")
+    st.markdown("### ✅ Decision")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        if st.button("✅ Accept", type="primary", use_container_width=True):
+            # Determine if adjusted
+            decision = 'adjust' if st.session_state.bbox != st.session_state.original_bbox else 'accept'
+            
+            # Normalize bbox
+            if st.session_state.bbox != "NO_VISIBLE_GROUNDING":
+                img_w, img_h = get_image_size(img_path)
+                final_bbox = normalize_bbox(st.session_state.bbox, (img_h, img_w, 3))
+            else:
+                final_bbox = "NO_VISIBLE_GROUNDING"
+            
+            save_annotation(example, evid, decision, final_bbox)
+            next_evid()
+            st.rerun()
+    
+    with col2:
+        if st.button("❌ Reject", use_container_width=True):
+            st.session_state.show_reject_dialog = True
+    
+    with col3:
+        if st.button("🚫 No Grounding", use_container_width=True):
+            save_annotation(example, evid, 'no_grounding', 'NO_VISIBLE_GROUNDING')
+            next_evid()
+            st.rerun()
+    
+    with col4:
+        if st.button("⏭️ Skip (Temp)", use_container_width=True):
+            scheduler = get_scheduler()
+            if scheduler is not None:
+                # Hand the EVID to another annotator
+                scheduler.release(st.session_state.annotator_id, example['id'], st.session_state.current_evid_idx)
+            next_evid()
+            st.rerun()
+    
+    # Reject dialog
+    if st.session_state.get('show_reject_dialog', False):
+        st.markdown('<div class="warning-box">', unsafe_allow_html=True)
+        st.markdown("### ❌ Rejection Reason")
+        
+        reason = st.selectbox(
+            "Select reason",
+            [
+                "Wrong anatomy",
+                "Wrong laterality",
+                "Hallucinated finding",
+                "Modality mismatch",
+                "Phrase-image mismatch",
+                "Other (specify below)"
+            ]
+        )
+        
+        if reason == "Other (specify below)":
+            reason = st.text_input("Specify reason")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Confirm Reject", type="primary"):
+                save_annotation(example, evid, 'reject', None, rejection_reason=reason)
+                st.session_state.show_reject_dialog = False
+                next_evid()
+                st.rerun()
+        with col2:
+            if st.button("Cancel"):
+                st.session_state.show_reject_dialog = False
+                rerun_fragment()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
 
 
 def main():
@@ -309,7 +777,7 @@ def main():
             proposals_path = st.text_input(
                 "Proposals JSON Path",
                 value="bbox_proposals_qwen_v1.json",
-                help="Path to bbox_proposals_qwen_v1.json"
+                help="Path to bbox_proposals_qwen_v1.json (or an indexed .sqlite built by proposals_store.py)"
             )
             
             images_dir = st.text_input(
@@ -333,18 +801,42 @@ def main():
                     st.error(f"Images directory not found: {images_dir}")
                 else:
                     with st.spinner("Loading data..."):
-                        data, annotations, images_dir_path, output_path = load_data(
+                        data, annotations, images_dir_path, journal = load_data(
                             proposals_path, images_dir, annotator_id
                         )
                         
                         st.session_state.data = data
                         st.session_state.annotations = annotations
                         st.session_state.images_dir = images_dir_path
-                        st.session_state.output_path = output_path
+                        st.session_state.image_index = get_image_index(images_dir_path)
+                        st.session_state.journal = journal
+                        st.session_state.output_path = str(journal.snapshot_path)
                         st.session_state.annotator_id = annotator_id
-                        st.session_state.current_idx = len(annotations)  # Resume
+                        st.session_state.completion = CompletionIndex(data, annotations)
                         st.session_state.initialized = True
                         
+                        # Resume at the first unannotated EVID (or this annotator's
+                        # leased/next scheduled one when the shared scheduler is on)
+                        scheduler = get_scheduler()
+                        if scheduler is not None:
+                            scheduler.initialize(
+                                data,
+                                overlap=float(get_setting('scheduler_overlap', DEFAULT_OVERLAP)),
+                                overlap_annotators=int(get_setting('scheduler_overlap_annotators',
+                                                                   DEFAULT_OVERLAP_ANNOTATORS))
+                            )
+                            resume = next_scheduled_evid()
+                        else:
+                            resume = st.session_state.completion.first_unannotated()
+                        if resume is not None:
+                            st.session_state.current_idx, st.session_state.current_evid_idx = resume
+                        else:
+                            st.session_state.current_idx = len(data)
+                        st.session_state.prefetcher = Prefetcher(
+                            ahead=int(get_setting('prefetch_ahead', DEFAULT_AHEAD)),
+                            decode=not st.get_option('server.enableStaticServing')
+                        )
+                        
                         # Load first unannotated example
                         if st.session_state.current_idx < len(data):
                             load_current_evid()
@@ -352,24 +844,30 @@ def main():
                         st.rerun()
         
         else:
+            # Keep this annotator's leases alive while they work
+            scheduler = get_scheduler()
+            if scheduler is not None:
+                scheduler.renew(st.session_state.annotator_id)
+            
             # Progress tracking
             st.markdown("### 📊 Progress")
-            total_evids = sum(len(ex['evid_proposals']) for ex in st.session_state.data)
-            progress = len(st.session_state.annotations) / total_evids
+            completion = st.session_state.completion
+            total_evids = completion.total_evids
+            progress = completion.done_count / total_evids if total_evids else 1.0
             st.progress(progress)
-            st.metric("Annotations", f"{len(st.session_state.annotations)}/{total_evids}")
-            st.metric("Examples", f"{st.session_state.current_idx + 1}/{len(st.session_state.data)}")
+            st.metric("Annotations", f"{completion.done_count}/{total_evids}")
+            st.metric("Examples", f"{min(st.session_state.current_idx + 1, len(st.session_state.data))}/{len(st.session_state.data)}")
             
             # Current example info
-            st.markdown("---")
-            st.markdown("### 📍 Current")
-            example = st.session_state.data[st.session_state.current_idx]
-            evid = example['evid_proposals'][st.session_state.current_evid_idx]
-            
-            st.markdown(f"**Example ID:** `{example['id']}`")
-            st.markdown(f"**EVID:** {st.session_state.current_evid_idx + 1}/{len(example['evid_proposals'])}")
-            st.markdown(f"**Dataset:** {example.get('dataset', 'N/A')}")
-            st.markdown(f"**Complexity:** {example.get('proxy_complexity', 'N/A')}")
+            if st.session_state.current_idx < len(st.session_state.data):
+                st.markdown("---")
+                st.markdown("### 📍 Current")
+                example = st.session_state.data[st.session_state.current_idx]
+                
+                st.markdown(f"**Example ID:** `{example['id']}`")
+                st.markdown(f"**EVID:** {st.session_state.current_evid_idx + 1}/{len(example['evid_proposals'])}")
+                st.markdown(f"**Dataset:** {example.get('dataset', 'N/A')}")
+                st.markdown(f"**Complexity:** {example.get('proxy_complexity', 'N/A')}")
             
             # Flag toggle
             st.markdown("---")
@@ -379,11 +877,11 @@ def main():
             st.markdown("---")
             st.markdown("### 📈 Session Stats")
             if st.session_state.annotations:
-                decisions = [a['decision'] for a in st.session_state.annotations]
-                st.metric("Accept", decisions.count('accept'))
-                st.metric("Adjust", decisions.count('adjust'))
-                st.metric("Reject", decisions.count('reject'))
-                st.metric("No Grounding", decisions.count('no_grounding'))
+                decisions = completion.decision_counts
+                st.metric("Accept", decisions['accept'])
+                st.metric("Adjust", decisions['adjust'])
+                st.metric("Reject", decisions['reject'])
+                st.metric("No Grounding", decisions['no_grounding'])
             
             # Help
             st.markdown("---")
@@ -391,16 +889,37 @@ def main():
         if len(st.session_state.annotations) > 0:
             st.markdown("---")
             st.markdown("### 💾 Save Progress")
-            annotations_json = json.dumps(st.session_state.annotations, indent=2)
+            if github_save_active():
+                save_status = get_github_save_queue().status()
+                st.caption(f"☁️ GitHub queue: {save_status['depth']} pending"
+                           + (" (saving...)" if save_status['flushing'] else ""))
+                if save_status['last_flush_time']:
+                    st.caption(f"{save_status['last_message']} "
+                               f"(last sync {save_status['last_flush_time'].strftime('%H:%M:%S')})")
+                if save_status['failing']:
+                    st.error(f"GitHub saving failed {save_status['consecutive_failures']} times in a row; "
+                             f"retrying in {save_status['next_retry_in']:.0f}s. "
+                             "Download your annotations to keep a copy.")
+            export_format = st.radio(
+                "Format", list(EXPORT_FORMATS), format_func=lambda fmt: EXPORT_FORMATS[fmt][0],
+                key='export_format', horizontal=True,
+                help="Compact and gzip files are much smaller to download"
+            )
+            _, suffix, mime = EXPORT_FORMATS[export_format]
+            # Built on click (on a separate thread) and reused until the annotations change
             st.download_button(
                 label=f"⬇️ Download {len(st.session_state.annotations)} Annotations",
-                data=annotations_json,
-                file_name=f"annotations_{st.session_state.annotator_id}.json",
-                mime="application/json",
+                data=get_annotation_export().data(export_format),
+                file_name=f"annotations_{st.session_state.annotator_id}{suffix}",
+                mime=mime,
+                on_click='ignore',
                 use_container_width=True
             )
             st.info("💡 Download frequently to save your progress!")
         
+        if st.session_state.initialized and is_admin():
+            metrics_panel()
+        
         if st.button("❓ Show Guidelines"):
                 st.session_state.show_help = True
     
@@ -460,174 +979,8 @@ def main():
         st.error(f"Image not found: {img_path}")
         return
     
-    # Display image with bbox
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        st.markdown("### 🖼️ Image with Bbox")
-        
-        if st.session_state.bbox == "NO_VISIBLE_GROUNDING":
-            # Just show image without bbox
-            st.image(str(img_path), use_container_width=True)
-            st.info("**NO_VISIBLE_GROUNDING** - No bbox proposed")
-        else:
-            # Draw bbox on image
-            adjusted = (st.session_state.bbox != st.session_state.original_bbox)
-            img_with_bbox = draw_bbox_on_image(img_path, st.session_state.bbox, adjusted)
-            st.image(img_with_bbox, use_container_width=True)
-            
-            # Color legend
-            if adjusted:
-                st.markdown("🟠 **Orange**: Adjusted bbox | 🟢 **Green**: Original bbox")
-            else:
-                st.markdown("🟢 **Green**: Proposed bbox")
-    
-    with col2:
-        st.markdown("### ⚙️ Bbox Adjustment")
-        
-        if st.session_state.bbox != "NO_VISIBLE_GROUNDING" and st.session_state.bbox is not None:
-            # Load image dimensions
-            img = Image.open(img_path)
-            img_w, img_h = img.size
-            
-            # Adjustment mode
-            adjust_mode = st.radio("Adjustment Mode", ["Move", "Resize"], key="adjust_mode")
-            
-            x1, y1, x2, y2 = st.session_state.bbox
-            
-            if adjust_mode == "Move":
-                st.markdown("**Move Bbox**")
-                # Calculate valid ranges (ensure min < max)
-                bbox_w = x2 - x1
-                bbox_h = y2 - y1
-                max_x = img_w - bbox_w
-                max_y = img_h - bbox_h
-                
-                # Check if bbox can be moved
-                if max_x > 0 and max_y > 0:
-                    new_x1 = st.slider("X Position", 0, max_x, min(x1, max_x), key="move_x")
-                    new_y1 = st.slider("Y Position", 0, max_y, min(y1, max_y), key="move_y")
-                    
-                    if new_x1 != x1 or new_y1 != y1:
-                        dx = new_x1 - x1
-                        dy = new_y1 - y1
-                        st.session_state.bbox = [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
-                        st.rerun()
-                else:
-                    st.info(" Bbox is full width/height - cannot move. Use Resize instead.")
-                    st.rerun()
-            
-            else:  # Resize
-                st.markdown("**Resize Bbox**")
-                # Calculate valid ranges (min 10px bbox size)
-                max_left_x = max(0, x2 - 10)
-                max_top_y = max(0, y2 - 10)
-                min_right_x = min(img_w, x1 + 10)
-                min_bottom_y = min(img_h, y1 + 10)
-                
-                # Only show sliders if valid ranges exist
-                if max_left_x >= 0:
-                    new_x1 = st.slider("Left X", 0, max_left_x, min(x1, max_left_x), key="resize_x1")
-                else:
-                    new_x1 = x1
-                    
-                if max_top_y >= 0:
-                    new_y1 = st.slider("Top Y", 0, max_top_y, min(y1, max_top_y), key="resize_y1")
-                else:
-                    new_y1 = y1
-                    
-                if min_right_x <= img_w:
-                    new_x2 = st.slider("Right X", min_right_x, img_w, max(x2, min_right_x), key="resize_x2")
-                else:
-                    new_x2 = x2
-                    
-                if min_bottom_y <= img_h:
-                    new_y2 = st.slider("Bottom Y", min_bottom_y, img_h, max(y2, min_bottom_y), key="resize_y2")
-                else:
-                    new_y2 = y2
-                
-                if [new_x1, new_y1, new_x2, new_y2] != [x1, y1, x2, y2]:
-                    st.session_state.bbox = [new_x1, new_y1, new_x2, new_y2]
-                    st.rerun()
-            
-            # Reset button
-            if st.button("🔄 Reset to Original"):
-                st.session_state.bbox = st.session_state.original_bbox.copy()
-                st.rerun()
-        
-        else:
-            st.info("No bbox to adjust (NO_VISIBLE_GROUNDING)")
-    
-    # Decision buttons
-    st.markdown("---")
-    st.markdown("### ✅ Decision")
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        if st.button("✅ Accept", type="primary", use_container_width=True):
-            # Determine if adjusted
-            decision = 'adjust' if st.session_state.bbox != st.session_state.original_bbox else 'accept'
-            
-            # Normalize bbox
-            if st.session_state.bbox != "NO_VISIBLE_GROUNDING":
-                img = Image.open(img_path)
-                final_bbox = normalize_bbox(st.session_state.bbox, (img.height, img.width, 3))
-            else:
-                final_bbox = "NO_VISIBLE_GROUNDING"
-            
-            save_annotation(example, evid, decision, final_bbox)
-            next_evid()
-            st.rerun()
-    
-    with col2:
-        if st.button("❌ Reject", use_container_width=True):
-            st.session_state.show_reject_dialog = True
-    
-    with col3:
-        if st.button("🚫 No Grounding", use_container_width=True):
-            save_annotation(example, evid, 'no_grounding', 'NO_VISIBLE_GROUNDING')
-            next_evid()
-            st.rerun()
-    
-    with col4:
-        if st.button("⏭️ Skip (Temp)", use_container_width=True):
-            next_evid()
-            st.rerun()
-    
-    # Reject dialog
-    if st.session_state.get('show_reject_dialog', False):
-        st.markdown('<div class="warning-box">', unsafe_allow_html=True)
-        st.markdown("### ❌ Rejection Reason")
-        
-        reason = st.selectbox(
-            "Select reason",
-            [
-                "Wrong anatomy",
-                "Wrong laterality",
-                "Hallucinated finding",
-                "Modality mismatch",
-                "Phrase-image mismatch",
-                "Other (specify below)"
-            ]
-        )
-        
-        if reason == "Other (specify below)":
-            reason = st.text_input("Specify reason")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Confirm Reject", type="primary"):
-                save_annotation(example, evid, 'reject', None, rejection_reason=reason)
-                st.session_state.show_reject_dialog = False
-                next_evid()
-                st.rerun()
-        with col2:
-            if st.button("Cancel"):
-                st.session_state.show_reject_dialog = False
-                st.rerun()
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+    bbox_editor(img_path)
+    decision_panel(example, evid, img_path)
     
     # Guidelines modal
     if st.session_state.get('show_help', False):
@@ -668,5 +1021,22 @@ def main():
                 st.rerun()
 
 
+def run():
+    """Run the app, timing the full-script rerun."""
+    session_metrics()
+    try:
+        with timed('rerun'):
+            main()
+    finally:
+        # Optional local dump for a scraper (*.prom: Prometheus text, else JSONL)
+        metrics_path = get_setting('metrics_path')
+        if metrics_path:
+            maybe_dump_metrics(metrics_path)
+
+
 if __name__ == '__main__':
-    main()
+    if '--startup-report' in sys.argv[1:]:
+        from startup_report import print_startup_report
+        print_startup_report()
+    else:
+        run()
@@ -0,0 +1,62 @@
+"""
+Click-and-drag bbox editor (Streamlit custom component).
+
+The browser draws the display image with the bbox on top and handles all
+geometry locally: dragging the box moves it, dragging a corner or edge
+handle resizes it, and dragging on empty image area draws a new box. The
+final [x1, y1, x2, y2] in source pixels is sent back once, on release, so
+an adjustment costs a single server round trip instead of one per slider
+step.
+
+The frontend is plain HTML/JS (no build step) speaking the component
+message protocol directly. The image is loaded from Streamlit static
+serving, so `server.enableStaticServing` must be on.
+"""
+
+from functools import cache
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+FRONTEND_DIR = Path(__file__).resolve().parent / 'frontend'
+MIN_BOX_SIZE = 10  # Source pixels, same as the resize sliders
+
+
+@cache
+def _component():
+    """Declare the component on first render (declaring inspects every loaded module; ~50 ms)."""
+    return components.declare_component('bbox_canvas', path=str(FRONTEND_DIR))
+
+
+def bbox_canvas(level, bbox, original_bbox=None, revision=0, prefetch_urls=(), key=None):
+    """
+    Render the editor for display level `level` of an image.
+
+    Args:
+        level: image_pyramid.DisplayLevel of the image
+        bbox: Current [x1, y1, x2, y2] in source pixels
+        original_bbox: Proposed bbox, outlined while `bbox` differs from it
+        revision: Changes whenever the bbox is changed server-side (load,
+            reset, sliders); the browser only replaces its local box then
+        prefetch_urls: Image URLs the browser should fetch in the background
+        key: Widget key; use a new key per EVID
+
+    Returns:
+        dict or None: {'bbox': [x1, y1, x2, y2], 'seq': n} of the latest
+            drag, where `seq` increases with every release; None before
+            the first drag
+    """
+    return _component()(
+        image_url=level.url,
+        width=level.width,
+        height=level.height,
+        source_width=level.source_width,
+        source_height=level.source_height,
+        bbox=list(bbox),
+        original_bbox=list(original_bbox) if original_bbox else None,
+        revision=revision,
+        min_size=MIN_BOX_SIZE,
+        prefetch_urls=list(prefetch_urls),
+        key=key,
+        default=None
+    )
@@ -0,0 +1,66 @@
+"""
+Vectorized bbox helpers shared by the offline analysis tools.
+
+Annotation records store boxes as normalized [x_c, y_c, w, h], or the
+string NO_VISIBLE_GROUNDING, or None for rejected EVIDs. These helpers turn
+such values into NumPy arrays of corner boxes plus a per-record kind code,
+and compute IoU for whole arrays at once. The kind codes and the tier rule
+come from grounding.py, which does not need NumPy.
+"""
+
+import numpy as np
+
+from grounding import (  # noqa: F401  (re-exported for the analysis tools)
+    KIND_BOX, KIND_MISSING, KIND_NAMES, KIND_NO_GROUNDING, KIND_REJECTED, NO_GROUNDING, TIGHT_AREA,
+    bbox_kind, grounding_tier,
+)
+
+
+def center_to_xyxy(boxes):
+    """Convert normalized [x_c, y_c, w, h] boxes (..., 4) to [x1, y1, x2, y2]."""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    half = boxes[..., 2:] / 2
+    return np.concatenate([boxes[..., :2] - half, boxes[..., :2] + half], axis=-1)
+
+
+def xyxy_to_center(boxes):
+    """Convert [x1, y1, x2, y2] boxes (..., 4) to [x_c, y_c, w, h]."""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    return np.concatenate([(boxes[..., :2] + boxes[..., 2:]) / 2,
+                           boxes[..., 2:] - boxes[..., :2]], axis=-1)
+
+
+def box_area(boxes):
+    """Area of [x1, y1, x2, y2] boxes (..., 4); inverted boxes have area 0."""
+    wh = np.clip(boxes[..., 2:] - boxes[..., :2], 0, None)
+    return wh[..., 0] * wh[..., 1]
+
+
+def iou(a, b):
+    """
+    Elementwise IoU of [x1, y1, x2, y2] boxes a and b (broadcastable (..., 4)).
+
+    Pairs where both boxes are empty have IoU 0.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    lt = np.maximum(a[..., :2], b[..., :2])
+    rb = np.minimum(a[..., 2:], b[..., 2:])
+    inter = box_area(np.concatenate([lt, rb], axis=-1))
+    union = box_area(a) + box_area(b) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def records_to_arrays(values):
+    """
+    Convert a sequence of bbox values into (kinds int8 (n,), xyxy float64 (n, 4)).
+
+    Rows that are not boxes are NaN in the box array.
+    """
+    n = len(values)
+    kinds = np.fromiter((bbox_kind(v) for v in values), dtype=np.int8, count=n)
+    centers = np.full((n, 4), np.nan)
+    box_rows = np.flatnonzero(kinds == KIND_BOX)
+    if len(box_rows):
+        centers[box_rows] = [values[i] for i in box_rows]
+    return kinds, center_to_xyxy(centers)
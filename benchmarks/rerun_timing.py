@@ -0,0 +1,65 @@
+"""
+Per-interaction server time: full-script rerun vs. fragment-scoped rerun.
+
+A bbox slider change used to re-execute the whole app script (CSS, sidebar,
+stats, download payload, image panel). The bbox editor now runs as a
+fragment, so an adjustment re-executes only that fragment. This drives the
+app with Streamlit's AppTest, moves the bbox repeatedly and reports the
+server time of full-script reruns ("before") and of fragment-scoped reruns
+of the bbox editor ("after").
+
+The measurement is run_benchmarks.bench_bbox_adjust (also part of the full
+benchmark report); this script runs only that entry, in the same local mode.
+
+Usage:
+    python benchmarks/rerun_timing.py [--iterations 20] [--proposals FILE --images DIR]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from run_benchmarks import bench_bbox_adjust, local_app_dir
+
+import synth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-script and fragment rerun time")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--proposals', help="Proposals file (default: synthetic)")
+    parser.add_argument('--images', help="Images directory for --proposals")
+    args = parser.parse_args()
+    if bool(args.proposals) != bool(args.images):
+        parser.error("--proposals and --images go together")
+
+    workdir = None
+    if args.proposals:
+        proposals, images_dir = Path(args.proposals).resolve(), Path(args.images).resolve()
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix='bbox_rerun_'))
+        images_dir, proposals = workdir / 'images', workdir / 'proposals.json'
+        names = synth.generate_images(images_dir, synth.DEFAULT_SIZES[:1], synth.DEFAULT_FORMATS[:1], 0)
+        synth.generate_proposals(proposals, 1000, names, 0)
+
+    try:
+        with local_app_dir():
+            result = bench_bbox_adjust(proposals, images_dir, args.iterations)
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if not result:
+        sys.exit("No EVID with a movable bbox found")
+
+    before = result['full_script']['median_ms']
+    after = result['fragment']['median_ms']
+    print(f"Per bbox adjustment (median of {args.iterations}):")
+    print(f"  full-script rerun (before): {before:8.2f} ms")
+    print(f"  bbox_editor fragment (after): {after:6.2f} ms")
+    print(f"  speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+"""
+Benchmark harness for the annotation app's hot paths.
+
+Generates synthetic proposals and images (see synth.py) in a work directory
+and times:
+
+- load_data: proposals parse (cold, i.e. cache cleared, and warm) for each
+  EVID count, for the JSON file and the indexed SQLite store
+- denormalize_bbox / normalize_bbox: per call
+- draw_bbox_on_image: per image size and format, cold (display level built
+  from the source) and warm (level cached)
+- save_progress: local journal path, per saved annotation
+- annotate_cycle: one Accept click on an EVID, driven through AppTest
+- bbox_adjust: server time of one slider adjustment handled as full-script
+  reruns (what every adjustment cost before the bbox editor became a
+  fragment, and what AppTest does by default) vs. fragment-scoped reruns
+  (what the browser requests for a widget inside the fragment)
+
+Every entry reports n, mean, median, p95, min and max in milliseconds. The
+JSON report also records the Python/Streamlit versions and the parameters,
+so runs on the same machine can be compared to catch regressions.
+
+The app always runs in local mode here: secrets.toml is replaced by
+LOCAL_SECRETS (no GitHub saves, no shared scheduler), and the working
+directory is a temporary one, so local annotation files never land in the
+repository.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--evids 1000,10000,100000] [--sizes 640x480,6000x4000]
+        [--formats jpg,png] [--output benchmarks/results/report.json] [--skip-apptest]
+"""
+
+import argparse
+import dataclasses
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = REPO_ROOT / 'bbox_annotation_streamlit.py'
+sys.path.insert(0, str(REPO_ROOT))
+
+import streamlit as st  # noqa: E402
+from streamlit.logger import set_log_level  # noqa: E402
+from streamlit.runtime.scriptrunner import ScriptRunner  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+
+import image_pyramid  # noqa: E402
+import synth  # noqa: E402
+from annotation_journal import AnnotationJournal  # noqa: E402
+from annotation_store import AnnotationStore  # noqa: E402
+from image_cache import image_cache  # noqa: E402
+from proposals_store import build_sqlite  # noqa: E402
+
+ANNOTATOR_ID = 'benchmark'
+# Settings the app sees instead of secrets.toml: never write to the shared
+# GitHub repository or scheduler database from a benchmark
+LOCAL_SECRETS = {'github_token': '', 'scheduler_db': ''}
+
+
+def stats(samples_ms):
+    """Summary statistics of a list of durations in milliseconds."""
+    ordered = sorted(samples_ms)
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'median_ms': round(statistics.median(ordered), 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+        'min_ms': round(ordered[0], 4),
+        'max_ms': round(ordered[-1], 4),
+    }
+
+
+def timed(fn, repeat, setup=None):
+    """Run `fn` `repeat` times (after `setup`, untimed) and return its stats."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return stats(samples)
+
+
+def import_app():
+    """Import the app module outside `streamlit run` (bare mode)."""
+    import bbox_annotation_streamlit as app
+    set_log_level('error')  # "missing ScriptRunContext" warnings on every session_state access
+    app.get_setting = lambda name, default=None: LOCAL_SECRETS.get(name, default)
+    return app
+
+
+def bench_load_data(app, proposals, images_dir, repeat):
+    """load_data, cold and warm, per proposals file."""
+    results = {}
+    for label, path in proposals.items():
+        call = lambda: app.load_data(str(path), str(images_dir), ANNOTATOR_ID)  # noqa: E731
+        results[f'{label}.cold'] = timed(call, repeat, setup=app.load_shared_proposals.clear)
+        call()
+        results[f'{label}.warm'] = timed(call, repeat)
+    return results
+
+
+def bench_bbox_conversion(app, repeat, calls=10_000):
+    """denormalize_bbox / normalize_bbox, per call."""
+    shape = (4000, 6000, 3)
+    boxes = [[0.1 + 0.8 * (i % 97) / 97, 0.5, 0.2, 0.3] for i in range(calls)]
+    pixels = [app.denormalize_bbox(b, shape) for b in boxes]
+
+    def per_call(fn, args):
+        def run():
+            for a in args:
+                fn(a, shape)
+        result = timed(run, repeat)
+        for key in ('mean_ms', 'median_ms', 'p95_ms', 'min_ms', 'max_ms'):
+            result[key] = round(result[key] / calls, 6)
+        result['calls_per_sample'] = calls
+        return result
+
+    return {
+        'denormalize_bbox': per_call(app.denormalize_bbox, boxes),
+        'normalize_bbox': per_call(app.normalize_bbox, pixels),
+    }
+
+
+def forget_display_level(path):
+    """Drop every cached copy of `path`'s display level (memory and disk)."""
+    level = image_pyramid.display_level(path)
+    image_cache.clear()
+    with image_pyramid._levels_lock:
+        image_pyramid._levels.clear()
+    level.path.unlink(missing_ok=True)
+
+
+def bench_draw(app, images_dir, names, repeat):
+    """draw_bbox_on_image, cold and warm, per image."""
+    results = {}
+    for name in names:
+        path = images_dir / name
+        w, h = app.get_image_size(path)
+        bbox = app.denormalize_bbox([0.5, 0.5, 0.4, 0.3], (h, w, 3))
+        call = lambda: app.draw_bbox_on_image(path, bbox)  # noqa: E731
+        results[f'{name}.cold'] = timed(call, repeat, setup=lambda: forget_display_level(path))
+        call()
+        results[f'{name}.warm'] = timed(call, repeat)
+    return results
+
+
+def bench_save_progress(app, data, workdir, repeat):
+    """save_progress on the local journal, per annotation."""
+    journal_path = workdir / f'annotations_{ANNOTATOR_ID}_save.json'
+    st.session_state.journal = AnnotationJournal(journal_path)
+    st.session_state.annotations = AnnotationStore()
+    records = []
+    for example in data:
+        for evid in example['evid_proposals']:
+            records.append({
+                'example_id': example['id'],
+                'evid_index': evid['evid_index'],
+                'final_bbox': evid['bbox'],
+                'decision': 'accept',
+                'annotator_id': ANNOTATOR_ID,
+                'annotation_time': datetime.now().isoformat(),
+            })
+            if len(records) == repeat:
+                break
+        if len(records) == repeat:
+            break
+
+    samples = []
+    for record in records:
+        st.session_state.annotations.put(record)
+        start = time.perf_counter()
+        app.save_progress(record)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'local': stats(samples)}
+
+
+@contextmanager
+def local_app_dir():
+    """
+    Run the app from a scratch working directory holding only the repo's
+    .streamlit/config.toml (static serving): the app saves local annotation
+    files to its working directory, and secrets.toml is not picked up.
+    """
+    rundir = Path(tempfile.mkdtemp(prefix='bbox_bench_run_'))
+    (rundir / '.streamlit').mkdir()
+    shutil.copy(REPO_ROOT / '.streamlit' / 'config.toml', rundir / '.streamlit' / 'config.toml')
+    cwd = os.getcwd()
+    os.chdir(rundir)
+    try:
+        yield rundir
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(rundir, ignore_errors=True)
+
+
+def start_session(proposals_path, images_dir, annotator_id):
+    """Return an AppTest session that has pressed Start Annotation."""
+    at = AppTest.from_file(str(APP_PATH), default_timeout=300)
+    at.secrets = dict(LOCAL_SECRETS)
+    at.run()
+    at.sidebar.text_input[0].input(str(proposals_path))
+    at.sidebar.text_input[1].input(str(images_dir))
+    at.sidebar.text_input[2].input(annotator_id)
+    at.sidebar.button[0].click()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def bench_annotate_cycle(proposals_path, images_dir, repeat):
+    """One Accept click (save, advance, render the next EVID) through AppTest."""
+    at = start_session(proposals_path, images_dir, f'{ANNOTATOR_ID}_cycle')
+    samples = []
+    for _ in range(repeat):
+        accept = [b for b in at.button if 'Accept' in b.label][0]
+        start = time.perf_counter()
+        accept.click()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return {'accept': stats(samples)}
+
+
+@contextmanager
+def fragment_reruns(at, name):
+    """
+    Make AppTest runs fragment-scoped reruns of the fragment wrapping
+    function `name`, as the browser requests them for a widget inside it.
+
+    AppTest has no public API for this, so it relies on private internals
+    (its fragment storage, fragments as closures over the wrapped function,
+    and the RerunData its script runner builds); it raises RuntimeError
+    naming what is missing if a Streamlit upgrade changes them.
+    """
+    fragments = getattr(getattr(at, '_fragment_storage', None), '_fragments', None)
+    rerun_data = getattr(local_script_runner, 'RerunData', None)
+    if not isinstance(fragments, dict):
+        raise RuntimeError(f"AppTest._fragment_storage._fragments not found (Streamlit {st.__version__})")
+    if (not dataclasses.is_dataclass(rerun_data)
+            or 'fragment_id_queue' not in {f.name for f in dataclasses.fields(rerun_data)}):
+        raise RuntimeError(f"local_script_runner.RerunData(fragment_id_queue=...) not found "
+                           f"(Streamlit {st.__version__})")
+
+    fid = None
+    for key, fragment in fragments.items():
+        if any(getattr(cell.cell_contents, '__name__', None) == name
+               for cell in getattr(fragment, '__closure__', None) or ()):
+            fid = key
+            break
+    if fid is None:
+        raise RuntimeError(f"Fragment wrapping {name}() not found in AppTest._fragment_storage")
+
+    with mock.patch.object(local_script_runner, 'RerunData',
+                           functools.partial(rerun_data, fragment_id_queue=[fid])):
+        yield
+
+
+@contextmanager
+def script_run_times():
+    """Collect the duration (ms) of each script run request, reruns it triggers included."""
+    samples = []
+    run_script = ScriptRunner._run_script
+
+    def timed_run(self, rerun_data):
+        start = time.perf_counter()
+        try:
+            return run_script(self, rerun_data)
+        finally:
+            samples.append((time.perf_counter() - start) * 1000)
+
+    with mock.patch.object(ScriptRunner, '_run_script', timed_run):
+        yield samples
+
+
+def bench_bbox_adjust(proposals_path, images_dir, repeat):
+    """Slider adjustment: full-script reruns vs. fragment-scoped reruns of the bbox editor."""
+    at = start_session(proposals_path, images_dir, f'{ANNOTATOR_ID}_adjust')
+    for _ in range(50):
+        if at.slider:
+            break
+        [b for b in at.button if 'Skip' in b.label][0].click()
+        at.run()
+    else:
+        return {}
+
+    def adjust(i):
+        slider = at.slider(key='move_x')
+        value = slider.min + (i % 2 + 1) * max(1, (slider.max - slider.min) // 4)
+        slider.set_value(min(value, slider.max))
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    # The adjustment reruns once more (st.rerun) to show the moved box; both runs are timed
+    with script_run_times() as script_ms:
+        for i in range(repeat):
+            adjust(i)
+    with script_run_times() as fragment_ms, fragment_reruns(at, 'bbox_editor'):
+        for i in range(repeat):
+            adjust(i)
+    return {'full_script': stats(script_ms), 'fragment': stats(fragment_ms)}
+
+
+def metadata(args):
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'streamlit': st.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {
+            'evids': args.evids,
+            'sizes': args.sizes,
+            'formats': args.formats,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+    }
+
+
+def print_report(report):
+    for group, entries in report['results'].items():
+        print(f"\n{group}")
+        for name, s in entries.items():
+            print(f"  {name:<40} median {s['median_ms']:>10.4f} ms  p95 {s['p95_ms']:>10.4f} ms  (n={s['n']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the annotation app's hot paths on synthetic data")
+    parser.add_argument('--evids', default='1000,10000,100000',
+                        help="Comma-separated EVID counts for load_data (up to 1000000)")
+    parser.add_argument('--sizes', default=','.join(f"{w}x{h}" for w, h in synth.DEFAULT_SIZES),
+                        help="Comma-separated WIDTHxHEIGHT image sizes")
+    parser.add_argument('--formats', default=','.join(synth.DEFAULT_FORMATS), help="Comma-separated image formats")
+    parser.add_argument('--repeat', type=int, default=10, help="Samples per benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="Keep generated data here (default: a temporary directory)")
+    parser.add_argument('--skip-apptest', action='store_true', help="Skip the AppTest-driven benchmarks")
+    parser.add_argument('-o', '--output', default=str(REPO_ROOT / 'benchmarks' / 'results' / 'report.json'),
+                        help="JSON report path")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='bbox_bench_')).resolve()
+    output = Path(args.output).resolve()
+    start = time.time()
+
+    print(f"Generating synthetic data in {workdir} ...")
+    images_dir = workdir / 'images'
+    names = synth.generate_images(images_dir, synth.parse_sizes(args.sizes), args.formats.split(','), args.seed)
+    proposals = {}
+    for n in (int(v) for v in args.evids.split(',')):
+        path = workdir / f'proposals_{n}.json'
+        if not path.exists():
+            synth.generate_proposals(path, n, names, args.seed)
+        proposals[f'json.{n}'] = path
+        sqlite_path = path.with_suffix('.sqlite')
+        if not sqlite_path.exists():
+            build_sqlite(path, sqlite_path)
+        proposals[f'sqlite.{n}'] = sqlite_path
+    smallest = min(proposals.values(), key=lambda p: p.stat().st_size if p.suffix == '.json' else float('inf'))
+
+    with local_app_dir():
+        app = import_app()
+        st.session_state.images_dir = images_dir
+        st.session_state.image_index = {}
+        results = {}
+        cached_levels = set(image_pyramid.CACHE_DIR.glob('*'))
+        try:
+            print("load_data ...")
+            results['load_data'] = bench_load_data(app, proposals, images_dir, args.repeat)
+            print("bbox conversion ...")
+            results['bbox_conversion'] = bench_bbox_conversion(app, args.repeat)
+            print("draw_bbox_on_image ...")
+            results['draw_bbox_on_image'] = bench_draw(app, images_dir, names, args.repeat)
+            print("save_progress ...")
+            data = app.get_shared_proposals(str(smallest))
+            results['save_progress'] = bench_save_progress(app, data, workdir, max(args.repeat, 100))
+            if not args.skip_apptest:
+                print("AppTest annotate cycle ...")
+                results['annotate_cycle'] = bench_annotate_cycle(smallest, images_dir, args.repeat)
+                results['bbox_adjust'] = bench_bbox_adjust(smallest, images_dir, args.repeat)
+        finally:
+            # Don't leave synthetic display levels in static/
+            for path in set(image_pyramid.CACHE_DIR.glob('*')) - cached_levels:
+                path.unlink()
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'meta': metadata(args), 'results': results}
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\n✅ Report written to {output} ({time.time() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Synthetic proposals and images for benchmarks.
+
+Generates a proposals file in the bbox_proposals_qwen_v1.json schema with a
+chosen number of EVIDs, plus a set of images in several sizes and formats
+that the examples point to. Images are smooth gradients with a few filled
+ellipses, so they compress like real photographs and have real edges.
+
+Usage:
+    python benchmarks/synth.py /tmp/synth --evids 100000 [--sizes 640x480,6000x4000]
+        [--formats jpg,png,tif,bmp] [--jsonl]
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+DATASETS = ('SLAKE', 'VQA-RAD', 'PathVQA', 'OmniMedVQA')
+COMPLEXITIES = ('simple', 'medium', 'complex')
+PHRASES = ('left lung', 'right lung', 'liver', 'lesion', 'nodule', 'heart', 'kidney', 'mass')
+DEFAULT_SIZES = ((640, 480), (2048, 1536), (6000, 4000))
+DEFAULT_FORMATS = ('jpg', 'png', 'tif', 'bmp')
+NO_GROUNDING_RATE = 0.1
+
+
+def parse_sizes(text):
+    """Parse '640x480,6000x4000' into [(640, 480), (6000, 4000)]."""
+    return [tuple(int(v) for v in size.split('x')) for size in text.split(',') if size]
+
+
+def make_image(width, height, rng):
+    """Return a synthetic RGB PIL image."""
+    # Build at low resolution and upscale; cheap even for 6000x4000
+    small_w, small_h = max(2, width // 8), max(2, height // 8)
+    yy, xx = np.mgrid[0:small_h, 0:small_w]
+    img = np.empty((small_h, small_w, 3), np.float32)
+    for c in range(3):
+        img[..., c] = 60 + 80 * (xx / small_w) + 40 * (yy / small_h) + rng.integers(0, 40)
+    for _ in range(rng.integers(2, 6)):
+        cx, cy = rng.uniform(0.1, 0.9) * small_w, rng.uniform(0.1, 0.9) * small_h
+        rx, ry = rng.uniform(0.05, 0.25) * small_w, rng.uniform(0.05, 0.25) * small_h
+        inside = ((xx - cx) / rx) ** 2 + ((yy - cy) / ry) ** 2 <= 1
+        img[inside] = rng.integers(0, 255, 3)
+    img += rng.normal(0, 4, img.shape)
+    small = Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+    return small.resize((width, height), Image.BILINEAR)
+
+
+def generate_images(images_dir, sizes=DEFAULT_SIZES, formats=DEFAULT_FORMATS, seed=0):
+    """
+    Write one image per (size, format) into `images_dir`.
+
+    Returns:
+        list: Image file names relative to `images_dir`
+    """
+    images_dir = Path(images_dir)
+    images_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = []
+    for width, height in sizes:
+        img = make_image(width, height, rng)
+        for fmt in formats:
+            name = f"synth_{width}x{height}.{fmt}"
+            path = images_dir / name
+            if not path.exists():
+                img.save(path, **({'quality': 90} if fmt in ('jpg', 'jpeg') else {}))
+            names.append(name)
+    return names
+
+
+def iter_examples(n_evids, image_names, seed=0, max_evids_per_example=4):
+    """Yield proposal examples until `n_evids` EVIDs have been produced."""
+    rng = random.Random(seed)
+    produced, idx = 0, 0
+    while produced < n_evids:
+        n = min(rng.randint(1, max_evids_per_example), n_evids - produced)
+        evids = []
+        for evid_index in range(n):
+            phrase = rng.choice(PHRASES)
+            if rng.random() < NO_GROUNDING_RATE:
+                bbox, tier = 'NO_VISIBLE_GROUNDING', 'tier3_no_grounding'
+            else:
+                w, h = rng.uniform(0.05, 0.7), rng.uniform(0.05, 0.7)
+                bbox = [rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2), w, h]
+                tier = 'tier1_tight' if w * h < 0.3 else 'tier2_anatomical'
+            confidence = round(rng.uniform(0.3, 1.0), 2)
+            evids.append({
+                'evid_index': evid_index,
+                'evid_phrase': phrase,
+                'original_evid': f'phrase="{phrase}" region=[TBD] conf={confidence}',
+                'bbox': bbox,
+                'confidence': confidence,
+                'grounding_tier': tier,
+                'reasoning': f"Synthetic proposal for {phrase}.",
+                'valid': True,
+                'inference_time': round(rng.uniform(2, 15), 3),
+                'deduplicated': False,
+            })
+        yield {
+            'id': f"synth_{idx}",
+            'dataset': rng.choice(DATASETS),
+            'proxy_complexity': rng.choice(COMPLEXITIES),
+            'image_path': image_names[idx % len(image_names)],
+            'question': f"Where is the {evids[0]['evid_phrase']}?",
+            'answer': evids[0]['evid_phrase'],
+            'evid_proposals': evids,
+            'source': 'vision_proposal:synthetic',
+        }
+        produced += n
+        idx += 1
+
+
+def generate_proposals(path, n_evids, image_names, seed=0):
+    """
+    Write a proposals file with `n_evids` EVIDs (JSON list, or JSONL for *.jsonl).
+
+    Examples are streamed to disk, so 1M-EVID files need little memory.
+
+    Returns:
+        int: Number of examples written
+    """
+    path = Path(path)
+    count = 0
+    with open(path, 'w') as f:
+        if path.suffix == '.jsonl':
+            for ex in iter_examples(n_evids, image_names, seed):
+                f.write(json.dumps(ex) + '\n')
+                count += 1
+        else:
+            f.write('[')
+            for ex in iter_examples(n_evids, image_names, seed):
+                f.write((',\n' if count else '\n') + json.dumps(ex))
+                count += 1
+            f.write('\n]\n')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic proposals and images")
+    parser.add_argument('output_dir', help="Directory for proposals_<N>.json and images/")
+    parser.add_argument('--evids', type=int, default=10_000, help="Number of EVIDs")
+    parser.add_argument('--sizes', default=','.join(f"{w}x{h}" for w, h in DEFAULT_SIZES),
+                        help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS), help="Comma-separated image formats")
+    parser.add_argument('--jsonl', action='store_true', help="Write JSONL instead of a JSON list")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.time()
+    output_dir = Path(args.output_dir)
+    names = generate_images(output_dir / 'images', parse_sizes(args.sizes), args.formats.split(','), args.seed)
+    proposals = output_dir / f"proposals_{args.evids}.{'jsonl' if args.jsonl else 'json'}"
+    count = generate_proposals(proposals, args.evids, names, args.seed)
+    print(f"✅ {proposals}: {count} examples, {args.evids} EVIDs; {len(names)} images "
+          f"in {output_dir / 'images'} ({time.time() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
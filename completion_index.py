@@ -0,0 +1,89 @@
+"""
+Completion index over (example_id, evid_index).
+
+Maps every EVID of a proposals object to a global position using prefix
+sums of per-example EVID counts, keeps a done-bitmap over those positions,
+and maintains annotated/decision counters incrementally as annotations are
+recorded. Progress and session stats are then O(1) per rerun, and resume can
+jump straight to the first unannotated EVID.
+"""
+
+import threading
+from bisect import bisect_right
+from collections import Counter
+
+from annotation_store import annotation_key
+
+
+class CompletionIndex:
+    """Done-bitmap and decision counters for one proposals object."""
+
+    def __init__(self, proposals, store=None):
+        """
+        Args:
+            proposals: Object from proposals_store (len, position, evid_offsets)
+            store: Optional AnnotationStore; its current records are indexed
+                and later changes are followed
+        """
+        self.proposals = proposals
+        self.offsets = proposals.evid_offsets()
+        self.total_evids = self.offsets[-1]
+        self.done_count = 0
+        self.decision_counts = Counter()
+        self._done = bytearray(self.total_evids)
+        self._decisions = {}  # key -> decision currently counted
+        self._lock = threading.Lock()
+
+        if store is not None:
+            # Subscribe first so nothing recorded meanwhile is missed;
+            # recording the same record twice is harmless
+            store.subscribe(self.record)
+            for record in store:
+                self.record(record)
+
+    def position(self, example_idx, evid_idx):
+        """Return the global EVID position of (example position, EVID index)."""
+        return self.offsets[example_idx] + evid_idx
+
+    def locate(self, pos):
+        """Return (example position, EVID index) for a global EVID position."""
+        example_idx = bisect_right(self.offsets, pos) - 1
+        return example_idx, pos - self.offsets[example_idx]
+
+    def record(self, annotation):
+        """Count an annotation, replacing any earlier decision for the same EVID."""
+        key = annotation_key(annotation)
+        example_idx = self.proposals.position(key[0])
+        with self._lock:
+            previous = self._decisions.get(key)
+            if previous is not None:
+                self.decision_counts[previous] -= 1
+            self._decisions[key] = annotation['decision']
+            self.decision_counts[annotation['decision']] += 1
+
+            # Annotations for EVIDs not in these proposals only affect the counters
+            if example_idx is None:
+                return
+            evid_idx = key[1]
+            if not 0 <= evid_idx < self.offsets[example_idx + 1] - self.offsets[example_idx]:
+                return
+            pos = self.position(example_idx, evid_idx)
+            if not self._done[pos]:
+                self._done[pos] = 1
+                self.done_count += 1
+
+    def is_done(self, example_idx, evid_idx):
+        return bool(self._done[self.position(example_idx, evid_idx)])
+
+    def example_done(self, example_idx):
+        """Return True if every EVID of the example at `example_idx` is annotated."""
+        start, end = self.offsets[example_idx], self.offsets[example_idx + 1]
+        return 0 not in self._done[start:end]
+
+    def first_unannotated(self, start=0):
+        """
+        Return (example position, EVID index) of the first unannotated EVID
+        at or after global position `start`, or None if there is none.
+        """
+        pos = self._done.find(0, start)
+        return None if pos < 0 else self.locate(pos)
@@ -0,0 +1,231 @@
+"""
+Multi-annotator consensus: one gold record per (example_id, evid_index).
+
+Groups every annotator's latest record for each EVID and resolves them in
+one batched pass:
+
+1. Categorical vote on the kind of answer: box, NO_VISIBLE_GROUNDING or
+   rejected. The majority wins; a tie is resolved in that order of
+   preference and flagged.
+2. Where the vote is "box", the annotators' boxes are fused, either by
+   weighted box fusion (weighted mean of the boxes that overlap the median
+   box with IoU >= WBF_IOU; weights are the annotators' 1-5 confidence,
+   default 1) or by the coordinate-wise median.
+3. Items are flagged for adjudication when the vote is split (winning
+   share below MIN_VOTE_SHARE, or a tie) or some annotator's box overlaps
+   the fused box with IoU below MIN_BOX_AGREEMENT.
+
+All EVIDs are laid out as (annotators x EVIDs) arrays (see
+iaa.AlignedAnnotations), so voting and fusion are NumPy reductions over the
+annotator axis. The consolidated records keep the annotation schema
+(normalized [x_c, y_c, w, h] final_bbox, decision, grounding_tier, ...)
+with annotator_id "consensus" and a `consensus` field describing the vote.
+
+Usage:
+    python consensus.py annotations/ -o annotations_consensus.json [--method wbf|median]
+        [--adjudication adjudication.jsonl]
+"""
+
+import argparse
+import json
+import time
+import warnings
+from collections import Counter
+
+import numpy as np
+
+from annotation_io import load_annotators
+from bbox_ops import (KIND_BOX, KIND_NAMES, KIND_NO_GROUNDING, KIND_REJECTED, NO_GROUNDING,
+                      grounding_tier, iou, xyxy_to_center)
+from iaa import AlignedAnnotations
+
+CONSENSUS_ID = 'consensus'
+METHODS = ('wbf', 'median')
+WBF_IOU = 0.55  # Boxes overlapping the median box less than this are left out of WBF
+MIN_VOTE_SHARE = 2 / 3
+MIN_BOX_AGREEMENT = 0.5
+# Tie-break order of the categorical vote
+KIND_PREFERENCE = (KIND_BOX, KIND_NO_GROUNDING, KIND_REJECTED)
+KIND_DECISIONS = {KIND_NO_GROUNDING: 'no_grounding', KIND_REJECTED: 'reject'}
+
+
+def annotator_weights(aligned, annotators):
+    """Return (annotators x EVIDs) fusion weights from the records' 1-5 `confidence`."""
+    weights = np.ones(aligned.kinds.shape)
+    key_index = {key: i for i, key in enumerate(aligned.keys)}
+    for a, name in enumerate(aligned.names):
+        for key, record in annotators[name].items():
+            confidence = record.get('confidence')
+            if isinstance(confidence, (int, float)) and confidence > 0:
+                weights[a, key_index[key]] = confidence
+    return weights
+
+
+def vote(kinds):
+    """
+    Categorical vote per EVID.
+
+    Returns:
+        tuple: (winning kind (N,), votes per kind (3, N) in KIND_PREFERENCE
+            order, number of annotators (N,), tie (N,) bool)
+    """
+    votes = np.stack([(kinds == kind).sum(axis=0) for kind in KIND_PREFERENCE])
+    best = votes.max(axis=0)
+    winner = np.array(KIND_PREFERENCE)[np.argmax(votes, axis=0)]  # First maximum = preferred kind
+    tie = (votes == best).sum(axis=0) > 1
+    return winner, votes, votes.sum(axis=0), tie
+
+
+def fuse_boxes(boxes, use, weights, method='wbf'):
+    """
+    Fuse boxes over the annotator axis.
+
+    Args:
+        boxes: (A, N, 4) corner boxes, NaN where not a box
+        use: (A, N) bool, boxes taking part in the fusion
+        weights: (A, N) annotator weights
+        method: 'wbf' or 'median'
+
+    Returns:
+        tuple: (fused (N, 4) corner boxes, mean and minimum IoU of the used
+            boxes to the fused box (N,) each; NaN where no box is used)
+    """
+    masked = np.where(use[..., None], boxes, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN columns (EVIDs without boxes)
+        fused = np.nanmedian(masked, axis=0)
+
+    if method == 'wbf':
+        # Drop outliers relative to the median box, then take the weighted mean
+        close = use & (iou(np.nan_to_num(boxes), np.nan_to_num(fused)[None]) >= WBF_IOU)
+        w = np.where(close, weights, 0.0)
+        total = w.sum(axis=0)
+        mean = np.einsum('an,anc->nc', w, np.nan_to_num(boxes)) / np.maximum(total, 1e-12)[:, None]
+        fused = np.where((total > 0)[:, None], mean, fused)
+
+    overlap = np.where(use, iou(np.nan_to_num(boxes), np.nan_to_num(fused)[None]), 0.0)
+    count = use.sum(axis=0)
+    mean_iou = np.divide(overlap.sum(axis=0), count, out=np.full(count.shape, np.nan), where=count > 0)
+    min_iou = np.where(count > 0, np.where(use, overlap, np.inf).min(axis=0), np.nan)
+    return fused, mean_iou, min_iou
+
+
+def majority_decision(records):
+    """Most common decision among box `records` (first one seen wins ties)."""
+    decisions = Counter(r.get('decision') for r in records if r.get('decision') in ('accept', 'adjust'))
+    return decisions.most_common(1)[0][0] if decisions else 'adjust'
+
+
+def build_consensus(annotators, method='wbf'):
+    """
+    Resolve all annotators' records into consensus records.
+
+    Args:
+        annotators: {annotator_id: {(example_id, evid_index): record}}
+        method: Box fusion method, 'wbf' or 'median'
+
+    Returns:
+        tuple: (consensus records, adjudication items)
+    """
+    aligned = AlignedAnnotations(annotators)
+    if not aligned.keys:
+        return [], []
+    winner, votes, n_annotators, tie = vote(aligned.kinds)
+    use = (aligned.kinds == KIND_BOX) & (winner == KIND_BOX)[None]
+    fused, agreement, worst = fuse_boxes(aligned.boxes, use, annotator_weights(aligned, annotators), method)
+    fused_center = np.clip(xyxy_to_center(fused), 0.0, 1.0)
+
+    share = votes.max(axis=0) / np.maximum(n_annotators, 1)
+    split = (n_annotators > 1) & ((share < MIN_VOTE_SHARE) | tie)
+    poor_overlap = (winner == KIND_BOX) & (use.sum(axis=0) > 1) & (worst < MIN_BOX_AGREEMENT)
+
+    records, adjudication = [], []
+    for n, key in enumerate(aligned.keys):
+        present = [(a, annotators[name][key]) for a, name in enumerate(aligned.names) if key in annotators[name]]
+        group = [record for _, record in present]
+        kind = int(winner[n])
+        supporters = [record for a, record in present if aligned.kinds[a, n] == kind]
+
+        if kind == KIND_BOX:
+            final_bbox = [float(v) for v in fused_center[n]]
+            decision = majority_decision(supporters)
+        else:
+            final_bbox = NO_GROUNDING if kind == KIND_NO_GROUNDING else None
+            decision = KIND_DECISIONS[kind]
+
+        reasons = []
+        if split[n]:
+            reasons.append('tie' if tie[n] else 'split_vote')
+        if poor_overlap[n]:
+            reasons.append('low_box_agreement')
+
+        summary = {
+            'method': method if kind == KIND_BOX else 'vote',
+            'n_annotators': int(n_annotators[n]),
+            'annotators': [r.get('annotator_id') for r in group],
+            'votes': {KIND_NAMES[k]: int(votes[i, n]) for i, k in enumerate(KIND_PREFERENCE) if votes[i, n]},
+            'box_agreement': None if np.isnan(agreement[n]) else float(agreement[n]),
+            'min_box_iou': None if np.isnan(worst[n]) else float(worst[n]),
+            'needs_adjudication': bool(reasons),
+            'adjudication_reasons': reasons,
+        }
+        base = supporters[0] if supporters else group[0]
+        record = dict(base)
+        record.update({
+            'final_bbox': final_bbox,
+            'decision': decision,
+            'adjustment_type': 'none' if decision == 'accept' else base.get('adjustment_type', 'none'),
+            'rejection_reason': base.get('rejection_reason') if kind == KIND_REJECTED else None,
+            'grounding_tier': grounding_tier(final_bbox),
+            'annotator_id': CONSENSUS_ID,
+            'time_spent': None,
+            'confidence': None,
+            'consensus': summary,
+        })
+        records.append(record)
+        if reasons:
+            adjudication.append({
+                'example_id': key[0],
+                'evid_index': key[1],
+                'reasons': reasons,
+                **{k: summary[k] for k in ('votes', 'box_agreement', 'min_box_iou', 'annotators')},
+                'final_bboxes': {r.get('annotator_id'): r.get('final_bbox') for r in group},
+            })
+    return records, adjudication
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuse multiple annotators' records into one consensus dataset")
+    parser.add_argument('paths', nargs='*', default=['annotations/'],
+                        help="Annotation files or directories (default: annotations/)")
+    parser.add_argument('-o', '--output', default='annotations_consensus.json',
+                        help="Consolidated annotations JSON (default: annotations_consensus.json)")
+    parser.add_argument('--method', choices=METHODS, default='wbf', help="Box fusion method")
+    parser.add_argument('--adjudication', help="Write items needing adjudication to this JSONL file")
+    args = parser.parse_args()
+
+    start = time.time()
+    annotators = load_annotators(args.paths)
+    annotators.pop(CONSENSUS_ID, None)  # Never fuse an earlier consensus output
+    records, adjudication = build_consensus(annotators, args.method)
+
+    with open(args.output, 'w') as f:
+        json.dump(records, f, indent=2)
+    if args.adjudication:
+        with open(args.adjudication, 'w') as f:
+            for item in adjudication:
+                f.write(json.dumps(item) + '\n')
+
+    multi = sum(1 for r in records if r['consensus']['n_annotators'] > 1)
+    decisions = Counter(r['decision'] for r in records)
+    print(f"Annotators: {', '.join(sorted(annotators)) or 'none'}")
+    print(f"✅ Wrote {len(records)} consensus records to {args.output} "
+          f"({multi} with more than one annotator)")
+    print(f"Decisions: {', '.join(f'{k}={v}' for k, v in sorted(decisions.items(), key=str))}")
+    print(f"⚠️ {len(adjudication)} item(s) flagged for adjudication"
+          + (f" → {args.adjudication}" if args.adjudication else ''))
+    print(f"Done in {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""
+Export verified boxes to training formats: COCO JSON, YOLO txt and flat JSONL.
+
+Annotation records keep normalized [x_c, y_c, w, h] boxes plus free-text
+phrases; grounding models want pixel boxes with category ids. The exporter
+streams over annotation files (per-annotator files, the app's snapshots and
+journals, or consensus.py output) in two passes, so memory is bounded by the
+number of EVIDs and images rather than by the size of the records:
+
+1. Select the latest record per (annotator_id, example_id, evid_index),
+   keeping only its position in the input.
+2. Re-read the inputs and write each selected record to every output as it
+   is reached.
+
+Pixel coordinates use the dimensions the app uses for denormalize_bbox:
+the image index entry when it is current, otherwise the image header, read
+in a process pool when many images are not indexed.
+
+Boxes are categorized by grounding tier (tier1_tight / tier2_anatomical) or
+by normalized EVID phrase (--category phrase); the other one, the phrase,
+decision and EVID key are kept as COCO annotation attributes and JSONL
+fields. NO_VISIBLE_GROUNDING records are exported to JSONL only (bbox null);
+rejected EVIDs are skipped.
+
+Outputs in the output directory:
+    coco.json            images, annotations (with attributes), categories
+    yolo/shard_NNNN/     labels/*.txt and images/ symlinks, --shard-size images each
+    yolo/data.yaml       shard list and class names (also yolo/classes.txt)
+    annotations.jsonl    one line per exported EVID
+
+Usage:
+    python export_training.py annotations_consensus.json --proposals bbox_proposals_qwen_v1.json
+        --images images/ -o training_export/ [--formats coco yolo jsonl] [--category tier|phrase]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import image_index
+from annotation_io import annotation_files, iter_records
+from grounding import NO_GROUNDING, grounding_tier
+from proposals_store import open_proposals
+
+FORMATS = ('coco', 'yolo', 'jsonl')
+CATEGORY_MODES = ('tier', 'phrase')
+BOX_TIERS = ('tier1_tight', 'tier2_anatomical')
+DEFAULT_PROPOSALS = 'bbox_proposals_qwen_v1.json'
+DEFAULT_SHARD_SIZE = 10_000  # Images per YOLO shard directory
+INLINE_SIZE_LOOKUPS = 64  # Fewer unindexed images than this are read without a pool
+SIZE_CHUNKSIZE = 256
+
+
+def load_image_meta(proposals_path):
+    """Return {example_id: (image_path, dataset, proxy_complexity)} from a proposals file."""
+    return {
+        ex['id']: (ex['image_path'], ex.get('dataset'), ex.get('proxy_complexity'))
+        for _, ex in open_proposals(proposals_path).iter_examples()
+    }
+
+
+def read_image_size(path):
+    """Return (width, height) from the image header, or None if it cannot be read."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def resolve_image_sizes(images_dir, rel_paths, workers=None):
+    """
+    Look up the pixel dimensions of images relative to `images_dir`.
+
+    Returns:
+        tuple: ({rel_path: (width, height)}, [rel_paths that could not be read])
+    """
+    index = image_index.load_index(images_dir)
+    sizes, unindexed = {}, []
+    for rel_path in rel_paths:
+        entry = index.get(rel_path)
+        if entry is not None and image_index.is_current(entry, Path(images_dir) / rel_path):
+            sizes[rel_path] = (entry['width'], entry['height'])
+        else:
+            unindexed.append(rel_path)
+
+    paths = [str(Path(images_dir) / rel_path) for rel_path in unindexed]
+    if len(paths) < INLINE_SIZE_LOOKUPS:
+        results = list(map(read_image_size, paths))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(read_image_size, paths, chunksize=SIZE_CHUNKSIZE))
+
+    unreadable = []
+    for rel_path, size in zip(unindexed, results):
+        if size is None:
+            unreadable.append(rel_path)
+        else:
+            sizes[rel_path] = tuple(size)
+    return sizes, unreadable
+
+
+def record_identity(record, path):
+    """Return the (annotator_id, example_id, evid_index) a record is deduplicated on."""
+    annotator = record.get('annotator_id') or Path(path).stem
+    return annotator, record['example_id'], record['evid_index']
+
+
+def select_records(files):
+    """
+    First pass: find the latest record of every (annotator, EVID).
+
+    Returns:
+        dict: (annotator_id, example_id, evid_index) -> (file_no, record_no)
+    """
+    latest = {}  # identity -> (annotation_time, file_no, record_no)
+    for file_no, path in enumerate(files):
+        for record_no, record in enumerate(iter_records(path)):
+            identity = record_identity(record, path)
+            current = latest.get(identity)
+            annotation_time = record.get('annotation_time') or ''
+            if current is None or annotation_time >= current[0]:
+                latest[identity] = (annotation_time, file_no, record_no)
+    return {identity: position[1:] for identity, position in latest.items()}
+
+
+def normalize_phrase(phrase):
+    return ' '.join(str(phrase or '').lower().split())
+
+
+def clip_box(bbox):
+    """Clip a normalized [x_c, y_c, w, h] box to the image; return [x1, y1, x2, y2] or None if empty."""
+    x_c, y_c, w, h = bbox
+    x1, y1 = max(0.0, x_c - w / 2), max(0.0, y_c - h / 2)
+    x2, y2 = min(1.0, x_c + w / 2), min(1.0, y_c + h / 2)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return [x1, y1, x2, y2]
+
+
+class Categories:
+    """Category names and their 1-based ids, fixed (tiers) or grown on first use (phrases)."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.ids = {name: i + 1 for i, name in enumerate(BOX_TIERS)} if mode == 'tier' else {}
+
+    def id_for(self, tier, phrase):
+        name = tier if self.mode == 'tier' else phrase
+        if name not in self.ids:
+            self.ids[name] = len(self.ids) + 1
+        return self.ids[name]
+
+    @property
+    def names(self):
+        return sorted(self.ids, key=self.ids.get)
+
+
+class CocoWriter:
+    """
+    Writes coco.json incrementally: annotations as they arrive, then the
+    images that received at least one box and the categories.
+    """
+
+    def __init__(self, path):
+        self.f = open(path, 'w')
+        info = {'description': "Phase 2 verified EVID boxes", 'date_created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.f.write('{"info": ' + json.dumps(info) + ',\n"annotations": [')
+        self.count = 0
+        self.images = {}  # image_id -> image entry
+
+    def add(self, item):
+        x1, y1, x2, y2 = item['bbox_xyxy']
+        annotation = {
+            'id': self.count + 1,
+            'image_id': item['image_id'],
+            'category_id': item['category_id'],
+            'bbox': [round(x1, 2), round(y1, 2), round(x2 - x1, 2), round(y2 - y1, 2)],
+            'area': round((x2 - x1) * (y2 - y1), 2),
+            'iscrowd': 0,
+            'attributes': {key: item[key] for key in (
+                'evid_phrase', 'grounding_tier', 'decision', 'example_id', 'evid_index', 'annotator_id')},
+        }
+        self.f.write((',\n' if self.count else '\n') + json.dumps(annotation, separators=(',', ':')))
+        self.count += 1
+        if item['image_id'] not in self.images:
+            self.images[item['image_id']] = {
+                'id': item['image_id'], 'file_name': item['image_path'],
+                'width': item['width'], 'height': item['height'],
+                'dataset': item['dataset'], 'proxy_complexity': item['proxy_complexity'],
+            }
+
+    def close(self, categories):
+        self.f.write('\n],\n"images": [')
+        for i, image_id in enumerate(sorted(self.images)):
+            self.f.write((',\n' if i else '\n') + json.dumps(self.images[image_id], separators=(',', ':')))
+        supercategory = 'grounding_tier' if categories.mode == 'tier' else 'evid_phrase'
+        self.f.write('\n],\n"categories": ' + json.dumps([
+            {'id': categories.ids[name], 'name': name, 'supercategory': supercategory}
+            for name in categories.names
+        ]) + '}\n')
+        self.f.close()
+
+
+class YoloWriter:
+    """
+    Writes YOLO label files into shard directories of at most `shard_size`
+    images, next to images/ symlinks so each shard is a trainable dataset
+    directory. Boxes of one image may arrive from anywhere in the input, so
+    label files are truncated on an image's first box and appended to after.
+    """
+
+    def __init__(self, out_dir, images_dir, shard_size=DEFAULT_SHARD_SIZE, link_images=True):
+        self.out_dir = Path(out_dir)
+        self.images_dir = Path(images_dir).resolve()
+        self.shard_size = shard_size
+        self.link_images = link_images
+        self.label_paths = {}  # image_id -> label file written in this run
+        self.shards = set()
+        self.count = 0
+
+    def _start_image(self, item):
+        """Create the image's shard entry and return its (truncated) label file path."""
+        shard = self.out_dir / f"shard_{(item['image_id'] - 1) // self.shard_size:04d}"
+        # Flatten subdirectories and keep the extension in the stem: labels are
+        # matched to images by stem, and a.jpg / a.png must not share a label file
+        image_path = Path(item['image_path'])
+        stem = '__'.join(image_path.with_suffix('').parts) + image_path.suffix.replace('.', '_')
+        label_path = shard / 'labels' / f"{stem}.txt"
+        label_path.parent.mkdir(parents=True, exist_ok=True)
+        label_path.write_text('')
+        if self.link_images:
+            link = shard / 'images' / f"{stem}{image_path.suffix}"
+            link.parent.mkdir(exist_ok=True)
+            if link.is_symlink() or link.exists():
+                link.unlink()
+            link.symlink_to(self.images_dir / image_path)
+        self.shards.add(shard.name)
+        return label_path
+
+    def add(self, item):
+        label_path = self.label_paths.get(item['image_id'])
+        if label_path is None:
+            label_path = self.label_paths[item['image_id']] = self._start_image(item)
+        x1, y1, x2, y2 = item['bbox_norm_xyxy']
+        with open(label_path, 'a') as f:
+            f.write(f"{item['category_id'] - 1} {(x1 + x2) / 2:.6f} {(y1 + y2) / 2:.6f} "
+                    f"{x2 - x1:.6f} {y2 - y1:.6f}\n")
+        self.count += 1
+
+    def close(self, categories):
+        names = categories.names
+        with open(self.out_dir / 'classes.txt', 'w') as f:
+            f.writelines(f"{name}\n" for name in names)
+        with open(self.out_dir / 'data.yaml', 'w') as f:
+            f.write(f"path: {json.dumps(str(self.out_dir.resolve()))}\n")
+            f.write("train:\n" + ''.join(f"  - {shard}/images\n" for shard in sorted(self.shards)))
+            f.write(f"nc: {len(names)}\n")
+            f.write("names:\n" + ''.join(f"  {i}: {json.dumps(name)}\n" for i, name in enumerate(names)))
+
+
+class JsonlWriter:
+    """One flat JSON line per exported EVID, boxes in normalized and pixel coordinates."""
+
+    FIELDS = ('example_id', 'evid_index', 'annotator_id', 'image_path', 'width', 'height', 'dataset',
+              'proxy_complexity', 'question', 'answer', 'evid_phrase', 'grounding_tier', 'decision',
+              'category', 'bbox', 'bbox_xyxy')
+
+    def __init__(self, path):
+        self.f = open(path, 'w')
+        self.count = 0
+
+    def add(self, item):
+        self.f.write(json.dumps({key: item.get(key) for key in self.FIELDS}) + '\n')
+        self.count += 1
+
+    def close(self, categories):
+        self.f.close()
+
+
+def export_training(paths, proposals_path, images_dir, out_dir, formats=FORMATS, category_mode='tier',
+                    shard_size=DEFAULT_SHARD_SIZE, workers=None, link_images=True):
+    """
+    Export the latest record of every (annotator, EVID) in `paths`.
+
+    Returns:
+        dict: counts of selected, exported and skipped records plus per-format outputs
+    """
+    files = annotation_files(paths)
+    image_meta = load_image_meta(proposals_path)
+    selected = select_records(files)
+
+    unknown_examples = {example_id for _, example_id, _ in selected if example_id not in image_meta}
+    image_paths = sorted({image_meta[example_id][0] for _, example_id, _ in selected
+                          if example_id in image_meta})
+    sizes, unreadable = resolve_image_sizes(images_dir, image_paths, workers=workers)
+    image_ids = {rel_path: i + 1 for i, rel_path in enumerate(image_paths)}
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writers = {}
+    if 'coco' in formats:
+        writers['coco'] = CocoWriter(out_dir / 'coco.json')
+    if 'yolo' in formats:
+        writers['yolo'] = YoloWriter(out_dir / 'yolo', images_dir, shard_size, link_images)
+    if 'jsonl' in formats:
+        writers['jsonl'] = JsonlWriter(out_dir / 'annotations.jsonl')
+    box_writers = list(writers.values())
+
+    categories = Categories(category_mode)
+    wanted = set(selected.values())
+    del selected
+    counts = {'boxes': 0, 'no_grounding': 0, 'rejected': 0, 'degenerate': 0,
+              'unknown_example': 0, 'missing_image': 0}
+
+    for file_no, path in enumerate(files):
+        for record_no, record in enumerate(iter_records(path)):
+            if (file_no, record_no) not in wanted:
+                continue
+            final_bbox = record.get('final_bbox')
+            if final_bbox is None:
+                counts['rejected'] += 1
+                continue
+            meta = image_meta.get(record['example_id'])
+            if meta is None:
+                counts['unknown_example'] += 1
+                continue
+            image_path, dataset, proxy_complexity = meta
+            if image_path not in sizes:
+                counts['missing_image'] += 1
+                continue
+            width, height = sizes[image_path]
+            item = {
+                'example_id': record['example_id'],
+                'evid_index': record['evid_index'],
+                'annotator_id': record_identity(record, path)[0],
+                'image_path': image_path,
+                'image_id': image_ids[image_path],
+                'width': width,
+                'height': height,
+                'dataset': dataset,
+                'proxy_complexity': proxy_complexity,
+                'question': record.get('question'),
+                'answer': record.get('answer'),
+                'evid_phrase': record.get('evid_phrase'),
+                'decision': record.get('decision'),
+            }
+
+            if final_bbox == NO_GROUNDING:
+                item.update(grounding_tier='tier3_no_grounding', bbox=None, bbox_xyxy=None)
+                counts['no_grounding'] += 1
+                if 'jsonl' in writers:
+                    writers['jsonl'].add(item)
+                continue
+
+            clipped = clip_box(final_bbox)
+            if clipped is None:
+                counts['degenerate'] += 1
+                continue
+            tier = record.get('grounding_tier')
+            if tier not in BOX_TIERS:
+                tier = grounding_tier(final_bbox)
+            phrase = normalize_phrase(item['evid_phrase'])
+            category_id = categories.id_for(tier, phrase)
+            x1, y1, x2, y2 = clipped
+            item.update(
+                grounding_tier=tier,
+                category=tier if category_mode == 'tier' else phrase,
+                category_id=category_id,
+                bbox=final_bbox,
+                bbox_norm_xyxy=clipped,
+                bbox_xyxy=[round(x1 * width, 2), round(y1 * height, 2),
+                           round(x2 * width, 2), round(y2 * height, 2)],
+            )
+            for writer in box_writers:
+                writer.add(item)
+            counts['boxes'] += 1
+
+    for writer in writers.values():
+        writer.close(categories)
+
+    return {
+        'files': len(files),
+        'selected': len(wanted),
+        **counts,
+        'unknown_examples': sorted(unknown_examples),
+        'unreadable_images': unreadable,
+        'categories': len(categories.ids),
+        'outputs': {name: writer.count for name, writer in writers.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export verified boxes to COCO / YOLO / JSONL")
+    parser.add_argument('paths', nargs='*', default=['annotations/'],
+                        help="Annotation files or directories (default: annotations/)")
+    parser.add_argument('--proposals', default=DEFAULT_PROPOSALS, help="Proposals file (for image paths)")
+    parser.add_argument('--images', default='images/', help="Images directory")
+    parser.add_argument('-o', '--output', default='training_export', help="Output directory")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--category', choices=CATEGORY_MODES, default='tier',
+                        help="Categorize boxes by grounding tier or by EVID phrase")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="Images per YOLO shard")
+    parser.add_argument('--no-link-images', action='store_true', help="Do not symlink images into YOLO shards")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for image size lookups (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.time()
+    stats = export_training(args.paths, args.proposals, args.images, args.output, formats=args.formats,
+                            category_mode=args.category, shard_size=args.shard_size,
+                            workers=args.workers, link_images=not args.no_link_images)
+    print(f"✅ Exported {stats['boxes']} boxes and {stats['no_grounding']} NO_VISIBLE_GROUNDING EVIDs "
+          f"from {stats['selected']} records in {stats['files']} files ({stats['categories']} categories)")
+    print(f"   Skipped: {stats['rejected']} rejected, {stats['degenerate']} degenerate boxes, "
+          f"{stats['unknown_example']} unknown examples, {stats['missing_image']} missing images")
+    for example_id in stats['unknown_examples'][:10]:
+        print(f"⚠️  Not in proposals: {example_id}")
+    for rel_path in stats['unreadable_images'][:10]:
+        print(f"⚠️  Cannot read image: {rel_path}")
+    for name, count in stats['outputs'].items():
+        print(f"📄 {name}: {count} entries")
+    print(f"\nDone in {time.time() - start:.1f}s → {args.output}")
+
+
+if __name__ == '__main__':
+    main()
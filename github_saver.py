@@ -1,67 +1,197 @@
 import requests
 import base64
 import json
+import threading
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import timed
+
+DEFAULT_REPO = "aizanzafar/miccai-2026-annotation"
+DEFAULT_BRANCH = "main"
+API_ROOT = "https://api.github.com"
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class GitHubClient:
+    """
+    Reusable GitHub contents API client.
+
+    Keeps one pooled `requests.Session` (TLS connections are reused across
+    saves) and retries transient failures with exponential backoff. It
+    remembers the blob SHA of each annotations file from the last write or
+    load, so an update needs only the PUT, and loads use conditional
+    requests (`If-None-Match`).
+    """
+
+    def __init__(self, token, repo=DEFAULT_REPO, branch=DEFAULT_BRANCH):
+        self.repo = repo
+        self.branch = branch
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        })
+        # Only GETs are retried on error statuses; a PUT is retried on
+        # connection failures only, since a repeated PUT with a stale SHA
+        # is rejected anyway
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._shas = {}  # filename -> blob SHA from the last write or load
+        self._loaded = {}  # filename -> (ETag, sha, annotations) of the last 200 GET
+
+    def _contents_url(self, filename):
+        return f"{API_ROOT}/repos/{self.repo}/contents/{filename}"
+
+    def fetch(self, annotator_id):
+        """
+        Conditionally GET the annotations file.
+
+        Returns:
+            tuple: (annotations, sha); ([], None) if the file does not exist
+                and (None, None) on any other failure
+        """
+        filename = f"annotations/{annotator_id}.json"
+        with self._lock:
+            loaded = self._loaded.get(filename)
+        headers = {"If-None-Match": loaded[0]} if loaded else {}
+
+        with timed('github.get'):
+            response = self.session.get(self._contents_url(filename), headers=headers,
+                                        params={"ref": self.branch}, timeout=REQUEST_TIMEOUT)
+
+        if response.status_code == 304 and loaded:
+            return list(loaded[2]), loaded[1]
+        if response.status_code == 200:
+            body = response.json()
+            content_bytes = base64.b64decode(body["content"])
+            annotations = json.loads(content_bytes.decode('utf-8'))
+            with self._lock:
+                self._shas[filename] = body["sha"]
+                etag = response.headers.get("ETag")
+                if etag:
+                    self._loaded[filename] = (etag, body["sha"], annotations)
+            return list(annotations), body["sha"]
+        if response.status_code == 404:
+            with self._lock:
+                self._shas.pop(filename, None)
+                self._loaded.pop(filename, None)
+            return [], None
+        return None, None
+
+    def put(self, annotator_id, annotations, sha):
+        """
+        Write the annotations file on top of blob `sha` (None to create it).
+
+        Returns:
+            tuple: (status_code, new sha or None, message)
+        """
+        filename = f"annotations/{annotator_id}.json"
+        content = json.dumps(annotations, indent=2)
+        commit_data = {
+            "message": f"Auto-save: {annotator_id} - {len(annotations)} annotations ({datetime.now().strftime('%Y-%m-%d %H:%M')})",
+            "content": base64.b64encode(content.encode('utf-8')).decode('utf-8'),
+            "branch": self.branch
+        }
+        if sha:
+            commit_data["sha"] = sha
+
+        with timed('github.put'):
+            response = self.session.put(self._contents_url(filename), json=commit_data,
+                                        timeout=REQUEST_TIMEOUT)
+        if response.status_code in [200, 201]:
+            new_sha = response.json()["content"]["sha"]
+            with self._lock:
+                self._shas[filename] = new_sha
+                self._loaded.pop(filename, None)  # The GET representation changed
+            return response.status_code, new_sha, f"✅ Auto-saved {len(annotations)} annotations to GitHub!"
+        return response.status_code, None, f"❌ GitHub save failed: {response.status_code} - {response.text[:100]}"
+
+    def load(self, annotator_id):
+        """Return annotations stored for `annotator_id` (empty list if none)."""
+        annotations, _ = self.fetch(annotator_id)
+        return annotations or []
+
+    def save(self, annotations, annotator_id):
+        """Create or overwrite the annotations file; returns (success, message)."""
+        filename = f"annotations/{annotator_id}.json"
+        with self._lock:
+            known = filename in self._shas
+        if not known:
+            # First write from this process: learn the SHA (if the file exists)
+            self.fetch(annotator_id)
+
+        for attempt in range(2):
+            with self._lock:
+                sha = self._shas.get(filename)
+            status, _, message = self.put(annotator_id, annotations, sha)
+            if status in [409, 422] and attempt == 0:
+                # Cached SHA is stale: refresh it and retry once
+                self.fetch(annotator_id)
+                continue
+            return status in [200, 201], message
+
+    def test_connection(self):
+        """Check that the repository is reachable with the configured token."""
+        response = self.session.get(f"{API_ROOT}/repos/{self.repo}", timeout=REQUEST_TIMEOUT)
+        if response.status_code == 200:
+            return True, "✅ GitHub connection successful"
+        return False, f"❌ GitHub connection failed: {response.status_code}"
+
+
+def get_client():
+    """
+    Return the process-wide GitHubClient, or None if no token is configured.
+
+    Streamlit secrets are read once, when the client is first created.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import streamlit as st
+
+            token = st.secrets.get("github_token", "")
+            if not token:
+                return None
+            _client = GitHubClient(
+                token,
+                repo=st.secrets.get("github_repo", DEFAULT_REPO),
+                branch=st.secrets.get("github_branch", DEFAULT_BRANCH)
+            )
+        return _client
+
 
 def save_to_github(annotations, annotator_id):
     """
     Automatically save annotations to GitHub using GitHub API.
-    
+
     Args:
         annotations: List of annotation dictionaries
         annotator_id: Annotator's ID for filename
-    
+
     Returns:
         tuple: (success: bool, message: str)
     """
     try:
-        import streamlit as st
-        
-        # Get GitHub credentials from Streamlit secrets
-        token = st.secrets.get("github_token", "")
-        repo = st.secrets.get("github_repo", "aizanzafar/miccai-2026-annotation")
-        branch = st.secrets.get("github_branch", "main")
-        
-        if not token:
+        client = get_client()
+        if client is None:
             return False, "GitHub token not configured. Using manual download instead."
-        
-        # Prepare file content
-        filename = f"annotations/{annotator_id}.json"
-        content = json.dumps(annotations, indent=2)
-        content_bytes = content.encode('utf-8')
-        content_b64 = base64.b64encode(content_bytes).decode('utf-8')
-        
-        # GitHub API endpoint
-        api_url = f"https://api.github.com/repos/{repo}/contents/{filename}"
-        
-        # Headers
-        headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Check if file exists (to get SHA for update)
-        response = requests.get(api_url, headers=headers, params={"ref": branch})
-        
-        # Prepare commit data
-        commit_data = {
-            "message": f"Auto-save: {annotator_id} - {len(annotations)} annotations ({datetime.now().strftime('%Y-%m-%d %H:%M')})",
-            "content": content_b64,
-            "branch": branch
-        }
-        
-        # If file exists, add SHA for update
-        if response.status_code == 200:
-            commit_data["sha"] = response.json()["sha"]
-        
-        # Create/update file
-        response = requests.put(api_url, headers=headers, json=commit_data)
-        
-        if response.status_code in [200, 201]:
-            return True, f"✅ Auto-saved {len(annotations)} annotations to GitHub!"
-        else:
-            return False, f"❌ GitHub save failed: {response.status_code} - {response.text[:100]}"
-            
+        return client.save(annotations, annotator_id)
+
     except Exception as e:
         return False, f"❌ Error saving to GitHub: {str(e)}"
 
@@ -69,75 +199,99 @@ def save_to_github(annotations, annotator_id):
 def load_from_github(annotator_id):
     """
     Load existing annotations from GitHub.
-    
+
     Args:
         annotator_id: Annotator's ID for filename
-    
+
     Returns:
         list: Existing annotations or empty list if not found
     """
     try:
-        import streamlit as st
-        
-        # Get GitHub credentials from Streamlit secrets
-        token = st.secrets.get("github_token", "")
-        repo = st.secrets.get("github_repo", "aizanzafar/miccai-2026-annotation")
-        branch = st.secrets.get("github_branch", "main")
-        
-        if not token:
-            return []
-        
-        # Prepare file path
-        filename = f"annotations/{annotator_id}.json"
-        
-        # GitHub API endpoint
-        api_url = f"https://api.github.com/repos/{repo}/contents/{filename}"
-        
-        # Headers
-        headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Try to get file
-        response = requests.get(api_url, headers=headers, params={"ref": branch})
-        
-        if response.status_code == 200:
-            # Decode content
-            content_b64 = response.json()["content"]
-            content_bytes = base64.b64decode(content_b64)
-            content_str = content_bytes.decode('utf-8')
-            annotations = json.loads(content_str)
-            return annotations
-        else:
+        client = get_client()
+        if client is None:
             return []
-            
+        return client.load(annotator_id)
+
     except Exception as e:
         return []
 
 
+def sync_store_from_github(store, annotator_id):
+    """
+    Merge the annotations on GitHub into an AnnotationStore.
+
+    Args:
+        store: annotation_store.AnnotationStore of the current session
+        annotator_id: Annotator's ID for filename
+
+    Returns:
+        bool: True if the remote state could be loaded
+    """
+    try:
+        client = get_client()
+        if client is None:
+            return False
+        annotations, sha = client.fetch(annotator_id)
+        if annotations is None:
+            return False
+        store.merge_remote(annotations, sha)
+        return True
+
+    except Exception as e:
+        return False
+
+
+def save_store_to_github(store, annotator_id):
+    """
+    Write an AnnotationStore's changes to GitHub.
+
+    The store already holds the remote content it was last synced against,
+    so a save is a single PUT of the whole file on top of the remembered
+    blob SHA. Only if the file changed elsewhere (stale SHA) is it
+    re-fetched; the remote records are then merged into the store (local
+    changes win) and the write is retried once.
+
+    Args:
+        store: annotation_store.AnnotationStore of the current session
+        annotator_id: Annotator's ID for filename
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    try:
+        client = get_client()
+        if client is None:
+            return False, "GitHub token not configured. Using manual download instead."
+
+        flushed = store.dirty_records()
+        if not flushed:
+            return True, "✅ All annotations already saved to GitHub"
+        if not store.synced and not sync_store_from_github(store, annotator_id):
+            return False, "❌ Could not load existing annotations from GitHub"
+
+        for attempt in range(2):
+            status, sha, message = client.put(annotator_id, store.records(), store.remote_version)
+            if status in [200, 201]:
+                store.mark_synced(flushed, sha)
+                return True, message
+            if status in [409, 422] and attempt == 0:
+                if not sync_store_from_github(store, annotator_id):
+                    break
+                continue
+            break
+        return False, message
+
+    except Exception as e:
+        return False, f"❌ Error saving to GitHub: {str(e)}"
+
+
 def test_github_connection():
     """Test if GitHub API is accessible with current token."""
     try:
-        import streamlit as st
-        token = st.secrets.get("github_token", "")
-        repo = st.secrets.get("github_repo", "aizanzafar/miccai-2026-annotation")
-        
-        if not token:
+        client = get_client()
+        if client is None:
             return False, "No GitHub token configured"
-        
-        headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Test connection by getting repo info
-        response = requests.get(f"https://api.github.com/repos/{repo}", headers=headers)
-        
-        if response.status_code == 200:
-            return True, "✅ GitHub connection successful"
-        else:
-            return False, f"❌ GitHub connection failed: {response.status_code}"
-            
+        return client.test_connection()
+
     except Exception as e:
         return False, f"❌ Connection error: {str(e)}"
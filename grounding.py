@@ -0,0 +1,50 @@
+"""
+Bbox value kinds and the grounding tier rule, shared by the app and the
+offline tools.
+
+Annotation records store boxes as normalized [x_c, y_c, w, h], or the
+string NO_VISIBLE_GROUNDING, or None for rejected EVIDs. This module is
+plain Python so the app can import it at startup; the NumPy array helpers
+built on it live in bbox_ops.
+"""
+
+NO_GROUNDING = 'NO_VISIBLE_GROUNDING'
+
+TIGHT_AREA = 0.3  # Normalized area below which a box is tier1_tight
+
+# Kind codes of a final_bbox value
+KIND_MISSING = 0  # Annotator has no record for the EVID
+KIND_BOX = 1
+KIND_NO_GROUNDING = 2
+KIND_REJECTED = 3
+
+KIND_NAMES = {
+    KIND_MISSING: 'missing',
+    KIND_BOX: 'box',
+    KIND_NO_GROUNDING: 'no_grounding',
+    KIND_REJECTED: 'rejected',
+}
+
+
+def bbox_kind(value):
+    """Return the kind code of a final_bbox / proposed_bbox value."""
+    if value is None:
+        return KIND_REJECTED
+    if value == NO_GROUNDING:
+        return KIND_NO_GROUNDING
+    return KIND_BOX
+
+
+def grounding_tier(final_bbox):
+    """
+    Return the grounding tier the app assigns to a final bbox value.
+
+    Boxes covering less than TIGHT_AREA of the image (normalized w * h) are
+    tight, larger ones anatomical.
+    """
+    if final_bbox == NO_GROUNDING:
+        return 'tier3_no_grounding'
+    if final_bbox is None:
+        return 'rejected'
+    area = final_bbox[2] * final_bbox[3]
+    return 'tier1_tight' if area < TIGHT_AREA else 'tier2_anatomical'
@@ -0,0 +1,305 @@
+"""
+Inter-annotator agreement (IAA) on the overlap subset.
+
+Loads every annotator's records, aligns them on (example_id, evid_index) and
+scores every annotator pair on every EVID both of them annotated:
+
+- both drew a box: IoU of the two final boxes
+- otherwise: categorical agreement, 1 if both chose NO_VISIBLE_GROUNDING
+  or both rejected the EVID, 0 if their decisions differ in kind
+
+All pairs are scored in batched NumPy over a (annotators x EVIDs) layout,
+so cost grows with the number of overlapping records rather than with
+Python-level loops over pairs. Mean and median agreement are reported with
+percentile bootstrap confidence intervals, overall, per annotator pair and
+broken down by dataset, grounding tier and proxy complexity, and checked
+against the guideline targets (mean >= 0.70, median >= 0.75).
+
+Usage:
+    python iaa.py annotations/ [--proposals bbox_proposals_qwen_v1.json] [--json iaa_report.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from annotation_io import load_annotators
+from bbox_ops import KIND_BOX, KIND_MISSING, iou, records_to_arrays
+from proposals_store import open_proposals
+
+MEAN_TARGET = 0.70
+MEDIAN_TARGET = 0.75
+DEFAULT_PROPOSALS = 'bbox_proposals_qwen_v1.json'
+DEFAULT_BOOTSTRAP = 1000
+CONFIDENCE = 0.95
+MAX_CELLS = 4_000_000  # Upper bound on array cells processed per batch
+BOOTSTRAP_PRECISION = 3  # Decimals kept when resampling scores
+UNKNOWN = 'unknown'
+BREAKDOWNS = ('dataset', 'grounding_tier', 'proxy_complexity')
+
+
+def load_example_meta(proposals_path):
+    """Return {example_id: {'dataset': ..., 'proxy_complexity': ...}} from a proposals file."""
+    meta = {}
+    for _, ex in open_proposals(proposals_path).iter_examples():
+        meta[ex['id']] = {
+            'dataset': ex.get('dataset', UNKNOWN),
+            'proxy_complexity': ex.get('proxy_complexity', UNKNOWN),
+        }
+    return meta
+
+
+class AlignedAnnotations:
+    """Records of all annotators laid out on a shared EVID axis."""
+
+    def __init__(self, annotators):
+        """
+        Args:
+            annotators: {annotator_id: {(example_id, evid_index): record}}
+        """
+        self.names = sorted(annotators)
+        self.keys = sorted(set().union(*annotators.values())) if annotators else []
+        key_index = {key: i for i, key in enumerate(self.keys)}
+        shape = (len(self.names), len(self.keys))
+
+        self.kinds = np.full(shape, KIND_MISSING, dtype=np.int8)
+        self.boxes = np.full(shape + (4,), np.nan)
+        self.tiers = np.full(shape, -1, dtype=np.int16)
+        tier_codes = {}
+
+        for a, name in enumerate(self.names):
+            records = annotators[name]
+            cols = np.fromiter((key_index[key] for key in records), dtype=np.int64, count=len(records))
+            kinds, boxes = records_to_arrays([r.get('final_bbox') for r in records.values()])
+            self.kinds[a, cols] = kinds
+            self.boxes[a, cols] = boxes
+            tiers = [tier_codes.setdefault(r.get('grounding_tier') or UNKNOWN, len(tier_codes))
+                     for r in records.values()]
+            self.tiers[a, cols] = tiers
+        self.tier_names = list(tier_codes)
+        self.pairs = list(itertools.combinations(range(len(self.names)), 2))
+
+    def pair_scores(self):
+        """
+        Score every annotator pair on every EVID both annotated.
+
+        Returns:
+            dict of equal-length arrays: 'pair' (index into self.pairs),
+                'key' (index into self.keys), 'score', 'both_box' (bool),
+                'tier' (shared tier code, or -1 when the annotators disagree)
+        """
+        out = {name: [] for name in ('pair', 'key', 'score', 'both_box', 'tier')}
+        if not self.pairs or not self.keys:
+            return {name: np.array([]) for name in out}
+
+        pair_i = np.array([i for i, _ in self.pairs])
+        pair_j = np.array([j for _, j in self.pairs])
+        chunk = max(1, MAX_CELLS // len(self.keys))
+        for start in range(0, len(self.pairs), chunk):
+            pi, pj = pair_i[start:start + chunk], pair_j[start:start + chunk]
+            ki, kj = self.kinds[pi], self.kinds[pj]
+            rows, cols = np.nonzero((ki != KIND_MISSING) & (kj != KIND_MISSING))
+            a, b = pi[rows], pj[rows]
+            kind_a, kind_b = ki[rows, cols], kj[rows, cols]
+
+            score = (kind_a == kind_b).astype(np.float64)
+            both_box = (kind_a == KIND_BOX) & (kind_b == KIND_BOX)
+            score[both_box] = iou(self.boxes[a[both_box], cols[both_box]],
+                                  self.boxes[b[both_box], cols[both_box]])
+            tier_a, tier_b = self.tiers[a, cols], self.tiers[b, cols]
+
+            out['pair'].append(start + rows)
+            out['key'].append(cols)
+            out['score'].append(score)
+            out['both_box'].append(both_box)
+            out['tier'].append(np.where(tier_a == tier_b, tier_a, -1))
+        return {name: np.concatenate(parts) for name, parts in out.items()}
+
+
+def bootstrap(scores, n_boot=DEFAULT_BOOTSTRAP, seed=0, confidence=CONFIDENCE):
+    """
+    Percentile bootstrap CIs of the mean and median of `scores`.
+
+    Scores are rounded to BOOTSTRAP_PRECISION decimals and resampled with
+    the Poisson bootstrap: each distinct value's count is redrawn as
+    Poisson(count), so a resample costs one draw per distinct value instead
+    of n random indices and does not grow with the number of scored pairs.
+    Resamples that draw no value at all (likely for small groups: probability
+    exp(-n)) have no mean or median and are left out of the percentiles.
+
+    Returns:
+        tuple: ((mean_lo, mean_hi), (median_lo, median_hi))
+    """
+    n = len(scores)
+    if n == 0 or n_boot <= 0:
+        return (None, None), (None, None)
+    values, counts = np.unique(np.round(scores, BOOTSTRAP_PRECISION), return_counts=True)
+    rng = np.random.default_rng(seed)
+    means, medians = np.empty(n_boot), np.empty(n_boot)
+    block = max(1, MAX_CELLS // len(values))
+    for start in range(0, n_boot, block):
+        stop = min(n_boot, start + block)
+        resampled = rng.poisson(counts, size=(stop - start, len(values)))
+        totals = resampled.sum(axis=1)
+        empty = totals == 0
+        totals[empty] = 1
+        cumulative = np.cumsum(resampled, axis=1)
+        means[start:stop] = np.where(empty, np.nan, resampled @ values / totals)
+        medians[start:stop] = np.where(
+            empty, np.nan, values[np.argmax(cumulative * 2 >= totals[:, None], axis=1)])
+    valid = ~np.isnan(means)
+    if not valid.any():
+        return (None, None), (None, None)
+    tail = (1 - confidence) / 2 * 100
+    q = [tail, 100 - tail]
+    return (tuple(np.percentile(means[valid], q).tolist()),
+            tuple(np.percentile(medians[valid], q).tolist()))
+
+
+def summarize(scores, both_box, n_boot=DEFAULT_BOOTSTRAP, seed=0):
+    """Return agreement statistics for one group of scored pairs."""
+    if len(scores) == 0:
+        return {'n': 0}
+    mean_ci, median_ci = bootstrap(scores, n_boot, seed)
+    box_scores = scores[both_box]
+    return {
+        'n': int(len(scores)),
+        'mean': float(scores.mean()),
+        'median': float(np.median(scores)),
+        'mean_ci': mean_ci,
+        'median_ci': median_ci,
+        'n_box': int(len(box_scores)),
+        'box_mean_iou': float(box_scores.mean()) if len(box_scores) else None,
+        'box_median_iou': float(np.median(box_scores)) if len(box_scores) else None,
+        'categorical_agreement': float(scores[~both_box].mean()) if (~both_box).any() else None,
+    }
+
+
+def group_summaries(labels, scored, n_boot, seed):
+    """Summarize `scored` separately for every distinct value in `labels`."""
+    groups = {}
+    values, inverse = np.unique(labels, return_inverse=True)
+    for code, value in enumerate(values):
+        mask = inverse == code
+        groups[str(value)] = summarize(scored['score'][mask], scored['both_box'][mask], n_boot, seed)
+    return groups
+
+
+def compute_iaa(annotators, meta=None, n_boot=DEFAULT_BOOTSTRAP, seed=0):
+    """
+    Compute the full IAA report.
+
+    Args:
+        annotators: {annotator_id: {(example_id, evid_index): record}}
+        meta: Optional {example_id: {'dataset', 'proxy_complexity'}}
+        n_boot: Bootstrap resamples per CI (0 disables CIs)
+        seed: RNG seed for reproducible CIs
+
+    Returns:
+        dict: JSON-serializable report
+    """
+    meta = meta or {}
+    aligned = AlignedAnnotations(annotators)
+    scored = aligned.pair_scores()
+
+    example_ids = [key[0] for key in aligned.keys]
+    key_labels = {
+        field: np.array([meta.get(ex_id, {}).get(field, UNKNOWN) for ex_id in example_ids] or [UNKNOWN])
+        for field in ('dataset', 'proxy_complexity')
+    }
+    tier_names = np.array(aligned.tier_names + ['disagree'])
+    key_idx = scored['key'].astype(np.int64)
+    labels = {
+        'dataset': key_labels['dataset'][key_idx],
+        'proxy_complexity': key_labels['proxy_complexity'][key_idx],
+        'grounding_tier': tier_names[scored['tier'].astype(np.int64)],  # -1 -> 'disagree'
+    }
+
+    overall = summarize(scored['score'], scored['both_box'], n_boot, seed)
+    pair_names = np.array([f"{aligned.names[i]} vs {aligned.names[j]}"
+                           for i, j in aligned.pairs] or [''])
+    report = {
+        'annotators': {name: int((aligned.kinds[a] != KIND_MISSING).sum())
+                       for a, name in enumerate(aligned.names)},
+        'evids': len(aligned.keys),
+        'overlap_evids': int(len(np.unique(key_idx))),
+        'overall': overall,
+        'targets': {
+            'mean': MEAN_TARGET,
+            'median': MEDIAN_TARGET,
+            'mean_met': overall.get('mean', 0) >= MEAN_TARGET if overall['n'] else None,
+            'median_met': overall.get('median', 0) >= MEDIAN_TARGET if overall['n'] else None,
+        },
+        'pairs': group_summaries(pair_names[scored['pair'].astype(np.int64)], scored, n_boot, seed)
+        if overall['n'] else {},
+    }
+    for field in BREAKDOWNS:
+        report[field] = group_summaries(labels[field], scored, n_boot, seed) if overall['n'] else {}
+    return report
+
+
+def _format_row(name, stats):
+    if not stats['n']:
+        return f"  {name:<32} n=0"
+    ci = stats['mean_ci']
+    ci_text = f" [{ci[0]:.3f}, {ci[1]:.3f}]" if ci[0] is not None else ''
+    mci = stats['median_ci']
+    mci_text = f" [{mci[0]:.3f}, {mci[1]:.3f}]" if mci[0] is not None else ''
+    return (f"  {name:<32} n={stats['n']:<7} mean={stats['mean']:.3f}{ci_text}  "
+            f"median={stats['median']:.3f}{mci_text}")
+
+
+def print_report(report):
+    print(f"Annotators: {', '.join(f'{k} ({v})' for k, v in report['annotators'].items()) or 'none'}")
+    print(f"Overlap EVIDs: {report['overlap_evids']} of {report['evids']}")
+    overall = report['overall']
+    if not overall['n']:
+        print("⚠️ No EVID was annotated by more than one annotator")
+        return
+
+    print("\nOverall agreement (IoU for box pairs, categorical otherwise):")
+    print(_format_row('all pairs', overall))
+    if overall['box_mean_iou'] is not None:
+        print(f"  box pairs only: n={overall['n_box']} mean IoU={overall['box_mean_iou']:.3f} "
+              f"median IoU={overall['box_median_iou']:.3f}")
+    targets = report['targets']
+    print(f"  {'✅' if targets['mean_met'] else '❌'} mean >= {targets['mean']:.2f}   "
+          f"{'✅' if targets['median_met'] else '❌'} median >= {targets['median']:.2f}")
+
+    for section in ('pairs',) + BREAKDOWNS:
+        print(f"\nBy {section.replace('_', ' ')}:")
+        for name, stats in report[section].items():
+            print(_format_row(name, stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inter-annotator agreement on overlapping EVIDs")
+    parser.add_argument('paths', nargs='*', default=['annotations/'],
+                        help="Annotation files or directories (default: annotations/)")
+    parser.add_argument('--proposals', default=DEFAULT_PROPOSALS,
+                        help="Proposals file for dataset/complexity breakdowns")
+    parser.add_argument('--bootstrap', type=int, default=DEFAULT_BOOTSTRAP,
+                        help="Bootstrap resamples per CI (0 to skip)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    start = time.time()
+    annotators = load_annotators(args.paths)
+    meta = load_example_meta(args.proposals) if os.path.exists(args.proposals) else {}
+    report = compute_iaa(annotators, meta, n_boot=args.bootstrap, seed=args.seed)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+    print(f"\nDone in {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Process-wide decoded image cache for the annotation interface.
+
+Streamlit re-executes the app script on every widget interaction, so without
+a cache each slider tick re-reads and re-decodes the full image from disk.
+The cache lives at module level, which makes it shared by every session on
+the same Streamlit server process.
+
+Entries are keyed by (path, mtime) so an image replaced on disk is picked up
+on the next access, and the cache is bounded by the estimated decoded size of
+the images it holds.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import timed
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of decoded pixels
+MAX_SIZE_ENTRIES = 100_000  # Dimension-only entries are ~100 bytes each
+
+
+def _file_key(path):
+    """Return the cache key (path, mtime_ns) for an image file."""
+    path = os.fspath(path)
+    return path, os.stat(path).st_mtime_ns
+
+
+def _image_nbytes(img):
+    """Estimate the memory footprint of a decoded PIL image (or array-like entry)."""
+    nbytes = getattr(img, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    return img.width * img.height * len(img.getbands())
+
+
+class ImageCache:
+    """Bounded LRU cache of decoded RGB images and their dimensions."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()  # key -> (image, nbytes)
+        self._sizes = OrderedDict()  # key -> (width, height)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Return the decoded RGB image for `path`.
+
+        The returned image is shared between sessions and must be treated as
+        read-only; call `.copy()` before drawing on it.
+        """
+        from PIL import Image  # Pillow (and NumPy, which it imports) load on first use
+
+        key = _file_key(path)
+
+        def decode():
+            with timed('image_decode'):
+                return Image.open(key[0]).convert('RGB')
+
+        return self.get_or_load(key, decode)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the image cached under `key`, calling `loader()` on a miss.
+
+        Derived per-image data (e.g. numpy arrays) may be cached too; it must
+        expose `nbytes`, and counts against the same byte budget.
+        """
+        with self._lock:
+            entry = self._images.get(key)
+            if entry is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        from PIL import Image
+
+        # Decode outside the lock so other sessions are not blocked on I/O
+        img = loader()
+        is_image = isinstance(img, Image.Image)
+        if is_image:
+            img.load()
+        nbytes = _image_nbytes(img)
+
+        with self._lock:
+            if key not in self._images and nbytes <= self.max_bytes:
+                self._images[key] = (img, nbytes)
+                self.current_bytes += nbytes
+                self._evict()
+            if is_image:
+                self._remember_size(key, img.size)
+        return img
+
+    def size(self, path):
+        """Return (width, height) of the image at `path` without decoding it."""
+        key = _file_key(path)
+        with self._lock:
+            size = self._sizes.get(key)
+            if size is not None:
+                self._sizes.move_to_end(key)
+                self.hits += 1
+                return size
+            self.misses += 1
+
+        from PIL import Image
+
+        # Image.open only parses the header; pixel data is never decoded
+        with Image.open(key[0]) as img:
+            size = img.size
+
+        with self._lock:
+            self._remember_size(key, size)
+        return size
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'images': len(self._images),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        """Drop all cached entries and reset the counters."""
+        with self._lock:
+            self._images.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _remember_size(self, key, size):
+        self._sizes[key] = size
+        self._sizes.move_to_end(key)
+        while len(self._sizes) > MAX_SIZE_ENTRIES:
+            self._sizes.popitem(last=False)
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._images:
+            _, (_, nbytes) = self._images.popitem(last=False)
+            self.current_bytes -= nbytes
+
+
+# Module-level instance shared by every session in the server process
+image_cache = ImageCache()
@@ -0,0 +1,171 @@
+"""
+Precomputed image metadata index.
+
+Scans an images directory once and writes a sidecar index with the
+dimensions, format, file size, content hash and mtime of every image, so the
+annotation app can do all coordinate conversions without opening image files.
+Rebuilds are incremental: only files whose size or mtime changed since the
+last scan are reopened and rehashed.
+
+Usage:
+    python image_index.py images/ [--workers 8]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+INDEX_FILENAME = '.image_index.json'
+INDEX_VERSION = 1
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.gif', '.webp'}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def index_path_for(images_dir):
+    """Return the sidecar index location for an images directory."""
+    return Path(images_dir) / INDEX_FILENAME
+
+
+def iter_image_files(images_dir):
+    """Yield (relative posix path, absolute path) for every image in `images_dir`."""
+    images_dir = Path(images_dir)
+    for root, dirs, files in os.walk(images_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if name.startswith('.') or Path(name).suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = Path(root) / name
+            yield path.relative_to(images_dir).as_posix(), path
+
+
+def scan_image(path):
+    """Return the metadata record for a single image file."""
+    stat = os.stat(path)
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    from PIL import Image
+
+    # Image.open only parses the header; pixel data is never decoded
+    with Image.open(path) as img:
+        width, height = img.size
+        fmt = img.format
+    return {
+        'width': width,
+        'height': height,
+        'format': fmt,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256.hexdigest(),
+    }
+
+
+def _scan_quietly(path):
+    try:
+        return scan_image(path)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def load_index(images_dir):
+    """
+    Load the sidecar index for `images_dir`.
+
+    Returns:
+        dict: Relative image path -> metadata record (empty if no index exists)
+    """
+    try:
+        with open(index_path_for(images_dir), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get('version') != INDEX_VERSION:
+        return {}
+    return index.get('images', {})
+
+
+def is_current(entry, path):
+    """Return True if an index entry still describes the file at `path`."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+
+
+def build_index(images_dir, workers=None):
+    """
+    Build or incrementally update the sidecar index for `images_dir`.
+
+    Args:
+        images_dir: Directory of images to index
+        workers: Number of scanner processes (defaults to CPU count)
+
+    Returns:
+        tuple: (images: dict, stats: dict with scanned/reused/removed/failed counts)
+    """
+    previous = load_index(images_dir)
+    images = {}
+    to_scan = []
+
+    for rel_path, path in iter_image_files(images_dir):
+        entry = previous.get(rel_path)
+        if entry is not None and is_current(entry, path):
+            images[rel_path] = entry
+        else:
+            to_scan.append((rel_path, path))
+
+    failed = {}
+    if to_scan:
+        # Imported here: the app only reads the index and should not pay for multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = [path for _, path in to_scan]
+            for (rel_path, _), record in zip(to_scan, pool.map(_scan_quietly, paths, chunksize=64)):
+                if 'error' in record:
+                    failed[rel_path] = record['error']
+                else:
+                    images[rel_path] = record
+
+    index = {
+        'version': INDEX_VERSION,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'images': dict(sorted(images.items())),
+    }
+    out_path = index_path_for(images_dir)
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp_path, out_path)
+
+    stats = {
+        'scanned': len(to_scan) - len(failed),
+        'reused': len(images) - (len(to_scan) - len(failed)),
+        'removed': len(set(previous) - set(images) - set(failed)),
+        'failed': failed,
+    }
+    return images, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the image metadata sidecar index")
+    parser.add_argument('images_dir', help="Directory of images to index")
+    parser.add_argument('--workers', type=int, default=None, help="Scanner processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.time()
+    images, stats = build_index(args.images_dir, workers=args.workers)
+    print(f"✅ Indexed {len(images)} images in {time.time() - start:.1f}s "
+          f"({stats['scanned']} scanned, {stats['reused']} unchanged, {stats['removed']} removed)")
+    for rel_path, error in stats['failed'].items():
+        print(f"⚠️  {rel_path}: {error}")
+    print(f"📄 {index_path_for(args.images_dir)}")
+
+
+if __name__ == '__main__':
+    main()
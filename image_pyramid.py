@@ -0,0 +1,256 @@
+"""
+Display-resolution image levels for the annotation view.
+
+Source images (e.g. the multi-megapixel ISIC2020 photographs) are far larger
+than the column they are shown in, so sending them at full resolution wastes
+encode time and bandwidth on every rerun. This module builds a downscaled
+display level once per image, caches it on disk and in the process-wide
+image cache, and maps bbox coordinates exactly between display and source
+pixels.
+
+The level lookup table is an LRU bounded by MAX_LEVELS entries, and the
+on-disk cache is pruned (least recently built or reused first) whenever it
+grows past MAX_CACHE_BYTES.
+
+Bbox state in the app stays in source pixels; only rendering happens on the
+display level, so no precision is lost in the saved annotation.
+
+Usage (optional, levels are otherwise built on first view):
+    python image_pyramid.py images/
+    python image_pyramid.py --prune
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from image_cache import image_cache
+from metrics import timed
+
+DEFAULT_MAX_SIDE = 1600  # Longest side (px) of the display level
+
+# Served by Streamlit static file serving (see .streamlit/config.toml)
+STATIC_DIR = Path(__file__).resolve().parent / 'static'
+CACHE_DIR = STATIC_DIR / 'display_cache'
+
+JPEG_QUALITY = 90
+MAX_LEVELS = 20_000  # Lookup entries kept in memory (a few hundred bytes each)
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024  # On-disk display levels before pruning
+PRUNE_TARGET = 0.8  # Pruning stops at this fraction of MAX_CACHE_BYTES
+PRUNE_EVERY = 200  # Levels built between checks of the on-disk cache size
+
+_levels = OrderedDict()  # (source path, mtime_ns, max_side) -> DisplayLevel
+_levels_lock = threading.Lock()
+_builds_since_prune = 0
+
+
+class DisplayLevel:
+    """A downscaled copy of a source image and its coordinate mapping."""
+
+    def __init__(self, path, width, height, source_width, source_height):
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.source_width = source_width
+        self.source_height = source_height
+
+    @property
+    def url(self):
+        """URL of the level relative to the app root (Streamlit static serving)."""
+        return f"app/static/{self.path.relative_to(STATIC_DIR).as_posix()}"
+
+    @property
+    def scale(self):
+        """Display pixels per source pixel along (x, y)."""
+        return self.width / self.source_width, self.height / self.source_height
+
+    def to_display(self, bbox):
+        """Map a source-pixel [x1, y1, x2, y2] box to display pixels."""
+        sx, sy = self.scale
+        x1, y1, x2, y2 = bbox
+        return [x1 * sx, y1 * sy, x2 * sx, y2 * sy]
+
+    def to_source(self, bbox):
+        """Map a display-pixel [x1, y1, x2, y2] box to integer source pixels."""
+        x1, y1, x2, y2 = bbox
+        return [
+            round(x1 * self.source_width / self.width),
+            round(y1 * self.source_height / self.height),
+            round(x2 * self.source_width / self.width),
+            round(y2 * self.source_height / self.height),
+        ]
+
+
+def _level_size(source_size, max_side):
+    """Return the display (width, height) for a source size and max side."""
+    w, h = source_size
+    scale = min(1.0, max_side / max(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _cache_path(source_path, mtime_ns, max_side, source_format):
+    """Return the on-disk location of a display level."""
+    digest = hashlib.sha1(f"{source_path}:{mtime_ns}:{max_side}".encode('utf-8')).hexdigest()[:20]
+    # Browsers cannot show TIFF/BMP, so levels are always PNG or JPEG
+    ext = '.png' if source_format == 'PNG' else '.jpg'
+    return CACHE_DIR / f"{digest}_{max_side}{ext}"
+
+
+def _write_level(img, path):
+    """Atomically write a display level to disk."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    if path.suffix == '.png':
+        img.save(tmp_path, format='PNG', optimize=False)
+    else:
+        img.save(tmp_path, format='JPEG', quality=JPEG_QUALITY)
+    os.replace(tmp_path, path)
+
+
+def display_level(image_path, max_side=DEFAULT_MAX_SIDE):
+    """
+    Return the DisplayLevel for `image_path`, building it on first use.
+
+    Args:
+        image_path: Path to the source image
+        max_side: Longest side of the display level in pixels
+
+    Returns:
+        DisplayLevel: On-disk display image plus its coordinate mapping
+    """
+    source_path = os.path.abspath(os.fspath(image_path))
+    mtime_ns = os.stat(source_path).st_mtime_ns
+    key = (source_path, mtime_ns, max_side)
+
+    with _levels_lock:
+        level = _levels.get(key)
+        if level is not None:
+            _levels.move_to_end(key)
+    if level is not None and level.path.exists():  # The file may have been pruned
+        return level
+
+    from PIL import Image  # Loaded on the first level lookup, not at app startup
+
+    with Image.open(source_path) as src:
+        source_size = src.size
+        width, height = _level_size(source_size, max_side)
+        path = _cache_path(source_path, mtime_ns, max_side, src.format)
+
+        built = False
+        try:
+            os.utime(path)  # Reused: mark as recently used for pruning
+        except FileNotFoundError:
+            with timed('image_level_build'):
+                # JPEG sources can be decoded directly at a reduced scale
+                src.draft('RGB', (width, height))
+                img = src.convert('RGB')
+                if img.size != (width, height):
+                    img = img.resize((width, height), Image.LANCZOS)
+                _write_level(img, path)
+            built = True
+
+    level = DisplayLevel(path, width, height, *source_size)
+    with _levels_lock:
+        _levels[key] = level
+        _levels.move_to_end(key)
+        while len(_levels) > MAX_LEVELS:
+            _levels.popitem(last=False)
+    if built:
+        _maybe_prune()
+    return level
+
+
+def _maybe_prune():
+    """Prune the on-disk cache once every PRUNE_EVERY builds."""
+    global _builds_since_prune
+    with _levels_lock:
+        _builds_since_prune += 1
+        if _builds_since_prune < PRUNE_EVERY:
+            return
+        _builds_since_prune = 0
+    prune_cache()
+
+
+def prune_cache(max_bytes=MAX_CACHE_BYTES):
+    """
+    Delete the least recently used display levels once the on-disk cache
+    exceeds `max_bytes`, down to PRUNE_TARGET of it.
+
+    Returns:
+        tuple: (files removed, bytes freed)
+    """
+    files = []
+    total = 0
+    for entry in os.scandir(CACHE_DIR) if CACHE_DIR.exists() else ():
+        if entry.is_file() and not entry.name.startswith('.'):
+            stat = entry.stat()
+            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0, 0
+
+    removed = freed = 0
+    for _, size, path in sorted(files):
+        if total - freed <= max_bytes * PRUNE_TARGET:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def load_display_image(level):
+    """
+    Return the decoded RGB display image for a level.
+
+    The image comes from the shared image cache and must be treated as
+    read-only; call `.copy()` before drawing on it.
+    """
+    return image_cache.get(level.path)
+
+
+def main():
+    """Prebuild display levels for every image in a directory."""
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Prebuild display-resolution image levels")
+    parser.add_argument('images_dir', nargs='?', help="Directory of source images")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Parallel workers")
+    parser.add_argument('--prune', action='store_true',
+                        help=f"Only prune the cache: if it exceeds {MAX_CACHE_BYTES // 2**20} MB, delete the "
+                             f"least recently used levels down to {PRUNE_TARGET:.0%}% of that")
+    args = parser.parse_args()
+
+    if args.prune:
+        removed, freed = prune_cache()
+        print(f"✅ Removed {removed} display levels ({freed / 2**20:.1f} MB) from {CACHE_DIR}")
+        return
+    if args.images_dir is None:
+        parser.error("images_dir is required unless --prune is given")
+
+    paths = [p for p in sorted(Path(args.images_dir).iterdir()) if p.is_file() and not p.name.startswith('.')]
+    built = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for path, result in zip(paths, pool.map(_build_quietly, paths)):
+            if isinstance(result, Exception):
+                print(f"⚠️  {path.name}: {result}")
+            else:
+                built += 1
+    print(f"✅ Built display levels for {built}/{len(paths)} images in {CACHE_DIR}")
+
+
+def _build_quietly(path):
+    try:
+        return display_level(path)
+    except Exception as e:
+        return e
+
+
+if __name__ == '__main__':
+    main()
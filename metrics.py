@@ -0,0 +1,176 @@
+"""
+Latency instrumentation for the annotation app's hot paths.
+
+Code under measurement is wrapped in `timed(phase)`. Each observation goes
+to the process-wide registry (all sessions on this server process) and, on
+a Streamlit script thread that has bound one, to that session's registry.
+Background threads (prefetch, GitHub save queue) record to the process
+registry only.
+
+Each phase keeps a rolling window of its most recent samples for
+percentiles (p50/p95/p99, what the admin panel shows), and cumulative
+Prometheus-style bucket counts, count and sum since the process started.
+
+Registries can be rendered in the Prometheus text exposition format, or as
+one JSON line of per-phase summaries. `dump_metrics` writes either form to
+a local file that a scraper can read, e.g. the node_exporter textfile
+collector for *.prom or a log shipper for *.jsonl.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 1000  # Recent samples kept per phase for percentiles
+# Upper bounds (seconds) of the cumulative histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_NAME = 'annotation_phase_seconds'
+DUMP_INTERVAL = 15.0  # Seconds between dumps of the same file
+
+_local = threading.local()
+_last_dump = {}  # path -> monotonic time of the last dump
+_dump_lock = threading.Lock()
+
+
+class RollingHistogram:
+    """Latency samples of one phase: a rolling window plus cumulative buckets."""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.bucket_counts = [0] * len(BUCKETS)  # Non-cumulative; summed on export
+        self.count = 0
+        self.sum = 0.0
+        self.last = None
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.last = seconds
+
+    def summary(self):
+        """Percentiles of the rolling window in milliseconds, plus totals."""
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def pct(q):
+            return round(ordered[min(n - 1, int(q * n))] * 1000, 2)
+
+        return {
+            'n': self.count,
+            'window': n,
+            'mean_ms': round(sum(ordered) / n * 1000, 2),
+            'p50_ms': pct(0.5),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+            'max_ms': round(ordered[-1] * 1000, 2),
+            'last_ms': round(self.last * 1000, 2),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe set of RollingHistograms keyed by phase name."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    def last_ms(self, phase):
+        """Latest duration of `phase` in milliseconds (None if never observed)."""
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            return None if histogram is None else round(histogram.last * 1000, 2)
+
+    def summaries(self):
+        """Return {phase: summary} sorted by phase name."""
+        with self._lock:
+            return {phase: self._histograms[phase].summary() for phase in sorted(self._histograms)}
+
+    def prometheus(self, labels=None):
+        """Render the registry in the Prometheus text exposition format."""
+        extra = ''.join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        lines = [f'# HELP {METRIC_NAME} Duration of annotation app phases.',
+                 f'# TYPE {METRIC_NAME} histogram']
+        with self._lock:
+            for phase in sorted(self._histograms):
+                histogram = self._histograms[phase]
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{phase="{phase}"{extra},le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{phase="{phase}"{extra},le="+Inf"}} {histogram.count}')
+                lines.append(f'{METRIC_NAME}_sum{{phase="{phase}"{extra}}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{phase="{phase}"{extra}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def jsonl(self, **fields):
+        """Return one JSON line with a timestamp, `fields` and every phase's summary."""
+        return json.dumps({'time': time.time(), **fields, 'phases': self.summaries()}) + '\n'
+
+
+process_metrics = MetricsRegistry()
+
+
+def bind_session(registry):
+    """Also record observations made on this thread into `registry` (None to stop)."""
+    _local.session = registry
+
+
+def observe(phase, seconds):
+    """Record one duration of `phase` in the process and bound session registries."""
+    process_metrics.observe(phase, seconds)
+    session = getattr(_local, 'session', None)
+    if session is not None:
+        session.observe(phase, seconds)
+
+
+@contextmanager
+def timed(phase):
+    """Time the enclosed block as one observation of `phase` (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(phase, time.perf_counter() - start)
+
+
+def dump_metrics(path, registry=process_metrics):
+    """
+    Write `registry` to `path`: Prometheus text for *.prom (replaced
+    atomically, so a scraper never reads a partial file), otherwise one
+    appended JSON line.
+    """
+    if str(path).endswith('.prom'):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(registry.prometheus({'pid': os.getpid()}))
+        os.replace(tmp_path, path)
+    else:
+        with open(path, 'a') as f:
+            f.write(registry.jsonl(pid=os.getpid()))
+
+
+def maybe_dump_metrics(path, interval=DUMP_INTERVAL):
+    """Call dump_metrics(path) unless it ran less than `interval` seconds ago."""
+    now = time.monotonic()
+    with _dump_lock:
+        if now - _last_dump.get(path, float('-inf')) < interval:
+            return False
+        _last_dump[path] = now
+    dump_metrics(path)
+    return True
@@ -0,0 +1,84 @@
+"""
+Background prefetch of upcoming images.
+
+While an annotator works on the current EVID, a process-wide thread pool
+builds the display levels (and optionally decodes them into the shared image
+cache) for the next few examples, so advancing to the next example does not
+wait on disk I/O or decoding. Each session owns a Prefetcher that cancels its
+queued work when the annotator moves somewhere else.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from image_cache import image_cache
+from image_pyramid import display_level, load_display_image
+
+DEFAULT_AHEAD = 3
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# Shared by every session so concurrent annotators cannot oversubscribe the CPU
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='prefetch')
+
+
+def warm_image(image_path, decode=False):
+    """Build the display level and dimensions of an image ahead of time."""
+    image_cache.size(image_path)
+    level = display_level(image_path)
+    if decode:
+        load_display_image(level)
+    return level
+
+
+def upcoming_image_paths(data, images_dir, current_idx, ahead, skip=None):
+    """
+    Return image paths of the next `ahead` examples after `current_idx`.
+
+    Examples for which `skip(position)` is true (e.g. already annotated) are
+    skipped, as are images that no longer exist on disk.
+    """
+    paths = []
+    idx = current_idx + 1
+    while len(paths) < ahead and idx < len(data):
+        if skip is not None and skip(idx):
+            idx += 1
+            continue
+        example = data[idx]
+        idx += 1
+        path = images_dir / example['image_path']
+        if path not in paths and path.exists():
+            paths.append(path)
+    return paths
+
+
+class Prefetcher:
+    """Per-session handle on the shared prefetch pool."""
+
+    def __init__(self, ahead=DEFAULT_AHEAD, decode=False):
+        self.ahead = ahead
+        self.decode = decode
+        self._pending = {}  # image path -> Future
+        self._lock = threading.Lock()
+
+    def schedule(self, paths):
+        """Warm `paths`, cancelling queued work for images no longer wanted."""
+        wanted = set(paths)
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if path not in wanted:
+                    future.cancel()  # No-op if the job is already running
+                    del self._pending[path]
+            for path in paths:
+                if path not in self._pending:
+                    self._pending[path] = _executor.submit(warm_image, path, self.decode)
+
+    def ready_levels(self):
+        """Return display levels that have finished building."""
+        with self._lock:
+            futures = list(self._pending.values())
+        return [f.result() for f in futures if f.done() and not f.cancelled() and f.exception() is None]
+
+    def cancel(self):
+        """Cancel all queued work for this session."""
+        self.schedule([])
@@ -0,0 +1,356 @@
+"""
+Proposal-quality report: how good were the proposer's boxes?
+
+Compares every annotation's `proposed_bbox` with the annotator's
+`final_bbox` and aggregates, overall and by dataset, grounding tier and
+proposer source:
+
+- decision mix and acceptance rate (proposal accepted unchanged)
+- IoU between proposal and final box
+- center shift (normalized image units) and scale error (log2 of the
+  final / proposed area ratio)
+- grounding errors: a box proposed where the annotator found no visible
+  grounding, and the reverse
+- calibration of the proposal `confidence` against acceptance rate
+  (per-bin rates and expected calibration error)
+- mean proposer inference time
+
+Records are streamed from any number of annotation files and processed in
+fixed-size batches with NumPy; every statistic is kept as counters or
+fixed-bin histograms, so memory does not grow with the number of records.
+Reports are written as JSON and two runs (e.g. proposer versions) can be
+compared side by side.
+
+Usage:
+    python proposal_quality.py annotations/ [--proposals bbox_proposals_qwen_v1.json] [--json quality.json]
+    python proposal_quality.py --compare quality_v1.json quality_v2.json
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+from annotation_io import annotation_files, iter_records
+from bbox_ops import KIND_BOX, KIND_NO_GROUNDING, box_area, iou, records_to_arrays
+from proposals_store import open_proposals
+
+DEFAULT_PROPOSALS = 'bbox_proposals_qwen_v1.json'
+BATCH_SIZE = 50_000
+CONFIDENCE_BINS = 10
+UNKNOWN = 'unknown'
+GROUPINGS = ('dataset', 'grounding_tier', 'source')
+
+
+class StreamingHistogram:
+    """Fixed-bin histogram with running sum; values outside [lo, hi] are clipped."""
+
+    def __init__(self, lo, hi, bins):
+        self.lo, self.hi, self.bins = lo, hi, bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.total = 0.0
+        self.n = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        idx = ((values - self.lo) / (self.hi - self.lo) * self.bins).astype(np.int64)
+        self.counts += np.bincount(np.clip(idx, 0, self.bins - 1), minlength=self.bins)
+        self.total += float(values.sum())
+        self.n += len(values)
+
+    def quantile(self, q):
+        """Approximate quantile (bin midpoint), or None if empty."""
+        if not self.n:
+            return None
+        idx = int(np.searchsorted(np.cumsum(self.counts), q * self.n))
+        return self.lo + (min(idx, self.bins - 1) + 0.5) * (self.hi - self.lo) / self.bins
+
+    def summary(self):
+        if not self.n:
+            return {'n': 0}
+        return {
+            'n': self.n,
+            'mean': self.total / self.n,
+            'p10': self.quantile(0.10),
+            'median': self.quantile(0.50),
+            'p90': self.quantile(0.90),
+        }
+
+
+class QualityStats:
+    """Aggregated proposal-vs-final statistics for one group of records."""
+
+    def __init__(self):
+        self.decisions = Counter()
+        self.iou = StreamingHistogram(0.0, 1.0, 1000)
+        self.center_shift = StreamingHistogram(0.0, 1.0, 1000)
+        self.scale_error = StreamingHistogram(-4.0, 4.0, 800)
+        self.box_to_no_grounding = 0
+        self.no_grounding_to_box = 0
+        self.conf_n = np.zeros(CONFIDENCE_BINS, dtype=np.int64)
+        self.conf_sum = np.zeros(CONFIDENCE_BINS)
+        self.conf_accepted = np.zeros(CONFIDENCE_BINS, dtype=np.int64)
+        self.inference_time = 0.0
+        self.inference_n = 0
+
+    def add(self, batch, mask):
+        """Add the rows of `batch` (see evaluate_batch) selected by `mask`."""
+        self.decisions.update(batch['decision'][mask].tolist())
+        both = mask & batch['both_box']
+        self.iou.add(batch['iou'][both])
+        self.center_shift.add(batch['center_shift'][both])
+        self.scale_error.add(batch['scale_error'][both])
+        self.box_to_no_grounding += int((mask & batch['box_to_no_grounding']).sum())
+        self.no_grounding_to_box += int((mask & batch['no_grounding_to_box']).sum())
+
+        conf = batch['confidence']
+        has_conf = mask & np.isfinite(conf)
+        bins = np.clip((conf[has_conf] * CONFIDENCE_BINS).astype(np.int64), 0, CONFIDENCE_BINS - 1)
+        self.conf_n += np.bincount(bins, minlength=CONFIDENCE_BINS)
+        self.conf_sum += np.bincount(bins, weights=conf[has_conf], minlength=CONFIDENCE_BINS)
+        self.conf_accepted += np.bincount(bins, weights=batch['accepted'][has_conf],
+                                          minlength=CONFIDENCE_BINS).astype(np.int64)
+
+        times = batch['inference_time'][mask]
+        times = times[np.isfinite(times)]
+        self.inference_time += float(times.sum())
+        self.inference_n += len(times)
+
+    def calibration(self):
+        """Per-bin mean confidence vs. acceptance rate, and the expected calibration error."""
+        bins, ece = [], 0.0
+        total = int(self.conf_n.sum())
+        for b in range(CONFIDENCE_BINS):
+            n = int(self.conf_n[b])
+            if not n:
+                continue
+            confidence = float(self.conf_sum[b] / n)
+            acceptance = float(self.conf_accepted[b] / n)
+            ece += abs(confidence - acceptance) * n / total
+            bins.append({
+                'range': [b / CONFIDENCE_BINS, (b + 1) / CONFIDENCE_BINS],
+                'n': n,
+                'mean_confidence': confidence,
+                'acceptance_rate': acceptance,
+            })
+        return {'bins': bins, 'ece': ece if total else None}
+
+    def summary(self):
+        n = sum(self.decisions.values())
+        return {
+            'n': n,
+            'decisions': dict(self.decisions),
+            'acceptance_rate': self.decisions['accept'] / n if n else None,
+            'iou': self.iou.summary(),
+            'center_shift': self.center_shift.summary(),
+            'scale_error_log2': self.scale_error.summary(),
+            'box_to_no_grounding': self.box_to_no_grounding,
+            'no_grounding_to_box': self.no_grounding_to_box,
+            'calibration': self.calibration(),
+            'mean_inference_time': self.inference_time / self.inference_n if self.inference_n else None,
+        }
+
+
+def load_proposal_meta(proposals_path):
+    """
+    Return {(example_id, evid_index): (dataset, source, confidence, inference_time)}
+    for every EVID of a proposals file.
+
+    EVIDs are keyed by their position in `evid_proposals`, which is what the
+    app saves as a record's evid_index; the proposal's own `evid_index` field
+    does not always follow list order.
+    """
+    meta = {}
+    for _, ex in open_proposals(proposals_path).iter_examples():
+        dataset = ex.get('dataset', UNKNOWN)
+        source = ex.get('source', UNKNOWN)
+        for evid_index, evid in enumerate(ex.get('evid_proposals', [])):
+            meta[ex['id'], evid_index] = (
+                dataset, source, evid.get('confidence'), evid.get('inference_time'))
+    return meta
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def evaluate_batch(records, meta):
+    """
+    Compute per-record comparison values for a batch of annotation records.
+
+    Returns:
+        dict of arrays (one row per record) plus group labels
+    """
+    info = [meta.get((r['example_id'], r['evid_index']), (UNKNOWN, UNKNOWN, None, None)) for r in records]
+    proposed_kind, proposed = records_to_arrays([r.get('proposed_bbox') for r in records])
+    final_kind, final = records_to_arrays([r.get('final_bbox') for r in records])
+    decision = np.array([r.get('decision') or UNKNOWN for r in records])
+
+    both_box = (proposed_kind == KIND_BOX) & (final_kind == KIND_BOX)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centers = (final[:, :2] + final[:, 2:]) / 2 - (proposed[:, :2] + proposed[:, 2:]) / 2
+        scale = np.log2(box_area(final) / box_area(proposed))
+
+    return {
+        'decision': decision,
+        'accepted': (decision == 'accept').astype(np.float64),
+        'both_box': both_box,
+        'iou': np.where(both_box, iou(np.nan_to_num(proposed), np.nan_to_num(final)), np.nan),
+        'center_shift': np.hypot(centers[:, 0], centers[:, 1]),
+        'scale_error': np.where(np.isfinite(scale), scale, np.nan),
+        'box_to_no_grounding': (proposed_kind == KIND_BOX) & (final_kind == KIND_NO_GROUNDING),
+        'no_grounding_to_box': (proposed_kind == KIND_NO_GROUNDING) & (final_kind == KIND_BOX),
+        'confidence': _floats([i[2] for i in info]),
+        'inference_time': _floats([i[3] for i in info]),
+        'labels': {
+            'dataset': np.array([i[0] for i in info]),
+            'source': np.array([i[1] for i in info]),
+            'grounding_tier': np.array([r.get('grounding_tier') or UNKNOWN for r in records]),
+        },
+    }
+
+
+class QualityReport:
+    """Streaming accumulator for the overall and grouped statistics."""
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.overall = QualityStats()
+        self.groups = {grouping: {} for grouping in GROUPINGS}
+
+    def add_batch(self, records):
+        if not records:
+            return
+        batch = evaluate_batch(records, self.meta)
+        self.overall.add(batch, np.ones(len(records), dtype=bool))
+        for grouping in GROUPINGS:
+            labels = batch['labels'][grouping]
+            values, inverse = np.unique(labels, return_inverse=True)
+            for code, value in enumerate(values):
+                stats = self.groups[grouping].setdefault(str(value), QualityStats())
+                stats.add(batch, inverse == code)
+
+    def summary(self):
+        return {
+            'overall': self.overall.summary(),
+            **{grouping: {name: stats.summary() for name, stats in sorted(groups.items())}
+               for grouping, groups in self.groups.items()},
+        }
+
+
+def evaluate(paths, meta, batch_size=BATCH_SIZE):
+    """Stream all annotation records under `paths` and return the report dict."""
+    report = QualityReport(meta)
+    batch, files = [], annotation_files(paths)
+    for path in files:
+        for record in iter_records(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                report.add_batch(batch)
+                batch = []
+    report.add_batch(batch)
+    summary = report.summary()
+    summary['files'] = [str(p) for p in files]
+    return summary
+
+
+def _fmt(value, spec='.3f'):
+    return '—' if value is None else format(value, spec)
+
+
+def _format_row(name, stats):
+    return (f"  {name:<24} n={stats['n']:<7} accept={_fmt(stats['acceptance_rate'], '.1%'):>6}  "
+            f"IoU mean={_fmt(stats['iou'].get('mean'))} median={_fmt(stats['iou'].get('median'))}  "
+            f"shift={_fmt(stats['center_shift'].get('median'))}  "
+            f"scale={_fmt(stats['scale_error_log2'].get('median'), '+.2f')}  "
+            f"ECE={_fmt(stats['calibration']['ece'])}")
+
+
+def print_report(report):
+    overall = report['overall']
+    print(f"Records: {overall['n']} from {len(report['files'])} file(s)")
+    if not overall['n']:
+        return
+    print(f"Decisions: {', '.join(f'{k}={v}' for k, v in sorted(overall['decisions'].items()))}")
+    print(f"Grounding errors: box→no grounding={overall['box_to_no_grounding']}, "
+          f"no grounding→box={overall['no_grounding_to_box']}")
+    if overall['mean_inference_time'] is not None:
+        print(f"Mean inference time: {overall['mean_inference_time']:.2f}s")
+
+    print("\nOverall:")
+    print(_format_row('all', overall))
+    print("\nConfidence calibration (mean confidence → acceptance rate):")
+    for b in overall['calibration']['bins']:
+        print(f"  [{b['range'][0]:.1f}, {b['range'][1]:.1f})  n={b['n']:<7} "
+              f"{b['mean_confidence']:.2f} → {b['acceptance_rate']:.1%}")
+    for grouping in GROUPINGS:
+        print(f"\nBy {grouping.replace('_', ' ')}:")
+        for name, stats in report[grouping].items():
+            print(_format_row(name, stats))
+
+
+def compare_reports(old_path, new_path):
+    """Print key metrics of two reports side by side with their deltas."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    metrics = [
+        ('acceptance rate', lambda s: s['acceptance_rate']),
+        ('mean IoU', lambda s: s['iou'].get('mean')),
+        ('median IoU', lambda s: s['iou'].get('median')),
+        ('median center shift', lambda s: s['center_shift'].get('median')),
+        ('median scale error', lambda s: s['scale_error_log2'].get('median')),
+        ('ECE', lambda s: s['calibration']['ece']),
+        ('mean inference time', lambda s: s['mean_inference_time']),
+    ]
+    print(f"{'':<28} {'old':>9} {'new':>9} {'delta':>9}")
+    sections = [('overall', old['overall'], new['overall'])]
+    for grouping in GROUPINGS:
+        for name in sorted(set(old.get(grouping, {})) & set(new.get(grouping, {}))):
+            sections.append((f"{grouping}={name}", old[grouping][name], new[grouping][name]))
+
+    for title, a, b in sections:
+        print(f"{title} (n {a['n']} → {b['n']})")
+        for label, get in metrics:
+            va, vb = get(a), get(b)
+            delta = '—' if va is None or vb is None else f"{vb - va:+.3f}"
+            print(f"  {label:<26} {_fmt(va):>9} {_fmt(vb):>9} {delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score proposed bboxes against annotators' final boxes")
+    parser.add_argument('paths', nargs='*', default=['annotations/'],
+                        help="Annotation files or directories (default: annotations/)")
+    parser.add_argument('--proposals', default=DEFAULT_PROPOSALS,
+                        help="Proposals file providing confidence, inference time, dataset and source")
+    parser.add_argument('--json', help="Also write the report to this JSON file")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="Compare two previously written JSON reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    start = time.time()
+    meta = load_proposal_meta(args.proposals) if os.path.exists(args.proposals) else {}
+    report = evaluate(args.paths, meta)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+    print(f"\nDone in {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Proposals backends with random access, filtering and O(1) EVID counts.
+
+The app reads proposals through a small list-like interface (`len`, indexing
+by position, lookup by `id`, filtered iteration, total EVID count) so that
+the original JSON file and an indexed SQLite build are interchangeable.
+
+JsonProposals keeps the parsed list in memory, which is fine for pilot-sized
+files. SqliteProposals is built once from the same JSON schema (or JSONL,
+one example per line) and loads examples lazily, so startup cost and memory
+stay flat for hundreds of thousands of examples.
+
+Usage:
+    python proposals_store.py bbox_proposals_qwen_v1.json [-o bbox_proposals_qwen_v1.sqlite]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+SQLITE_SUFFIXES = {'.sqlite', '.sqlite3', '.db'}
+BUILD_BATCH_SIZE = 5000
+ROW_CACHE_SIZE = 64
+
+
+class JsonProposals:
+    """In-memory proposals parsed from a JSON list."""
+
+    def __init__(self, examples):
+        self._examples = examples
+        self._positions = {ex['id']: pos for pos, ex in enumerate(examples)}
+        self._offsets = [0] + list(itertools.accumulate(len(ex['evid_proposals']) for ex in examples))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self._examples)
+
+    def __getitem__(self, pos):
+        return self._examples[pos]
+
+    def get(self, example_id):
+        """Return the example with `example_id`, or None."""
+        pos = self._positions.get(example_id)
+        return None if pos is None else self._examples[pos]
+
+    def position(self, example_id):
+        """Return the position of `example_id`, or None."""
+        return self._positions.get(example_id)
+
+    def iter_examples(self, dataset=None, proxy_complexity=None):
+        """Yield (position, example), optionally filtered by dataset/complexity."""
+        for pos, ex in enumerate(self._examples):
+            if dataset is not None and ex.get('dataset') != dataset:
+                continue
+            if proxy_complexity is not None and ex.get('proxy_complexity') != proxy_complexity:
+                continue
+            yield pos, ex
+
+    def total_evids(self):
+        """Return the total number of EVIDs across all examples."""
+        return self._offsets[-1]
+
+    def evid_offsets(self):
+        """Return prefix sums of EVID counts (length len(self) + 1)."""
+        return self._offsets
+
+
+class SqliteProposals:
+    """Proposals stored in an indexed SQLite file and decoded on demand."""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._rows = OrderedDict()  # position -> example (small LRU)
+        self._rows_lock = threading.Lock()
+        meta = dict(self._conn().execute('SELECT key, value FROM meta'))
+        self._len = int(meta['count'])
+        self._total_evids = int(meta['total_evids'])
+        self._offsets = None
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, and Streamlit
+        # runs each session's script on its own thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += self._len
+        if not 0 <= pos < self._len:
+            raise IndexError(pos)
+        with self._rows_lock:
+            example = self._rows.get(pos)
+            if example is not None:
+                self._rows.move_to_end(pos)
+                return example
+        row = self._conn().execute('SELECT body FROM examples WHERE pos = ?', (pos,)).fetchone()
+        example = json.loads(row[0])
+        with self._rows_lock:
+            self._rows[pos] = example
+            if len(self._rows) > ROW_CACHE_SIZE:
+                self._rows.popitem(last=False)
+        return example
+
+    def get(self, example_id):
+        """Return the example with `example_id`, or None."""
+        pos = self.position(example_id)
+        return None if pos is None else self[pos]
+
+    def position(self, example_id):
+        """Return the position of `example_id`, or None."""
+        row = self._conn().execute('SELECT pos FROM examples WHERE id = ?', (example_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def iter_examples(self, dataset=None, proxy_complexity=None):
+        """Yield (position, example), optionally filtered by dataset/complexity."""
+        clauses, params = [], []
+        if dataset is not None:
+            clauses.append('dataset = ?')
+            params.append(dataset)
+        if proxy_complexity is not None:
+            clauses.append('proxy_complexity = ?')
+            params.append(proxy_complexity)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # Dedicated connection so callers can interleave other lookups
+        uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True)
+        try:
+            for pos, body in conn.execute(f'SELECT pos, body FROM examples {where} ORDER BY pos', params):
+                yield pos, json.loads(body)
+        finally:
+            conn.close()
+
+    def total_evids(self):
+        """Return the total number of EVIDs across all examples."""
+        return self._total_evids
+
+    def evid_offsets(self):
+        """Return prefix sums of EVID counts (length len(self) + 1)."""
+        if self._offsets is None:
+            rows = self._conn().execute('SELECT evid_offset FROM examples ORDER BY pos')
+            self._offsets = [offset for (offset,) in rows] + [self._total_evids]
+        return self._offsets
+
+
+def iter_source_examples(source_path):
+    """Yield examples from a proposals JSON list or JSONL file."""
+    with open(source_path, 'r') as f:
+        if Path(source_path).suffix.lower() == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def _insert_examples(conn, batch, source_path):
+    """Insert a batch of example rows, naming the example id if one is a duplicate."""
+    try:
+        conn.executemany('INSERT INTO examples VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+    except sqlite3.IntegrityError:
+        # executemany stops at the failing row; the rows before it are inserted
+        inserted = conn.execute('SELECT COUNT(*) FROM examples WHERE pos >= ?', (batch[0][0],)).fetchone()[0]
+        pos, example_id = batch[inserted][:2]
+        raise ValueError(f"{source_path}: duplicate example id {example_id!r} at position {pos} "
+                         f"(validate_dataset.py lists every duplicate_example)") from None
+
+
+def build_sqlite(source_path, db_path=None):
+    """
+    Build an indexed SQLite proposals store from a JSON or JSONL file.
+
+    Args:
+        source_path: Proposals file in the bbox_proposals_qwen_v1.json schema
+        db_path: Output path (defaults to the source path with a .sqlite suffix)
+
+    Returns:
+        Path: Location of the built store
+
+    Raises:
+        ValueError: If an example id appears more than once
+    """
+    db_path = Path(db_path or Path(source_path).with_suffix('.sqlite'))
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript("""
+        CREATE TABLE examples (
+            pos INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            dataset TEXT,
+            proxy_complexity TEXT,
+            image_path TEXT,
+            n_evids INTEGER NOT NULL,
+            evid_offset INTEGER NOT NULL,
+            body TEXT NOT NULL
+        );
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+
+    count = 0
+    total_evids = 0
+    batch = []
+    try:
+        for pos, ex in enumerate(iter_source_examples(source_path)):
+            n_evids = len(ex['evid_proposals'])
+            batch.append((pos, ex['id'], ex.get('dataset'), ex.get('proxy_complexity'), ex.get('image_path'),
+                          n_evids, total_evids, json.dumps(ex, separators=(',', ':'))))
+            total_evids += n_evids
+            count += 1
+            if len(batch) >= BUILD_BATCH_SIZE:
+                _insert_examples(conn, batch, source_path)
+                batch = []
+        if batch:
+            _insert_examples(conn, batch, source_path)
+    except BaseException:
+        conn.close()
+        tmp_path.unlink()
+        raise
+
+    # Indexes are cheaper to build once after the bulk insert
+    conn.executescript("""
+        CREATE INDEX idx_examples_dataset ON examples (dataset, proxy_complexity);
+        CREATE INDEX idx_examples_complexity ON examples (proxy_complexity);
+    """)
+    conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+        ('count', str(count)),
+        ('total_evids', str(total_evids)),
+        ('source', os.path.abspath(source_path)),
+        ('built_at', time.strftime('%Y-%m-%dT%H:%M:%S')),
+    ])
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return db_path
+
+
+def open_proposals(path):
+    """Open a proposals file, choosing the backend from its suffix."""
+    suffix = Path(path).suffix.lower()
+    if suffix in SQLITE_SUFFIXES:
+        return SqliteProposals(path)
+    if suffix == '.jsonl':
+        return JsonProposals(list(iter_source_examples(path)))
+    return JsonProposals.from_file(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an indexed SQLite proposals store")
+    parser.add_argument('source', help="Proposals JSON (or JSONL) file")
+    parser.add_argument('-o', '--output', help="Output .sqlite path (default: next to the source)")
+    args = parser.parse_args()
+
+    start = time.time()
+    try:
+        db_path = build_sqlite(args.source, args.output)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    store = SqliteProposals(db_path)
+    print(f"✅ Built {db_path} in {time.time() - start:.1f}s "
+          f"({len(store)} examples, {store.total_evids()} EVIDs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Asynchronous, coalescing save queue for remote (GitHub) annotation saves.
+
+Saving to GitHub costs several HTTP round trips, which used to run on the UI
+thread after every decision. Instead, each annotator gets one background
+worker per server process. Decisions only tell the worker which annotation
+store changed; the worker waits until either `batch_size` decisions are
+pending or the oldest one has waited `max_delay` seconds, then writes all
+changes in a single commit.
+
+Failed flushes are retried with exponential backoff (max_delay doubled per
+consecutive failure, capped at MAX_RETRY_DELAY). After FAILURES_BEFORE_ERROR
+consecutive failures the queue reports itself as failing so the app can
+show it; retries continue at the capped delay, and the unsaved changes stay
+dirty in the annotation store meanwhile.
+"""
+
+import atexit
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_MAX_DELAY = 5.0  # Seconds a decision may wait before being flushed
+DEFAULT_BATCH_SIZE = 10  # Pending decisions that trigger an immediate flush
+SHUTDOWN_TIMEOUT = 30.0
+MAX_RETRY_DELAY = 300.0  # Cap (seconds) of the backoff between failed flushes
+FAILURES_BEFORE_ERROR = 3  # Consecutive failed flushes before the queue reports failing
+
+_queues = {}  # annotator_id -> SaveQueue
+_queues_lock = threading.Lock()
+
+
+class SaveQueue:
+    """Background worker that coalesces saves for one annotator."""
+
+    def __init__(self, flush_fn, max_delay=DEFAULT_MAX_DELAY, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            flush_fn: Callable taking a submitted annotation store and
+                returning (success: bool, message: str); runs on the
+                worker thread
+            max_delay: Maximum seconds between a decision and its flush
+            batch_size: Number of pending decisions that forces a flush
+        """
+        self.flush_fn = flush_fn
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+
+        self.last_flush_time = None
+        self.last_success = None
+        self.last_message = None
+        self.flush_count = 0
+        self.consecutive_failures = 0
+
+        self._cond = threading.Condition()
+        self._stores = {}  # id(store) -> store with unsaved changes
+        self._pending = 0  # Decisions not yet flushed
+        self._oldest = None  # monotonic time of the oldest pending decision
+        self._flushing = False
+        self._force = False
+        self._retry_at = None  # monotonic time before which a failed flush is not retried
+        self._thread = threading.Thread(target=self._run, name='save-queue', daemon=True)
+        self._thread.start()
+
+    def configure(self, max_delay, batch_size):
+        """Apply new flush settings; pending decisions are kept."""
+        with self._cond:
+            self.max_delay = max_delay
+            self.batch_size = batch_size
+            self._cond.notify()
+
+    def submit(self, store):
+        """Queue a save of `store`'s changes; returns immediately."""
+        with self._cond:
+            self._stores[id(store)] = store
+            self._pending += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._cond.notify()
+
+    def flush(self, timeout=None):
+        """Flush pending decisions now and wait for the write to finish."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._force = True
+            self._cond.notify()
+            while self._pending or self._flushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def status(self):
+        """Return queue depth and the outcome of the last flush."""
+        with self._cond:
+            return {
+                'depth': self._pending,
+                'flushing': self._flushing,
+                'last_flush_time': self.last_flush_time,
+                'last_success': self.last_success,
+                'last_message': self.last_message,
+                'flush_count': self.flush_count,
+                'consecutive_failures': self.consecutive_failures,
+                'failing': self.consecutive_failures >= FAILURES_BEFORE_ERROR,
+                'next_retry_in': (None if self._retry_at is None
+                                  else max(0.0, self._retry_at - time.monotonic())),
+            }
+
+    def _ready(self):
+        if not self._pending:
+            return False
+        if self._force:
+            return True
+        if self._retry_at is not None:
+            return time.monotonic() >= self._retry_at
+        if self._pending >= self.batch_size:
+            return True
+        return time.monotonic() - self._oldest >= self.max_delay
+
+    def _wait_timeout(self):
+        """Seconds until the pending decisions become due (None: wait for a submit)."""
+        if not self._pending:
+            return None
+        due = self._retry_at if self._retry_at is not None else self._oldest + self.max_delay
+        return max(0.0, due - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    self._cond.wait(self._wait_timeout())
+                stores, count = list(self._stores.values()), self._pending
+                self._stores, self._pending, self._oldest = {}, 0, None
+                self._force = False
+                self._flushing = True
+
+            failed = []
+            for store in stores:
+                try:
+                    success, message = self.flush_fn(store)
+                except Exception as e:
+                    success, message = False, f"❌ Error saving: {str(e)}"
+                if not success:
+                    failed.append(store)
+
+            with self._cond:
+                self._flushing = False
+                self.last_flush_time = datetime.now()
+                self.last_success = not failed
+                self.last_message = message
+                if failed:
+                    # Unsaved changes stay dirty in the store; retry after a backoff
+                    for store in failed:
+                        self._stores[id(store)] = store
+                    self._pending += count
+                    self._oldest = time.monotonic()
+                    self.consecutive_failures += 1
+                    backoff = min(MAX_RETRY_DELAY, self.max_delay * 2 ** (self.consecutive_failures - 1))
+                    self._retry_at = time.monotonic() + backoff
+                else:
+                    self.flush_count += 1
+                    self.consecutive_failures = 0
+                    self._retry_at = None
+                self._cond.notify_all()
+
+
+def get_save_queue(annotator_id, flush_fn, max_delay=DEFAULT_MAX_DELAY, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Return the process-wide save queue for `annotator_id`, creating it on
+    first use. Changed `max_delay` / `batch_size` settings are applied to an
+    existing queue.
+    """
+    with _queues_lock:
+        queue = _queues.get(annotator_id)
+        if queue is None:
+            queue = SaveQueue(flush_fn, max_delay=max_delay, batch_size=batch_size)
+            _queues[annotator_id] = queue
+        elif (queue.max_delay, queue.batch_size) != (max_delay, batch_size):
+            queue.configure(max_delay, batch_size)
+        return queue
+
+
+@atexit.register
+def _flush_all_on_exit():
+    # One deadline for all queues, so failing saves cannot stall shutdown per annotator
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    with _queues_lock:
+        queues = list(_queues.values())
+    for queue in queues:
+        queue.flush(timeout=max(0.0, deadline - time.monotonic()))
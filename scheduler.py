@@ -0,0 +1,367 @@
+"""
+Shared work scheduler: hands out EVIDs to annotators with time-limited leases.
+
+Without it every annotator walks the same proposals list from the start.
+The scheduler keeps one row per (example_id, evid_index) unit in a local
+SQLite file shared by every session (and server process) on the machine:
+
+- A deterministic `overlap` fraction of examples (chosen by a hash of the
+  example id, so every stratum gets its share) must be annotated by
+  `overlap_annotators` different annotators, for inter-annotator agreement;
+  all other units need one annotator.
+- An annotator leases all open units of one example at a time (same image).
+  A lease expires after `lease_seconds` unless renewed; expired leases are
+  reclaimed at the next acquisition and the units handed to someone else.
+- The next example is taken from the dataset/proxy_complexity stratum in
+  which the annotator has the smallest share of work so far, so everyone
+  gets a balanced mix.
+
+Each unit stores its number of open slots (required annotators minus active
+leases and completions), and a partial index over units with open slots
+makes finding the next example an index lookup. The database runs in WAL
+mode with one connection per thread, so readers never block, and every
+write is a single short IMMEDIATE transaction.
+
+Usage:
+    python scheduler.py init bbox_proposals_qwen_v1.json [--db scheduler.sqlite] [--overlap 0.1]
+        [--overlap-annotators 2]
+    python scheduler.py status [--db scheduler.sqlite]
+"""
+
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB = 'scheduler.sqlite'
+DEFAULT_LEASE_SECONDS = 30 * 60
+DEFAULT_OVERLAP = 0.1  # Fraction of examples annotated by several annotators
+DEFAULT_OVERLAP_ANNOTATORS = 2
+BUSY_TIMEOUT_MS = 10_000
+INSERT_BATCH_SIZE = 10_000
+
+LEASED, DONE, RELEASED, EXPIRED = 'leased', 'done', 'released', 'expired'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    pos INTEGER PRIMARY KEY,  -- Global EVID position in the proposals
+    example_id TEXT NOT NULL,
+    evid_index INTEGER NOT NULL,
+    example_pos INTEGER NOT NULL,
+    stratum TEXT NOT NULL,
+    required INTEGER NOT NULL,
+    open INTEGER NOT NULL  -- required minus active leases and completions
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_units_key ON units (example_id, evid_index);
+CREATE INDEX IF NOT EXISTS idx_units_example ON units (example_pos);
+CREATE INDEX IF NOT EXISTS idx_units_open ON units (stratum, pos) WHERE open > 0;
+CREATE TABLE IF NOT EXISTS assignments (
+    annotator_id TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    expires REAL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (annotator_id, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_assignments_leases ON assignments (expires) WHERE state = 'leased';
+CREATE TABLE IF NOT EXISTS strata (stratum TEXT PRIMARY KEY, total INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS annotator_strata (
+    annotator_id TEXT NOT NULL,
+    stratum TEXT NOT NULL,
+    assigned INTEGER NOT NULL,
+    PRIMARY KEY (annotator_id, stratum)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def in_overlap(example_id, fraction):
+    """Return True if `example_id` belongs to the overlap subset (stable across runs)."""
+    digest = hashlib.sha1(str(example_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') / 2 ** 32 < fraction
+
+
+def stratum_of(example):
+    return f"{example.get('dataset', 'unknown')}/{example.get('proxy_complexity', 'unknown')}"
+
+
+class Scheduler:
+    """Lease-based assignment of EVIDs to annotators over a shared SQLite file."""
+
+    def __init__(self, db_path=DEFAULT_DB, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._renewed = {}  # annotator_id -> monotonic time of the last renewal
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, and Streamlit
+        # runs each session's script on its own thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """Run `fn(conn)` in one IMMEDIATE transaction and return its result."""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def is_initialized(self):
+        return self._conn().execute("SELECT 1 FROM meta WHERE key = 'units'").fetchone() is not None
+
+    def initialize(self, proposals, overlap=DEFAULT_OVERLAP, overlap_annotators=DEFAULT_OVERLAP_ANNOTATORS):
+        """
+        Create one unit per EVID of `proposals` (once; later calls are no-ops).
+
+        Args:
+            proposals: Object from proposals_store (iter_examples)
+            overlap: Fraction of examples that need `overlap_annotators`
+            overlap_annotators: Annotators per overlap unit
+
+        Returns:
+            bool: True if the units were created by this call
+        """
+        def create(conn):
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'units'").fetchone():
+                return False
+            totals = {}
+            batch = []
+            pos = 0
+            for example_pos, example in proposals.iter_examples():
+                stratum = stratum_of(example)
+                required = overlap_annotators if in_overlap(example['id'], overlap) else 1
+                for evid_index in range(len(example['evid_proposals'])):
+                    batch.append((pos, example['id'], evid_index, example_pos, stratum, required, required))
+                    pos += 1
+                totals[stratum] = totals.get(stratum, 0) + len(example['evid_proposals'])
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    conn.executemany('INSERT INTO units VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+                    batch = []
+            conn.executemany('INSERT INTO units VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+            conn.executemany('INSERT INTO strata VALUES (?, ?)', totals.items())
+            conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('units', str(pos)),
+                ('overlap', str(overlap)),
+                ('overlap_annotators', str(overlap_annotators)),
+                ('created_at', time.strftime('%Y-%m-%dT%H:%M:%S')),
+            ])
+            return True
+
+        return self._write(create)
+
+    def _reclaim(self, conn, now):
+        """Expire overdue leases and reopen their units."""
+        expired = conn.execute(
+            "SELECT annotator_id, pos FROM assignments WHERE state = 'leased' AND expires < ?", (now,)
+        ).fetchall()
+        if expired:
+            conn.executemany("UPDATE assignments SET state = 'expired', updated = ? "
+                             "WHERE annotator_id = ? AND pos = ?", [(now, a, p) for a, p in expired])
+            conn.executemany('UPDATE units SET open = open + 1 WHERE pos = ?', [(p,) for _, p in expired])
+        return len(expired)
+
+    def reclaim(self):
+        """Reclaim expired leases now; returns how many were reclaimed."""
+        return self._write(lambda conn: self._reclaim(conn, time.time()))
+
+    def _acquire(self, conn, annotator_id, now):
+        """Lease the open units of the next example for `annotator_id`."""
+        self._reclaim(conn, now)
+        strata = conn.execute("""
+            SELECT s.stratum FROM strata s
+            LEFT JOIN annotator_strata a ON a.stratum = s.stratum AND a.annotator_id = ?
+            ORDER BY COALESCE(a.assigned, 0) * 1.0 / s.total, s.stratum
+        """, (annotator_id,)).fetchall()
+
+        # Units this annotator already holds, finished or handed back are not offered again
+        for (stratum,) in strata:
+            row = conn.execute("""
+                SELECT u.example_pos FROM units u
+                WHERE u.stratum = ? AND u.open > 0 AND NOT EXISTS (
+                    SELECT 1 FROM assignments a
+                    WHERE a.annotator_id = ? AND a.pos = u.pos AND a.state != 'expired')
+                ORDER BY u.pos LIMIT 1
+            """, (stratum, annotator_id)).fetchone()
+            if row is not None:
+                break
+        else:
+            return []
+
+        units = conn.execute("""
+            SELECT u.pos, u.example_id, u.evid_index, u.stratum FROM units u
+            WHERE u.example_pos = ? AND u.open > 0 AND NOT EXISTS (
+                SELECT 1 FROM assignments a
+                WHERE a.annotator_id = ? AND a.pos = u.pos AND a.state != 'expired')
+            ORDER BY u.pos
+        """, (row[0], annotator_id)).fetchall()
+        expires = now + self.lease_seconds
+        conn.executemany("INSERT OR REPLACE INTO assignments VALUES (?, ?, 'leased', ?, ?)",
+                         [(annotator_id, pos, expires, now) for pos, *_ in units])
+        conn.executemany('UPDATE units SET open = open - 1 WHERE pos = ?', [(pos,) for pos, *_ in units])
+        conn.execute("""
+            INSERT INTO annotator_strata VALUES (?, ?, ?)
+            ON CONFLICT (annotator_id, stratum) DO UPDATE SET assigned = assigned + excluded.assigned
+        """, (annotator_id, units[0][3], len(units)))
+        return [(example_id, evid_index) for _, example_id, evid_index, _ in units]
+
+    def next_unit(self, annotator_id):
+        """
+        Return the (example_id, evid_index) `annotator_id` should work on next.
+
+        That is the first unit still leased to them (so a reload resumes where
+        they were), or the first unit of a newly leased example. None once no
+        unit is left for this annotator.
+        """
+        def pick(conn):
+            now = time.time()
+            row = conn.execute("""
+                SELECT u.example_id, u.evid_index FROM assignments a JOIN units u ON u.pos = a.pos
+                WHERE a.annotator_id = ? AND a.state = 'leased' AND a.expires >= ?
+                ORDER BY a.pos LIMIT 1
+            """, (annotator_id, now)).fetchone()
+            if row is not None:
+                return tuple(row)
+            units = self._acquire(conn, annotator_id, now)
+            return units[0] if units else None
+
+        unit = self._write(pick)
+        self._renewed[annotator_id] = time.monotonic()
+        return unit
+
+    def _finish(self, annotator_id, example_id, evid_index, state):
+        def update(conn):
+            now = time.time()
+            row = conn.execute('SELECT pos FROM units WHERE example_id = ? AND evid_index = ?',
+                               (example_id, evid_index)).fetchone()
+            if row is None:
+                return False
+            pos = row[0]
+            current = conn.execute('SELECT state FROM assignments WHERE annotator_id = ? AND pos = ?',
+                                   (annotator_id, pos)).fetchone()
+            current = current[0] if current else None
+            if current == state or current == DONE:
+                return False
+            conn.execute('INSERT OR REPLACE INTO assignments VALUES (?, ?, ?, NULL, ?)',
+                         (annotator_id, pos, state, now))
+            # A live lease already holds a slot; otherwise a completion takes
+            # one and a release has nothing to give back
+            if current == LEASED and state == RELEASED:
+                conn.execute('UPDATE units SET open = open + 1 WHERE pos = ?', (pos,))
+            elif current != LEASED and state == DONE:
+                conn.execute('UPDATE units SET open = open - 1 WHERE pos = ?', (pos,))
+            return True
+
+        return self._write(update)
+
+    def complete(self, annotator_id, example_id, evid_index):
+        """Record that `annotator_id` annotated the unit (leased or not)."""
+        return self._finish(annotator_id, example_id, evid_index, DONE)
+
+    def release(self, annotator_id, example_id, evid_index):
+        """Hand a leased unit back (e.g. skipped); it is not offered to this annotator again."""
+        return self._finish(annotator_id, example_id, evid_index, RELEASED)
+
+    def renew(self, annotator_id, force=False):
+        """
+        Extend `annotator_id`'s active leases by `lease_seconds`.
+
+        Cheap to call on every rerun: unless `force`, it writes only once a
+        quarter of the lease time has passed since the last renewal.
+        """
+        last = self._renewed.get(annotator_id)
+        if not force and last is not None and time.monotonic() - last < self.lease_seconds / 4:
+            return 0
+        self._renewed[annotator_id] = time.monotonic()
+
+        def extend(conn):
+            now = time.time()
+            return conn.execute("""
+                UPDATE assignments SET expires = ?, updated = ?
+                WHERE annotator_id = ? AND state = 'leased' AND expires >= ?
+            """, (now + self.lease_seconds, now, annotator_id, now)).rowcount
+
+        return self._write(extend)
+
+    def stats(self):
+        """Return unit, slot, lease and per-annotator completion counts."""
+        conn = self._conn()
+        now = time.time()
+        units, overlap_units, slots, open_slots = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(required > 1), 0), COALESCE(SUM(required), 0), '
+            'COALESCE(SUM(MAX(open, 0)), 0) FROM units'
+        ).fetchone()
+        states = dict(conn.execute(
+            "SELECT CASE WHEN state = 'leased' AND expires < ? THEN 'expired' ELSE state END AS s, COUNT(*) "
+            "FROM assignments GROUP BY s", (now,)
+        ).fetchall())
+        done_by = dict(conn.execute(
+            "SELECT annotator_id, COUNT(*) FROM assignments WHERE state = 'done' GROUP BY annotator_id"
+        ).fetchall())
+        return {
+            'units': units,
+            'overlap_units': overlap_units,
+            'slots': slots,
+            'open_slots': open_slots,
+            'leased': states.get(LEASED, 0),
+            'expired': states.get(EXPIRED, 0),
+            'released': states.get(RELEASED, 0),
+            'done': states.get(DONE, 0),
+            'done_by_annotator': done_by,
+        }
+
+
+def print_status(scheduler):
+    stats = scheduler.stats()
+    print(f"Units: {stats['units']} ({stats['overlap_units']} in the overlap subset), "
+          f"{stats['slots']} annotator slots")
+    print(f"Done: {stats['done']}  Leased: {stats['leased']}  Expired (unreclaimed): {stats['expired']}  "
+          f"Released: {stats['released']}  Open slots: {stats['open_slots']}")
+    for annotator_id, done in sorted(stats['done_by_annotator'].items()):
+        print(f"  {annotator_id:<24} {done:>8} done")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared lease-based work scheduler for annotators")
+    sub = parser.add_subparsers(dest='command', required=True)
+    init = sub.add_parser('init', help="Create the units for a proposals file")
+    init.add_argument('proposals', help="Proposals JSON/JSONL or .sqlite store")
+    init.add_argument('--overlap', type=float, default=DEFAULT_OVERLAP,
+                      help=f"Fraction of examples annotated by several annotators (default: {DEFAULT_OVERLAP})")
+    init.add_argument('--overlap-annotators', type=int, default=DEFAULT_OVERLAP_ANNOTATORS,
+                      help=f"Annotators per overlap example (default: {DEFAULT_OVERLAP_ANNOTATORS})")
+    status = sub.add_parser('status', help="Show progress and leases")
+    reclaim = sub.add_parser('reclaim', help="Reclaim expired leases now")
+    for command in (init, status, reclaim):
+        command.add_argument('--db', default=DEFAULT_DB, help=f"Scheduler database (default: {DEFAULT_DB})")
+    args = parser.parse_args()
+
+    start = time.time()
+    scheduler = Scheduler(args.db)
+    if args.command == 'init':
+        from proposals_store import open_proposals
+        if scheduler.initialize(open_proposals(args.proposals), args.overlap, args.overlap_annotators):
+            print(f"✅ Initialized {args.db} in {time.time() - start:.1f}s")
+        else:
+            print(f"⚠️ {args.db} is already initialized")
+    elif args.command == 'reclaim':
+        print(f"Reclaimed {scheduler.reclaim()} expired lease(s)")
+    print_status(scheduler)
+
+
+if __name__ == '__main__':
+    main()
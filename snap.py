@@ -0,0 +1,137 @@
+"""
+Edge-aware snap-to-boundary for bboxes.
+
+Snapping moves each side of a box to the strongest nearby image boundary:
+the left/right sides to vertical edges, the top/bottom sides to horizontal
+edges. Only the part of each edge that lies along the side counts, so a
+lesion border beats unrelated texture elsewhere in the same column.
+
+Edges are computed once per image on its display level (Sobel gradients of
+the blurred grayscale image) and cached in the shared image cache as
+cumulative sums, so the strength of every candidate position in a search
+window is a single vectorized difference of two rows (or columns).
+"""
+
+from functools import partial
+
+import cv2
+import numpy as np
+
+from image_cache import image_cache
+from image_pyramid import load_display_image
+
+SEARCH_FRACTION = 0.25  # Search window radius as a fraction of the box side
+MIN_SEARCH_RADIUS = 8  # Display pixels
+MIN_STRENGTH = 1.5  # Edge strength needed to snap, relative to the image mean
+DISTANCE_PENALTY = 0.5  # Score lost at the window border (favours near edges)
+MIN_BOX_SIZE = 10  # Source pixels
+
+
+class EdgeMap:
+    """Cumulative gradient sums of one display level."""
+
+    def __init__(self, image):
+        gray = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        gx = np.abs(cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3))
+        gy = np.abs(cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3))
+        self.height, self.width = gray.shape
+        self.mean = float((gx.mean() + gy.mean()) / 2) or 1.0
+
+        # Padded with a leading zero row/column so band sums need no special case:
+        # sum of gx[y1:y2, x] == vertical[y2, x] - vertical[y1, x]
+        self.vertical = np.zeros((self.height + 1, self.width), np.float32)
+        np.cumsum(gx, axis=0, out=self.vertical[1:])
+        self.horizontal = np.zeros((self.height, self.width + 1), np.float32)
+        np.cumsum(gy, axis=1, out=self.horizontal[:, 1:])
+
+    @property
+    def nbytes(self):
+        return self.vertical.nbytes + self.horizontal.nbytes
+
+    def column_strength(self, y1, y2, x_lo, x_hi):
+        """Mean |d/dx| over rows y1..y2 for every column in [x_lo, x_hi)."""
+        band = self.vertical[y2, x_lo:x_hi] - self.vertical[y1, x_lo:x_hi]
+        return band / max(1, y2 - y1)
+
+    def row_strength(self, x1, x2, y_lo, y_hi):
+        """Mean |d/dy| over columns x1..x2 for every row in [y_lo, y_hi)."""
+        band = self.horizontal[y_lo:y_hi, x2] - self.horizontal[y_lo:y_hi, x1]
+        return band / max(1, x2 - x1)
+
+
+def edge_map(level):
+    """Return the cached EdgeMap of a display level."""
+    return image_cache.get_or_load(('edges', str(level.path)),
+                                   lambda: EdgeMap(load_display_image(level)))
+
+
+def _best_offset(strength, center, radius, threshold):
+    """
+    Return the index in `strength` to snap to, or `center` if no candidate
+    is strong enough. Candidates are scored by strength with a linear
+    penalty for distance from `center`.
+    """
+    offsets = np.abs(np.arange(len(strength)) - center)
+    score = strength * (1 - DISTANCE_PENALTY * offsets / max(1, radius))
+    best = int(np.argmax(score))
+    return best if strength[best] >= threshold else center
+
+
+def _snap_side(strength_fn, pos, low, high, radius, threshold):
+    """Snap one side at `pos` within [pos - radius, pos + radius] ∩ [low, high]."""
+    lo = max(low, pos - radius)
+    hi = min(high, pos + radius) + 1
+    if hi <= lo:
+        return pos
+    return lo + _best_offset(strength_fn(lo, hi), pos - lo, radius, threshold)
+
+
+def snap_bbox(level, bbox, min_strength=MIN_STRENGTH):
+    """
+    Snap a source-pixel [x1, y1, x2, y2] box to nearby image edges.
+
+    Args:
+        level: image_pyramid.DisplayLevel the search runs on
+        bbox: Box in source pixels
+        min_strength: Edge strength (relative to the image mean) below which
+            a side is left where it is
+
+    Returns:
+        list: Snapped [x1, y1, x2, y2] in integer source pixels
+    """
+    edges = edge_map(level)
+    w, h = edges.width, edges.height
+    bx1, bx2 = sorted(min(max(int(round(v)), 0), level.source_width) for v in (bbox[0], bbox[2]))
+    by1, by2 = sorted(min(max(int(round(v)), 0), level.source_height) for v in (bbox[1], bbox[3]))
+    start = [bx1, by1, bx2, by2]
+    x1, y1, x2, y2 = (min(int(round(v)), limit)
+                      for v, limit in zip(level.to_display(start), (w, h, w, h)))
+
+    threshold = min_strength * edges.mean
+    rx = max(MIN_SEARCH_RADIUS, int((x2 - x1) * SEARCH_FRACTION))
+    ry = max(MIN_SEARCH_RADIUS, int((y2 - y1) * SEARCH_FRACTION))
+    min_w = max(1, int(np.ceil(MIN_BOX_SIZE * level.width / level.source_width)))
+    min_h = max(1, int(np.ceil(MIN_BOX_SIZE * level.height / level.source_height)))
+
+    # Gradient column x covers the boundary between pixels x-1 and x, so the
+    # last searchable position is w-1 (h-1 for rows); a side on the image
+    # border stays there
+    columns = partial(edges.column_strength, y1, y2)
+    rows = partial(edges.row_strength, x1, x2)
+    nx1 = _snap_side(columns, x1, 0, min(x2 - min_w, w - 1), rx, threshold)
+    nx2 = _snap_side(columns, x2, nx1 + min_w, w - 1, rx, threshold) if x2 < w else x2
+    ny1 = _snap_side(rows, y1, 0, min(y2 - min_h, h - 1), ry, threshold)
+    ny2 = _snap_side(rows, y2, ny1 + min_h, h - 1, ry, threshold) if y2 < h else y2
+
+    # Keep the original extent along an axis that could not fit a valid box
+    if nx2 - nx1 < min_w:
+        nx1, nx2 = x1, x2
+    if ny2 - ny1 < min_h:
+        ny1, ny2 = y1, y2
+
+    # Round-tripping through display pixels shifts a side by a source pixel
+    # or two, so only sides that moved are mapped back
+    snapped = level.to_source([nx1, ny1, nx2, ny2])
+    return [orig if new == pos else moved
+            for orig, moved, new, pos in zip(start, snapped, (nx1, ny1, nx2, ny2), (x1, y1, x2, y2))]
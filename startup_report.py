@@ -0,0 +1,112 @@
+"""
+Import-time breakdown of the annotation app's cold start.
+
+Runs a fresh interpreter with `python -X importtime`, imports Streamlit and
+then the app module (what a new server process does before the first paint
+of the setup screen), and then the modules the app defers to first use, in
+the order an annotator reaches them. Times are cumulative per module, so
+each deferred entry is the extra cost paid on that first use.
+
+Usage:
+    python bbox_annotation_streamlit.py --startup-report
+    python startup_report.py [--top 15]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+APP_MODULE = 'bbox_annotation_streamlit'
+# Imported by the app on first use, in the order an annotator reaches them
+DEFERRED_MODULES = (
+    ('PIL.ImageDraw', "first image (Pillow, NumPy)"),
+    ('snap', "first Snap to Edges (OpenCV)"),
+    ('github_saver', "GitHub saving (requests)"),
+    ('concurrent.futures.process', "image_index.build_index"),
+)
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        list: (module, depth, self_ms, cumulative_ms) in output order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, (len(indent) - 1) // 2, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure():
+    """Import the app and its deferred modules in a fresh interpreter and parse the timings."""
+    code = '; '.join(['import streamlit', f'import {APP_MODULE}']
+                     + [f'import {module}' for module, _ in DEFERRED_MODULES])
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=Path(__file__).resolve().parent, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+
+def startup_report(top=15):
+    """
+    Return the import-time breakdown.
+
+    Returns:
+        dict: streamlit_ms, app_ms (app module incl. its imports), app_self_ms
+            (module-level code), dependencies [(module, ms)] imported by the
+            app, largest first, and deferred [(module, when, ms)]
+    """
+    rows = measure()
+    top_level = {module: (self_ms, cumulative_ms) for module, depth, self_ms, cumulative_ms in rows if depth == 0}
+
+    # Direct imports of the app module precede its own (depth 0) line
+    app_end = next(i for i, row in enumerate(rows) if row[0] == APP_MODULE and row[1] == 0)
+    app_start = max((i for i, row in enumerate(rows[:app_end]) if row[1] == 0), default=-1) + 1
+    dependencies = sorted(((module, cumulative_ms) for module, depth, _, cumulative_ms in rows[app_start:app_end]
+                           if depth == 1), key=lambda item: -item[1])
+
+    return {
+        'streamlit_ms': top_level.get('streamlit', (0, 0))[1],
+        'app_ms': top_level[APP_MODULE][1],
+        'app_self_ms': top_level[APP_MODULE][0],
+        'dependencies': dependencies[:top],
+        # A module already pulled in by an earlier step does not appear again
+        'deferred': [(module, when, top_level.get(module, (0, 0))[1]) for module, when in DEFERRED_MODULES],
+    }
+
+
+def print_startup_report(top=15):
+    report = startup_report(top)
+    print("Cold start import times (python -X importtime, fresh interpreter)")
+    print(f"  streamlit (loaded by `streamlit run`):  {report['streamlit_ms']:8.1f} ms")
+    print(f"  {APP_MODULE}:              {report['app_ms']:8.1f} ms"
+          f"  (module-level code {report['app_self_ms']:.1f} ms)")
+    print(f"\nSlowest imports of {APP_MODULE}:")
+    for module, ms in report['dependencies']:
+        print(f"  {module:<40} {ms:8.1f} ms")
+    print("\nDeferred to first use:")
+    for module, when, ms in report['deferred']:
+        print(f"  {module:<28} {when:<32} {ms:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the app's cold start")
+    parser.add_argument('--top', type=int, default=15, help="Number of app imports to list")
+    args = parser.parse_args()
+    print_startup_report(args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from proposals_store import JsonProposals  # noqa: E402
+
+
+def make_examples(evid_counts, datasets=('SLAKE',)):
+    """Proposals examples with the given number of EVIDs each, cycling through `datasets`."""
+    return [
+        {
+            'id': f'ex{i}',
+            'dataset': datasets[i % len(datasets)],
+            'proxy_complexity': 'simple',
+            'image_path': f'ex{i}.jpg',
+            'evid_proposals': [
+                {'evid_index': j, 'evid_phrase': f'phrase {j}', 'bbox': [0.5, 0.5, 0.2, 0.2]}
+                for j in range(n)
+            ],
+        }
+        for i, n in enumerate(evid_counts)
+    ]
+
+
+def make_record(example_id, evid_index, decision='accept', annotation_time='2026-01-01T00:00:00', **fields):
+    return {
+        'example_id': example_id,
+        'evid_index': evid_index,
+        'final_bbox': [0.5, 0.5, 0.2, 0.2],
+        'decision': decision,
+        'annotator_id': 'a',
+        'annotation_time': annotation_time,
+        **fields,
+    }
+
+
+@pytest.fixture
+def proposals():
+    return JsonProposals(make_examples([2, 1, 3]))
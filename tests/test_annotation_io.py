@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from annotation_io import iter_json_array, iter_records, latest_records
+from conftest import make_record
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 20))
+def test_records_split_at_every_chunk_boundary(tmp_path, chunk_size):
+    records = [make_record('ex0', 0, final_bbox=[0.125, 0.5, 1e-3, 0.25]),
+               make_record('ex1', 2, decision='no_grounding', final_bbox=None, comment='a, b ] "c"')]
+    path = write(tmp_path, 'a.json', json.dumps(records, indent=2))
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == records
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 8))
+def test_bare_numbers_split_at_chunk_boundary(tmp_path, chunk_size):
+    path = write(tmp_path, 'a.json', '[0.5, -12 ,3e-4,\n1E5, 7]')
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == [0.5, -12, 3e-4, 1e5, 7]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3])
+def test_single_number(tmp_path, chunk_size):
+    path = write(tmp_path, 'a.json', '[0.5]')
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == [0.5]
+
+
+def test_empty_list_with_bom_and_whitespace(tmp_path):
+    path = tmp_path / 'a.json'
+    path.write_bytes(b'\xef\xbb\xbf  \n [ ]\n')
+    assert list(iter_json_array(path, chunk_size=2)) == []
+
+
+@pytest.mark.parametrize('text', ['[{"a": 1},', '[0.5', '[{"a": '])
+def test_truncated_list_raises(tmp_path, text):
+    path = write(tmp_path, 'a.json', text)
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, chunk_size=4))
+
+
+def test_not_a_list_raises(tmp_path):
+    path = write(tmp_path, 'a.json', '{"a": 1}')
+    with pytest.raises(ValueError, match='expected a JSON list'):
+        list(iter_json_array(path))
+
+
+def test_jsonl_skips_blank_lines(tmp_path):
+    records = [make_record('ex0', 0), make_record('ex0', 1)]
+    path = write(tmp_path, 'a.jsonl', '\n'.join(json.dumps(r) for r in records) + '\n\n')
+    assert list(iter_records(path)) == records
+
+
+def test_latest_records_keeps_newest_annotation():
+    old = make_record('ex0', 0, decision='accept', annotation_time='2026-01-01T10:00:00')
+    new = make_record('ex0', 0, decision='adjust', annotation_time='2026-01-01T11:00:00')
+    other = make_record('ex0', 1)
+    latest = latest_records([new, other, old])
+    assert latest == {('ex0', 0): new, ('ex0', 1): other}
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import annotation_journal
+from annotation_journal import AnnotationJournal
+from conftest import make_record
+
+
+def records(n, start=0):
+    return [make_record(f'ex{i}', 0, annotation_time=f'2026-01-01T00:00:{i:02d}') for i in range(start, start + n)]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return AnnotationJournal(tmp_path / 'annotations_a.json', compact_every=3)
+
+
+def test_load_replays_journal_after_snapshot(journal):
+    journal.compact(records(2))
+    for record in records(2, start=2):
+        journal.append(record)
+    assert AnnotationJournal(journal.snapshot_path).load() == records(4)
+
+
+def test_compact_rewrites_snapshot_and_truncates_journal(journal):
+    for record in records(3):
+        journal.append(record)
+    assert journal.should_compact()
+    journal.compact(journal.load())
+    assert journal.pending == 0
+    assert json.loads(journal.snapshot_path.read_text()) == records(3)
+    assert journal.journal_path.read_text() == ''
+    assert journal.load() == records(3)
+
+
+def test_pending_counts_replayed_records(journal):
+    journal.compact(records(1))
+    for record in records(2, start=1):
+        journal.append(record)
+    reopened = AnnotationJournal(journal.snapshot_path, compact_every=3)
+    reopened.load()
+    assert reopened.pending == 2
+    assert not reopened.should_compact()
+    reopened.append(records(1, start=3)[0])
+    assert reopened.should_compact()
+
+
+def test_torn_final_line_is_dropped(journal):
+    for record in records(2):
+        journal.append(record)
+    with open(journal.journal_path, 'a') as f:
+        f.write('{"example_id": "ex9", "evid')
+    assert journal.load() == records(2)
+
+
+def test_corrupt_line_before_the_end_raises(journal):
+    journal.append(records(1)[0])
+    with open(journal.journal_path, 'a') as f:
+        f.write('not json\n')
+    journal.append(records(1, start=1)[0])
+    with pytest.raises(ValueError):
+        journal.load()
+
+
+def test_crash_after_snapshot_replace_does_not_duplicate(journal, monkeypatch):
+    for record in records(3):
+        journal.append(record)
+
+    def crash(path):
+        raise RuntimeError("crash before the journal is truncated")
+
+    monkeypatch.setattr(annotation_journal, '_fsync_dir', crash)
+    with pytest.raises(RuntimeError):
+        journal.compact(journal.load())
+    # Snapshot already holds every record and the journal still does too
+    assert json.loads(journal.snapshot_path.read_text()) == records(3)
+    assert journal.journal_path.read_text().count('\n') == 3
+
+    reopened = AnnotationJournal(journal.snapshot_path)
+    assert reopened.load() == records(3)
+    assert reopened.pending == 0
+
+
+def test_crash_before_snapshot_replace_loses_nothing(journal, monkeypatch):
+    journal.compact(records(2))
+    for record in records(2, start=2):
+        journal.append(record)
+
+    def crash(src, dst):
+        raise RuntimeError("crash before the snapshot is replaced")
+
+    monkeypatch.setattr(annotation_journal.os, 'replace', crash)
+    with pytest.raises(RuntimeError):
+        journal.compact(journal.load())
+    monkeypatch.undo()
+
+    assert json.loads(journal.snapshot_path.read_text()) == records(2)
+    assert AnnotationJournal(journal.snapshot_path).load() == records(4)
@@ -0,0 +1,60 @@
+from annotation_store import AnnotationStore
+from conftest import make_record
+
+
+def test_put_replaces_in_place_and_marks_dirty():
+    first, second = make_record('ex0', 0), make_record('ex0', 1)
+    store = AnnotationStore([first])
+    assert store.dirty_count() == 0
+
+    replacement = make_record('ex0', 0, decision='adjust')
+    store.put(second)
+    store.put(replacement)
+    assert store.records() == [replacement, second]
+    assert store.version == 2
+    assert store.dirty_records() == {('ex0', 0): replacement, ('ex0', 1): second}
+
+
+def test_mark_synced_keeps_keys_re_annotated_after_the_snapshot():
+    store = AnnotationStore()
+    store.put(make_record('ex0', 0))
+    store.put(make_record('ex0', 1))
+    flushed = store.dirty_records()
+
+    newer = make_record('ex0', 1, decision='reject')
+    store.put(newer)
+    store.mark_synced(flushed, 'sha1')
+    assert store.dirty_records() == {('ex0', 1): newer}
+    assert store.remote_version == 'sha1'
+    assert store.synced
+
+
+def test_merge_remote_local_dirty_records_win():
+    clean, dirty = make_record('ex0', 0), make_record('ex0', 1, decision='adjust')
+    store = AnnotationStore([clean])
+    store.put(dirty)
+    seen = []
+    store.subscribe(seen.append)
+    version = store.version
+
+    remote_new = make_record('ex1', 0)
+    remote_update = make_record('ex0', 0, decision='reject')
+    remote_stale = make_record('ex0', 1, decision='accept')
+    changed = store.merge_remote([remote_update, remote_stale, remote_new, dict(remote_new)], 'sha2')
+
+    assert changed == 2
+    assert seen == [remote_update, remote_new]
+    assert store.get(('ex0', 0)) is remote_update
+    assert store.get(('ex0', 1)) is dirty
+    assert store.version == version + 1
+    assert store.remote_version == 'sha2'
+    # Merged records came from the remote copy, so they are not dirty
+    assert store.dirty_records() == {('ex0', 1): dirty}
+
+
+def test_merge_remote_without_changes_keeps_version():
+    record = make_record('ex0', 0)
+    store = AnnotationStore([record])
+    assert store.merge_remote([dict(record)], 'sha3') == 0
+    assert store.version == 0
+    assert store.synced
@@ -0,0 +1,46 @@
+from annotation_store import AnnotationStore
+from completion_index import CompletionIndex
+from conftest import make_record
+
+
+def test_positions_round_trip(proposals):
+    index = CompletionIndex(proposals)
+    assert index.total_evids == 6
+    for pos in range(index.total_evids):
+        assert index.position(*index.locate(pos)) == pos
+    assert index.locate(2) == (1, 0)
+
+
+def test_follows_store_and_replaces_decisions(proposals):
+    store = AnnotationStore([make_record('ex0', 0)])
+    index = CompletionIndex(proposals, store)
+    assert index.done_count == 1
+
+    store.put(make_record('ex0', 0, decision='adjust'))
+    store.put(make_record('ex0', 1, decision='reject'))
+    assert index.done_count == 2
+    assert +index.decision_counts == {'adjust': 1, 'reject': 1}
+    assert index.example_done(0)
+    assert not index.example_done(2)
+
+
+def test_first_unannotated(proposals):
+    index = CompletionIndex(proposals)
+    for example_id, evid_index in [('ex0', 0), ('ex0', 1), ('ex2', 1)]:
+        index.record(make_record(example_id, evid_index))
+    assert index.first_unannotated() == (1, 0)
+    index.record(make_record('ex1', 0))
+    assert index.first_unannotated() == (2, 0)
+    assert index.first_unannotated(start=4) == (2, 2)
+    for evid_index in (0, 2):
+        index.record(make_record('ex2', evid_index))
+    assert index.first_unannotated() is None
+
+
+def test_unknown_evids_only_affect_counters(proposals):
+    index = CompletionIndex(proposals)
+    index.record(make_record('missing', 0))
+    index.record(make_record('ex1', 5))
+    assert index.done_count == 0
+    assert index.decision_counts['accept'] == 2
+    assert index.first_unannotated() == (0, 0)
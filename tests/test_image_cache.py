@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from image_cache import ImageCache
+
+IMAGE_BYTES = 10 * 10 * 3  # Decoded size of each test image
+
+
+def write_image(path, color, mtime_ns=None):
+    Image.new('RGB', (10, 10), color).save(path)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_hits_and_misses(tmp_path):
+    path = write_image(tmp_path / 'a.png', 'red')
+    cache = ImageCache()
+    first = cache.get(path)
+    assert cache.get(path) is first
+    assert first.getpixel((0, 0)) == (255, 0, 0)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'images': 1, 'bytes': IMAGE_BYTES,
+                             'max_bytes': cache.max_bytes}
+
+
+def test_least_recently_used_image_is_evicted_at_the_byte_limit(tmp_path):
+    a, b, c = (write_image(tmp_path / f'{name}.png', 'red') for name in 'abc')
+    cache = ImageCache(max_bytes=2 * IMAGE_BYTES)
+    image_a = cache.get(a)
+    cache.get(b)
+    cache.get(a)  # b is now the least recently used
+    cache.get(c)
+    assert cache.stats()['images'] == 2
+    assert cache.stats()['bytes'] == 2 * IMAGE_BYTES
+
+    misses = cache.misses
+    assert cache.get(a) is image_a
+    cache.get(b)
+    assert cache.misses == misses + 1
+
+
+def test_entry_larger_than_the_budget_is_not_kept(tmp_path):
+    path = write_image(tmp_path / 'a.png', 'red')
+    cache = ImageCache(max_bytes=IMAGE_BYTES - 1)
+    assert cache.get(path).size == (10, 10)
+    assert cache.stats()['images'] == 0
+    assert cache.stats()['bytes'] == 0
+
+
+def test_changed_file_is_decoded_again(tmp_path):
+    path = write_image(tmp_path / 'a.png', 'red', mtime_ns=10**18)
+    cache = ImageCache()
+    assert cache.get(path).getpixel((0, 0)) == (255, 0, 0)
+    write_image(path, 'blue', mtime_ns=10**18 + 10**9)
+    assert cache.get(path).getpixel((0, 0)) == (0, 0, 255)
+    assert cache.misses == 2
+
+
+def test_size_is_remembered_without_decoding(tmp_path):
+    path = write_image(tmp_path / 'a.png', 'red')
+    cache = ImageCache()
+    assert cache.size(path) == (10, 10)
+    assert cache.size(path) == (10, 10)
+    assert cache.stats()['images'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    other = write_image(tmp_path / 'b.png', 'red')
+    cache.get(other)
+    assert cache.size(other) == (10, 10)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_derived_arrays_share_the_budget():
+    cache = ImageCache(max_bytes=1000)
+    first = cache.get_or_load('edges-a', lambda: np.zeros(600, np.uint8))
+    assert cache.get_or_load('edges-a', lambda: None) is first
+    cache.get_or_load('edges-b', lambda: np.zeros(600, np.uint8))
+    assert cache.stats()['images'] == 1
+    assert cache.stats()['bytes'] == 600
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'images': 0, 'bytes': 0, 'max_bytes': 1000}
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import image_pyramid
+from image_pyramid import DisplayLevel, _level_size, prune_cache
+
+SOURCE_SIZES = [(6000, 4000), (640, 480), (4001, 2999), (1024, 7000)]
+
+
+def make_level(source_size, max_side=image_pyramid.DEFAULT_MAX_SIDE):
+    return DisplayLevel('level.png', *_level_size(source_size, max_side), *source_size)
+
+
+@pytest.mark.parametrize('source_size', SOURCE_SIZES)
+def test_level_size_keeps_aspect_ratio(source_size):
+    width, height = _level_size(source_size, 1600)
+    assert max(width, height) == min(1600, max(source_size))
+    assert width / height == pytest.approx(source_size[0] / source_size[1], rel=2 / min(width, height))
+
+
+@pytest.mark.parametrize('source_size', SOURCE_SIZES)
+def test_source_box_round_trips_exactly(source_size):
+    level = make_level(source_size)
+    sw, sh = source_size
+    for bbox in ([0, 0, sw, sh], [1, 2, 3, 5], [sw // 3, sh // 7, sw - 1, sh - 3]):
+        assert level.to_source(level.to_display(bbox)) == bbox
+
+
+@pytest.mark.parametrize('source_size', SOURCE_SIZES)
+def test_display_pixels_map_back_within_half_a_pixel(source_size):
+    level = make_level(source_size)
+    for x in range(0, level.width + 1, 37):
+        for y in range(0, level.height + 1, 41):
+            dx1, dy1, dx2, dy2 = level.to_display(level.to_source([x, y, x, y]))
+            assert abs(dx1 - x) <= 0.5 and abs(dx2 - x) <= 0.5
+            assert abs(dy1 - y) <= 0.5 and abs(dy2 - y) <= 0.5
+
+
+def test_small_image_level_is_the_identity():
+    level = make_level((640, 480))
+    assert level.scale == (1.0, 1.0)
+    assert level.to_display([10, 20, 30, 40]) == [10, 20, 30, 40]
+
+
+def test_prune_cache_removes_oldest_down_to_target(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_pyramid, 'CACHE_DIR', tmp_path)
+    for i in range(10):
+        path = tmp_path / f'level{i}.jpg'
+        path.write_bytes(b'x' * 100)
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+    (tmp_path / '.level.tmp').write_bytes(b'x' * 100)
+
+    assert prune_cache(max_bytes=1000) == (0, 0)
+    assert prune_cache(max_bytes=500) == (6, 600)
+    assert sorted(p.name for p in tmp_path.glob('level*')) == [f'level{i}.jpg' for i in range(6, 10)]
+    assert (tmp_path / '.level.tmp').exists()
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from conftest import make_examples
+from proposals_store import SqliteProposals, build_sqlite, open_proposals
+
+
+def write_json(path, examples):
+    path.write_text(json.dumps(examples))
+    return path
+
+
+def test_sqlite_store_matches_the_json_file(tmp_path):
+    examples = make_examples([2, 0, 3], datasets=('A', 'B'))
+    source = write_json(tmp_path / 'proposals.json', examples)
+    store = SqliteProposals(build_sqlite(source))
+    assert len(store) == 3
+    assert [store[pos] for pos in range(3)] == examples
+    assert store.get('ex2') == examples[2]
+    assert store.position('ex1') == 1
+    assert store.total_evids() == 5
+    assert list(store.evid_offsets()) == [0, 2, 2, 5]
+    assert [pos for pos, _ in store.iter_examples(dataset='A')] == [0, 2]
+
+
+@pytest.mark.parametrize('n_examples', [3, 12])
+def test_duplicate_id_is_reported(tmp_path, monkeypatch, n_examples):
+    monkeypatch.setattr('proposals_store.BUILD_BATCH_SIZE', 5)
+    examples = make_examples([1] * n_examples)
+    examples[-1]['id'] = 'ex1'
+    source = write_json(tmp_path / 'proposals.json', examples)
+    with pytest.raises(ValueError, match=rf"duplicate example id 'ex1' at position {n_examples - 1}"):
+        build_sqlite(source)
+    assert list(tmp_path.iterdir()) == [source]
+
+
+@pytest.mark.parametrize('name', ['proposals.jsonl', 'PROPOSALS.JSONL'])
+def test_open_jsonl_suffix_is_case_insensitive(tmp_path, name):
+    examples = make_examples([1, 2])
+    path = tmp_path / name
+    path.write_text(''.join(json.dumps(ex) + '\n' for ex in examples))
+    assert [ex for _, ex in open_proposals(path).iter_examples()] == examples
+    assert SqliteProposals(build_sqlite(path, tmp_path / 'p.SQLITE')).total_evids() == 3
+    assert open_proposals(tmp_path / 'p.SQLITE').total_evids() == 3
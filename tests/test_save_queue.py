@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+import save_queue
+from save_queue import FAILURES_BEFORE_ERROR, SaveQueue, get_save_queue
+
+
+class Recorder:
+    """flush_fn that records each call and fails while `fail` is set."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []  # (monotonic time, store)
+        self.lock = threading.Lock()
+
+    def __call__(self, store):
+        with self.lock:
+            self.calls.append((time.monotonic(), store))
+        if self.fail:
+            raise OSError("network down")
+        return True, "saved"
+
+    def stores(self):
+        with self.lock:
+            return [store for _, store in self.calls]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.01)
+
+
+def test_submits_coalesce_into_one_flush_per_store():
+    flush_fn = Recorder()
+    queue = SaveQueue(flush_fn, max_delay=0.2, batch_size=100)
+    store_a, store_b = object(), object()
+    for store in [store_a, store_b, store_a, store_a]:
+        queue.submit(store)
+    assert queue.status()['depth'] == 4
+
+    wait_for(lambda: queue.status()['flush_count'] == 1)
+    assert sorted(map(id, flush_fn.stores())) == sorted([id(store_a), id(store_b)])
+    assert queue.status()['depth'] == 0
+
+
+def test_batch_size_flushes_before_max_delay():
+    flush_fn = Recorder()
+    queue = SaveQueue(flush_fn, max_delay=60, batch_size=3)
+    store = object()
+    for _ in range(2):
+        queue.submit(store)
+    time.sleep(0.1)
+    assert flush_fn.stores() == []
+    queue.submit(store)
+    wait_for(lambda: flush_fn.stores() == [store])
+
+
+def test_flush_waits_for_the_write():
+    flush_fn = Recorder()
+    queue = SaveQueue(flush_fn, max_delay=60, batch_size=100)
+    store = object()
+    queue.submit(store)
+    assert queue.flush(timeout=5)
+    assert flush_fn.stores() == [store]
+    status = queue.status()
+    assert status['last_success'] and status['last_message'] == "saved"
+
+
+def test_failed_flushes_back_off_and_report_failing():
+    flush_fn = Recorder(fail=True)
+    queue = SaveQueue(flush_fn, max_delay=0.05, batch_size=100)
+    store = object()
+    queue.submit(store)
+
+    wait_for(lambda: len(flush_fn.calls) >= FAILURES_BEFORE_ERROR + 1)
+    times = [t for t, _ in flush_fn.calls]
+    for i, (before, after) in enumerate(zip(times, times[1:])):
+        assert after - before >= 0.05 * 2 ** i * 0.9
+    status = queue.status()
+    assert status['failing']
+    assert status['consecutive_failures'] >= FAILURES_BEFORE_ERROR
+    assert status['depth'] == 1
+    assert status['last_message'].startswith("❌")
+
+    flush_fn.fail = False
+    wait_for(lambda: queue.status()['last_success'])
+    status = queue.status()
+    assert not status['failing']
+    assert status['consecutive_failures'] == 0
+    assert status['next_retry_in'] is None
+    assert status['depth'] == 0
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(save_queue, '_queues', {})
+    return save_queue._queues
+
+
+def test_get_save_queue_reuses_and_reconfigures(registry):
+    flush_fn = Recorder()
+    queue = get_save_queue('a', flush_fn, max_delay=60, batch_size=100)
+    assert get_save_queue('a', flush_fn, max_delay=60, batch_size=100) is queue
+    assert get_save_queue('b', flush_fn) is not queue
+
+    store = object()
+    queue.submit(store)
+    assert get_save_queue('a', flush_fn, max_delay=0.05, batch_size=100) is queue
+    assert (queue.max_delay, queue.batch_size) == (0.05, 100)
+    # The worker picks up the shorter delay without another submit
+    wait_for(lambda: flush_fn.stores() == [store])
+
+
+def test_shutdown_flush_shares_one_deadline(registry, monkeypatch):
+    monkeypatch.setattr(save_queue, 'SHUTDOWN_TIMEOUT', 0.3)
+    for annotator_id in 'abc':
+        queue = get_save_queue(annotator_id, Recorder(fail=True), max_delay=60, batch_size=100)
+        queue.submit(object())
+    start = time.monotonic()
+    save_queue._flush_all_on_exit()
+    assert time.monotonic() - start < 0.6
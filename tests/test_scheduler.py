@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+import scheduler
+from conftest import make_examples
+from proposals_store import JsonProposals
+from scheduler import Scheduler, in_overlap
+
+
+class Clock:
+    """Stand-in for the time module with a wall clock the test advances."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.monotonic = time.monotonic
+        self.strftime = time.strftime
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def make_scheduler(tmp_path, proposals):
+    def make(overlap=0.0, overlap_annotators=2, lease_seconds=60, examples=None):
+        sched = Scheduler(tmp_path / 'scheduler.sqlite', lease_seconds=lease_seconds)
+        sched.initialize(proposals if examples is None else JsonProposals(examples),
+                         overlap=overlap, overlap_annotators=overlap_annotators)
+        return sched
+    return make
+
+
+def drain(sched, annotator_id):
+    """Complete every unit offered to `annotator_id`; return them in order."""
+    done = []
+    while (unit := sched.next_unit(annotator_id)) is not None:
+        assert sched.complete(annotator_id, *unit)
+        done.append(unit)
+    return done
+
+
+def test_initialize_once(tmp_path, proposals):
+    sched = Scheduler(tmp_path / 'scheduler.sqlite')
+    assert not sched.is_initialized()
+    assert sched.initialize(proposals, overlap=0.0)
+    assert not sched.initialize(proposals, overlap=1.0)
+    stats = sched.stats()
+    assert (stats['units'], stats['overlap_units'], stats['slots']) == (6, 0, 6)
+
+
+def test_without_overlap_each_unit_goes_to_one_annotator(make_scheduler):
+    sched = make_scheduler(overlap=0.0)
+    first = drain(sched, 'a')
+    assert first == [('ex0', 0), ('ex0', 1), ('ex1', 0), ('ex2', 0), ('ex2', 1), ('ex2', 2)]
+    assert sched.next_unit('b') is None
+
+
+def test_overlap_quota(make_scheduler):
+    sched = make_scheduler(overlap=1.0, overlap_annotators=2)
+    a, b = drain(sched, 'a'), drain(sched, 'b')
+    assert sorted(a) == sorted(b) and len(set(a)) == 6
+    assert sched.next_unit('c') is None
+    stats = sched.stats()
+    assert stats['done'] == stats['slots'] == 12
+    assert stats['open_slots'] == 0
+    assert stats['done_by_annotator'] == {'a': 6, 'b': 6}
+
+
+def test_overlap_units_leased_concurrently_stay_within_quota(make_scheduler):
+    sched = make_scheduler(overlap=1.0, overlap_annotators=2)
+    assert sched.next_unit('a') == sched.next_unit('b') == ('ex0', 0)
+    # Both slots of ex0 are leased, so a third annotator starts on ex1
+    assert sched.next_unit('c') == ('ex1', 0)
+
+
+def test_next_unit_resumes_the_current_lease(make_scheduler):
+    sched = make_scheduler()
+    assert sched.next_unit('a') == ('ex0', 0)
+    assert sched.next_unit('a') == ('ex0', 0)
+    sched.complete('a', 'ex0', 0)
+    # The rest of the example was leased with it
+    assert sched.next_unit('a') == ('ex0', 1)
+    assert sched.next_unit('b') == ('ex1', 0)
+
+
+def test_expired_lease_is_reclaimed(make_scheduler, clock):
+    sched = make_scheduler(lease_seconds=60)
+    assert sched.next_unit('a') == ('ex0', 0)
+    assert sched.next_unit('b') == ('ex1', 0)
+    clock.now += 30
+    assert sched.reclaim() == 0
+
+    clock.now += 31
+    assert sched.next_unit('c') == ('ex0', 0)  # Reclaims a's and b's leases on the way
+    stats = sched.stats()
+    assert (stats['leased'], stats['expired']) == (2, 3)
+    # a lost ex0 to c, so is moved on; a late completion is still recorded
+    assert sched.next_unit('a') == ('ex1', 0)
+    assert sched.complete('a', 'ex0', 0)
+
+
+def test_renew_extends_leases(make_scheduler, clock):
+    sched = make_scheduler(lease_seconds=60)
+    sched.next_unit('a')
+    clock.now += 45
+    assert sched.renew('a', force=True) == 2
+    clock.now += 45
+    assert sched.reclaim() == 0
+    clock.now += 16
+    assert sched.reclaim() == 2
+
+
+def test_renew_is_throttled(make_scheduler):
+    sched = make_scheduler(lease_seconds=60)
+    sched.next_unit('a')
+    assert sched.renew('a') == 0
+    assert sched.renew('a', force=True) == 2
+
+
+def test_released_unit_goes_to_another_annotator(make_scheduler):
+    sched = make_scheduler()
+    assert sched.next_unit('a') == ('ex0', 0)
+    assert sched.release('a', 'ex0', 0)
+    assert not sched.release('a', 'ex0', 0)
+    assert sched.next_unit('a') == ('ex0', 1)
+    assert sched.next_unit('b') == ('ex0', 0)
+    assert sched.stats()['released'] == 1
+
+
+def test_strata_are_balanced_per_annotator(make_scheduler):
+    examples = make_examples([1, 1, 1, 1], datasets=('A', 'A', 'B', 'B'))
+    sched = make_scheduler(examples=examples)
+    assert [example_id for example_id, _ in drain(sched, 'a')] == ['ex0', 'ex2', 'ex1', 'ex3']
+
+
+def test_in_overlap_is_stable_and_proportional():
+    ids = [f'ex{i}' for i in range(2000)]
+    selected = [in_overlap(example_id, 0.1) for example_id in ids]
+    assert selected == [in_overlap(example_id, 0.1) for example_id in ids]
+    assert 0.08 < sum(selected) / len(ids) < 0.12
+    assert not any(in_overlap(example_id, 0.0) for example_id in ids)
+    assert all(in_overlap(example_id, 1.0) for example_id in ids)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_pyramid import DisplayLevel
+from snap import snap_bbox
+
+SOURCE_SIZE = (6000, 4000)
+DISPLAY_SIZE = (1600, 1067)
+
+
+def make_level(tmp_path, pixels):
+    path = tmp_path / 'level.png'
+    Image.fromarray(pixels).save(path)
+    return DisplayLevel(path, *DISPLAY_SIZE, *SOURCE_SIZE)
+
+
+def test_flat_image_leaves_box_unchanged(tmp_path):
+    level = make_level(tmp_path, np.full((DISPLAY_SIZE[1], DISPLAY_SIZE[0], 3), 128, np.uint8))
+    bbox = [1003, 2003, 3007, 3011]
+    assert snap_bbox(level, bbox) == bbox
+
+
+def test_sides_snap_onto_a_step_edge(tmp_path):
+    # Bright rectangle spanning display pixels [400, 300) x [1200, 800)
+    pixels = np.zeros((DISPLAY_SIZE[1], DISPLAY_SIZE[0], 3), np.uint8)
+    pixels[300:800, 400:1200] = 255
+    level = make_level(tmp_path, pixels)
+    edges = level.to_source([400, 300, 1200, 800])
+
+    snapped = snap_bbox(level, [1540, 1080, 4430, 3060])
+    # The blurred gradient peaks on both pixels of the step: within one display pixel
+    source_per_display = SOURCE_SIZE[0] / DISPLAY_SIZE[0]
+    assert snapped == pytest.approx(edges, abs=source_per_display + 1)
+
+
+def test_only_moved_sides_are_mapped_back(tmp_path):
+    # A single vertical edge at display x=400: only the left side can snap
+    pixels = np.zeros((DISPLAY_SIZE[1], DISPLAY_SIZE[0], 3), np.uint8)
+    pixels[:, 400:] = 255
+    level = make_level(tmp_path, pixels)
+    bbox = [1540, 2003, 4431, 3011]
+    snapped = snap_bbox(level, bbox)
+    assert snapped[0] == level.to_source([400, 0, 400, 0])[0]
+    assert snapped[1:] == bbox[1:]
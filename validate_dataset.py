@@ -0,0 +1,260 @@
+"""
+Validate a proposals file against its images directory before annotation.
+
+Problems otherwise surface only when an annotator reaches them: an image
+that is missing (the app's "Image not found"), truncated or corrupt
+(TIFF/BMP files in particular), a proposal box outside the image, or keys
+that collide when annotations are saved. This command checks a whole batch
+up front and writes a machine-readable report.
+
+Image checks run in a process pool, one fully decoded image per task (JPEGs
+are decoded at reduced DCT scale, which still reads the whole stream), while
+the main process checks the proposals themselves:
+
+    missing_image          image_path does not exist under the images directory
+    undecodable_image      the file cannot be opened or decoded
+    dimension_mismatch     decoded size differs from the current image index entry
+    stale_index            (warning) the index entry no longer matches the file
+    malformed_bbox         bbox is not NO_VISIBLE_GROUNDING or 4 finite numbers
+    bbox_out_of_range      a box edge lies outside [0, 1] (beyond BBOX_TOLERANCE)
+    degenerate_bbox        width or height is not positive, or under one pixel
+    duplicate_example      an example id appears more than once
+    duplicate_evid         an (id, evid_index) key appears more than once
+    evid_index_position    (warning) evid_index differs from the EVID's position in
+                           evid_proposals, which is what the app saves as evid_index
+    tier_mismatch          (warning) grounding_tier differs from the tier the app
+                           assigns to the bbox (grounding.grounding_tier)
+
+The command exits with status 1 if any error was found (or any warning,
+with --strict).
+
+Usage:
+    python validate_dataset.py bbox_proposals_qwen_v1.json images/ [-o validation_report.json]
+        [--workers 8] [--strict]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import image_index
+from grounding import NO_GROUNDING, grounding_tier
+from proposals_store import open_proposals
+
+DEFAULT_REPORT = 'validation_report.json'
+BBOX_TOLERANCE = 1e-6  # Normalized slack for box edges at exactly 0 or 1
+DECODE_CHUNKSIZE = 16
+WARNINGS = {'stale_index', 'tier_mismatch', 'evid_index_position'}
+
+
+def check_image(path):
+    """
+    Open and fully decode one image.
+
+    Returns:
+        dict: {'size': [width, height]} or {'error': check name, 'message': ...}
+    """
+    if not os.path.isfile(path):
+        return {'error': 'missing_image', 'message': "file not found"}
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            size = list(img.size)
+            if img.format == 'JPEG':
+                img.draft(img.mode, (max(1, size[0] // 8), max(1, size[1] // 8)))
+            img.load()
+    except Exception as e:
+        return {'error': 'undecodable_image', 'message': f"{type(e).__name__}: {e}"}
+    return {'size': size}
+
+
+def check_bbox(bbox):
+    """
+    Check a proposal bbox value.
+
+    Returns:
+        tuple: (check name, message) for the first problem found, or None
+    """
+    if bbox == NO_GROUNDING:
+        return None
+    if (not isinstance(bbox, (list, tuple)) or len(bbox) != 4
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+                       for v in bbox)):
+        return 'malformed_bbox', f"expected [x_c, y_c, w, h] or {NO_GROUNDING}, got {bbox!r}"
+    x_c, y_c, w, h = bbox
+    if w <= 0 or h <= 0:
+        return 'degenerate_bbox', f"non-positive size w={w:g} h={h:g}"
+    edges = (x_c - w / 2, y_c - h / 2, x_c + w / 2, y_c + h / 2)
+    if min(edges) < -BBOX_TOLERANCE or max(edges) > 1 + BBOX_TOLERANCE:
+        return 'bbox_out_of_range', "edges [{:.4f}, {:.4f}, {:.4f}, {:.4f}] outside [0, 1]".format(*edges)
+    return None
+
+
+class Report:
+    """Issues found so far, each a flat dict with check, severity and location."""
+
+    def __init__(self):
+        self.issues = []
+
+    def add(self, check, message, **where):
+        severity = 'warning' if check in WARNINGS else 'error'
+        self.issues.append({'check': check, 'severity': severity, **where, 'message': message})
+
+    def counts(self, severity):
+        return dict(Counter(issue['check'] for issue in self.issues if issue['severity'] == severity))
+
+
+def check_proposals(proposals, report):
+    """
+    Check ids, keys, bboxes and tiers of every example.
+
+    Returns:
+        tuple: (image_path -> [example ids], [(example_id, evid_index, image_path, w, h)]
+            of boxes to check against the image size, example count, EVID count)
+    """
+    seen_examples, seen_keys = set(), set()
+    images, sized_boxes = {}, []
+    n_examples = n_evids = 0
+
+    for _, ex in proposals.iter_examples():
+        n_examples += 1
+        example_id = ex.get('id')
+        if example_id in seen_examples:
+            report.add('duplicate_example', "example id appears more than once", example_id=example_id)
+        seen_examples.add(example_id)
+        image_path = ex.get('image_path')
+        images.setdefault(image_path, []).append(example_id)
+
+        for position, evid in enumerate(ex.get('evid_proposals', [])):
+            n_evids += 1
+            evid_index = evid.get('evid_index')
+            where = {'example_id': example_id, 'evid_index': evid_index}
+            if evid_index != position:
+                report.add('evid_index_position', f"evid_index is {evid_index} at position {position}; "
+                                                  f"annotations use the position", **where)
+            key = (example_id, evid_index)
+            if key in seen_keys:
+                report.add('duplicate_evid', "(id, evid_index) key appears more than once", **where)
+            seen_keys.add(key)
+
+            bbox = evid.get('bbox')
+            problem = check_bbox(bbox)
+            if problem is not None:
+                report.add(*problem, **where)
+                continue
+            if bbox != NO_GROUNDING:
+                sized_boxes.append((example_id, evid_index, image_path, bbox[2], bbox[3]))
+            tier = evid.get('grounding_tier')
+            expected = grounding_tier(bbox)
+            if tier is not None and tier != expected:
+                report.add('tier_mismatch', f"grounding_tier is {tier}, bbox implies {expected}", **where)
+
+    return images, sized_boxes, n_examples, n_evids
+
+
+def validate_dataset(proposals_path, images_dir, workers=None):
+    """
+    Validate a proposals file against `images_dir`.
+
+    Returns:
+        dict: the report (summary, per-check counts, issues)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    start = time.time()
+    report = Report()
+    proposals = open_proposals(proposals_path)
+    index = image_index.load_index(images_dir)
+
+    # Queue every decode first so the pool works while the proposals are checked
+    image_paths = sorted({ex.get('image_path') for _, ex in proposals.iter_examples()} - {None})
+    sizes = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(check_image, [str(Path(images_dir) / rel_path) for rel_path in image_paths],
+                           chunksize=DECODE_CHUNKSIZE)
+        images, sized_boxes, n_examples, n_evids = check_proposals(proposals, report)
+
+        for rel_path, result in zip(image_paths, results):
+            where = {'image_path': rel_path, 'example_ids': images.get(rel_path, [])}
+            if 'error' in result:
+                report.add(result['error'], result['message'], **where)
+                continue
+            width, height = sizes[rel_path] = result['size']
+            entry = index.get(rel_path)
+            if entry is None:
+                continue
+            if not image_index.is_current(entry, Path(images_dir) / rel_path):
+                report.add('stale_index', "image changed since the index was built", **where)
+            elif (entry['width'], entry['height']) != (width, height):
+                report.add('dimension_mismatch', f"index says {entry['width']}x{entry['height']}, "
+                                                 f"image is {width}x{height}", **where)
+
+    for example_id in images.get(None, []):
+        report.add('missing_image', "example has no image_path", example_id=example_id)
+
+    for example_id, evid_index, rel_path, w, h in sized_boxes:
+        if rel_path not in sizes:
+            continue
+        width, height = sizes[rel_path]
+        if w * width < 1 or h * height < 1:
+            report.add('degenerate_bbox', f"box is {w * width:.2f}x{h * height:.2f} px on a "
+                                          f"{width}x{height} image",
+                       example_id=example_id, evid_index=evid_index)
+
+    errors, warnings = report.counts('error'), report.counts('warning')
+    return {
+        'proposals': str(proposals_path),
+        'images_dir': str(images_dir),
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'summary': {
+            'examples': n_examples,
+            'evids': n_evids,
+            'images': len(image_paths),
+            'images_decoded': len(sizes),
+            'image_index': bool(index),
+            'errors': sum(errors.values()),
+            'warnings': sum(warnings.values()),
+            'seconds': round(time.time() - start, 2),
+        },
+        'errors': errors,
+        'warnings': warnings,
+        'issues': report.issues,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a proposals file against its images directory")
+    parser.add_argument('proposals', help="Proposals file (JSON, JSONL or SQLite)")
+    parser.add_argument('images_dir', help="Images directory")
+    parser.add_argument('-o', '--output', default=DEFAULT_REPORT, help="JSON report path")
+    parser.add_argument('--workers', type=int, default=None, help="Decoder processes (default: CPU count)")
+    parser.add_argument('--strict', action='store_true', help="Also fail on warnings")
+    args = parser.parse_args()
+
+    result = validate_dataset(args.proposals, args.images_dir, workers=args.workers)
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    summary = result['summary']
+    print(f"Checked {summary['examples']} examples, {summary['evids']} EVIDs and "
+          f"{summary['images']} images in {summary['seconds']:.1f}s"
+          + ("" if summary['image_index'] else " (no image index; dimensions not compared)"))
+    for check, count in sorted(result['errors'].items()):
+        print(f"❌ {check}: {count}")
+    for check, count in sorted(result['warnings'].items()):
+        print(f"⚠️  {check}: {count}")
+    failed = summary['errors'] or (args.strict and summary['warnings'])
+    if not failed:
+        print("✅ No problems found" if not summary['warnings'] else "✅ No errors")
+    print(f"📄 {args.output}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()